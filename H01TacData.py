@@ -1,58 +1,11 @@
 import sys
 import os
 import argparse
-from dexhand_client import DexHandClient
-import numpy as np
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Tac-3D/DexHand-SDK-v1.1/pyDexHandClient/examples')))
-import PyTac3D
-import time
-import pickle
-from datetime import datetime
-
-# 全局标志变量
-grasp_executed = False
-
-def get_timestamp():
-    return str(int(time.time() * 1000 - 100))  # 100ms延迟
-
-# 将数据保存到指定子文件夹中，子文件夹路径由实验编号生成
-def save_to_pickle(data, base_folder, exp_number):
-    """
-    保存数据到指定的子文件夹中。
-    Args:
-        data (dict): 要保存的数据。
-        base_folder (str): 存放所有实验数据的主文件夹路径。
-        exp_number (str): 当前实验编号，用于创建子文件夹。
-    """
-    try:
-        # 构造子文件夹路径
-        sub_folder = os.path.join(base_folder, exp_number.zfill(4))
-        if not os.path.exists(sub_folder):
-            os.makedirs(sub_folder)
-        
-        # 自动生成文件名
-        file_name = f"{get_timestamp()}.pkl"
-        file_path = os.path.join(sub_folder, file_name)
-
-        # 保存数据到 pickle 文件
-        with open(file_path, 'wb') as f:
-            pickle.dump(data, f)
-
-        # 返回子文件夹路径
-        return sub_folder
-
-    except Exception as e:
-        print(f"Error saving data to {sub_folder}: {e}")
-
-# 用于存储 Tac3D 的测量结果
-class Tac3D_info:
-    def __init__(self, SN):
-        self.SN = SN  # 传感器 SN
-        self.P = np.zeros((400, 3))  # 三维形貌测量结果
-        self.D = np.zeros((400, 3))  # 三维变形场测量结果
-        self.F = np.zeros((400, 3))  # 三维分布力场测量结果
-        self.Fr = np.zeros((1, 3))  # 三维合力
-        self.Mr = np.zeros((1, 3))  # 三维合力矩
+from tac_recorder import TacRecorder
+from tac_codec import CODEC_KINDS, DEFAULT_ERROR_BOUNDS
+from frame_writer import POLICIES
+from slip_control import SlipController
+from event_log import EventLog
 
 if __name__ == "__main__":
     # 使用 argparse 解析命令行参数
@@ -69,105 +22,167 @@ if __name__ == "__main__":
         required=True,
         help="Experiment number (e.g., '0001', '0002')."
     )
+    parser.add_argument(
+        '--sensors',
+        type=str,
+        nargs='+',
+        default=["HDL1-GWH0017", "HDL1-GWH0018"],
+        help="Tac3D serial numbers, one data stream per sensor (default: HDL1-GWH0017 HDL1-GWH0018)."
+    )
+    parser.add_argument(
+        '--chunk_size',
+        type=int,
+        default=64,
+        help="Number of frames written to disk per chunk (default: 64)."
+    )
+    parser.add_argument(
+        '--ring_capacity', '--queue_size',
+        dest='ring_capacity',
+        type=int,
+        default=256,
+        help="Number of Tac3D frames buffered per sensor before --queue_policy applies (default: 256)."
+    )
+    parser.add_argument(
+        '--queue_policy',
+        type=str,
+        default='drop_oldest',
+        choices=POLICIES,
+        help="What to do when a buffer is full: wait for the writer, drop the oldest or the newest frame (default: 'drop_oldest')."
+    )
+    parser.add_argument(
+        '--codec',
+        type=str,
+        default='int16',
+        choices=CODEC_KINDS,
+        help="Storage encoding of P/D/F (default: 'int16')."
+    )
+    parser.add_argument(
+        '--pos_error',
+        type=float,
+        default=DEFAULT_ERROR_BOUNDS["D"],
+        help="Max quantization error of P and D in mm for the int16 codec (default: 0.001)."
+    )
+    parser.add_argument(
+        '--force_error',
+        type=float,
+        default=DEFAULT_ERROR_BOUNDS["F"],
+        help="Max quantization error of F in N for the int16 codec (default: 0.0001)."
+    )
+    parser.add_argument(
+        '--pre_trigger',
+        type=float,
+        default=3.0,
+        help="Seconds of data before the 'z' key kept in memory and saved on trigger (default: 3.0)."
+    )
+    parser.add_argument(
+        '--no_features',
+        action='store_true',
+        help="Do not compute the per-frame tactile feature table while recording."
+    )
+    parser.add_argument(
+        '--contact_threshold',
+        type=float,
+        default=0.005,
+        help="Per-marker normal force in N above which a marker counts as in contact (default: 0.005)."
+    )
+    parser.add_argument(
+        '--slip_control',
+        action='store_true',
+        help="After grasping, adjust grip force from tactile slip detection (closed loop)."
+    )
+    parser.add_argument(
+        '--slip_budget_ms',
+        type=float,
+        default=20.0,
+        help="Latency budget from Tac3D frame arrival to grip command in ms (default: 20)."
+    )
+    parser.add_argument(
+        '--hand_capacity',
+        type=int,
+        default=256,
+        help="Number of DexHand frames buffered before --queue_policy applies (default: 256)."
+    )
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help="Use a fake DexHand and receive Tac3D frames from tac_replay.py instead of the real devices."
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=9988,
+        help="Tac3D UDP port (default: 9988)."
+    )
     args = parser.parse_args()
     folder_path = args.folder_path
     exp_number = args.exp_number
-
-    # Tac3D 的回调函数
-    def Tac3DRecvCallback(frame, param):
-        # 获取 SN
-        SN = frame["SN"]  # 通过 SN 号确定哪一个 Tac3D 调用了回调函数
-        tacinfo = param[SN]
-
-        # 获取标志点三维形貌
-        P = frame.get("3D_Positions")
-        tacinfo.P = P
-
-        # 获取标志点三维位移场
-        D = frame.get("3D_Displacements")
-        tacinfo.D = D
-
-        # 获取三维分布力
-        F = frame.get("3D_Forces")
-        tacinfo.F = F
-
-        # 获得三维合力
-        Fr = frame.get("3D_ResultantForce")
-        tacinfo.Fr = Fr
-
-        # 获得三维合力矩
-        Mr = frame.get("3D_ResultantMoment")
-        tacinfo.Mr = Mr
-
-    def HandRecvCallback(client: DexHandClient):
-        global grasp_executed  # 使用全局变量
-        info = client.hand_info
-        if info._frame_cnt % 2 == 0 and grasp_executed:  # 检查标志
-            # 创建保存的字典数据
-            data = {
-                "pos": info.now_pos,
-                "force": info.avg_force,
-                "P1": tacinfo1.P,
-                "D1": tacinfo1.D,
-                "F1": tacinfo1.F,
-                "Fr1": tacinfo1.Fr,
-                "Mr1": tacinfo1.Mr,
-                "P2": tacinfo2.P,
-                "D2": tacinfo2.D,
-                "F2": tacinfo2.F,
-                "Fr2": tacinfo2.Fr,
-                "Mr2": tacinfo2.Mr
-            }
-
-            # 调用保存函数，传入主文件夹路径和实验编号
-            sub_folder = save_to_pickle(data, folder_path, exp_number)
-            
-            # 返回子文件夹路径
-            return sub_folder
+    sub_folder = os.path.join(folder_path, exp_number.zfill(4))
+
+    # 传感器 SN，任意数量
+    sensors = args.sensors
+
+    # 触觉采集器：Tac3D 每一帧写入各自的数据流，机械手状态单独写一个数据流
+    recorder = TacRecorder(
+        sub_folder,
+        sensors,
+        chunk_size=args.chunk_size,
+        ring_capacity=args.ring_capacity,
+        hand_capacity=args.hand_capacity,
+        codec=args.codec,
+        error_bounds={"P": args.pos_error, "D": args.pos_error, "F": args.force_error},
+        pre_trigger_s=args.pre_trigger,
+        features=not args.no_features,
+        contact_threshold=args.contact_threshold,
+        queue_policy=args.queue_policy,
+    ).start()
+
+    # 真机使用 SDK，--replay 时使用本地替身（配合 tac_replay.py 发送数据）
+    if args.replay:
+        from tac_replay import FakeDexHandClient as DexHandClient
+        from tac_replay import ReplaySensor as Tac3DSensor
+    else:
+        from dexhand_client import DexHandClient
+        sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Tac-3D/DexHand-SDK-v1.1/pyDexHandClient/examples')))
+        from PyTac3D import Sensor as Tac3DSensor
 
     # 创建机械手客户端
-    client = DexHandClient(ip="192.168.2.100", port=60031, recvCallback_hand=HandRecvCallback)
-    # 创建传感器数据存储实例
-    Tac3D_name1 = "HDL1-GWH0017"
-    Tac3D_name2 = "HDL1-GWH0018"
-    tacinfo1 = Tac3D_info(Tac3D_name1)
-    tacinfo2 = Tac3D_info(Tac3D_name2)
-    tac_dict = {Tac3D_name1: tacinfo1, Tac3D_name2: tacinfo2}
+    client = DexHandClient(ip="192.168.2.100", port=60031, recvCallback_hand=recorder.hand_callback)
     # 创建传感器实例
-    tac3d = PyTac3D.Sensor(recvCallback=Tac3DRecvCallback, port=9988, maxQSize=5, callbackParam=tac_dict)
+    tac3d = Tac3DSensor(recvCallback=recorder.tac_callback, port=args.port, maxQSize=5)
+    # 实验事件日志，替代 grasp_time.txt
+    events = EventLog(sub_folder)
     # 启动机械手
     client.start_server()
     client.acquire_hand()
     client.set_home()
     client.calibrate_force_zero()
-    tac3d.calibrate(Tac3D_name1)
-    tac3d.calibrate(Tac3D_name2)
+    events.log("calibrate", target="hand_force_zero")
+    for SN in sensors:
+        tac3d.calibrate(SN)
+        events.log("calibrate", target=SN)
 
+    controller = None
     print("Press 'z' to execute contact and grasp commands...")
     while True:
         key = input("Input key: ").strip().lower()
         if key == "z":
-            client.contact(contact_speed=8, preload_force=2, quick_move_speed=15, quick_move_pos=10)
-            client.grasp(goal_force=8.0, load_time=5.0)
-            print("Contact and grasp commands executed.")
-            grasp_executed = True  # 设置标志为 True
-            current_time = int(1000 * round(time.time(), 3))
-            
-            # 保存时间戳到与 pkl 文件相同的文件夹
-            sub_folder = os.path.join(folder_path, exp_number.zfill(4))
-
-            # 确保子文件夹存在
-            if not os.path.exists(sub_folder):
-                os.makedirs(sub_folder)
-
-            time_file_path = os.path.join(sub_folder, "grasp_time.txt")
+            # 触发写盘：按键前 pre_trigger 秒内的数据一次写入，之后持续写盘
+            trigger = recorder.trigger("grasp")
+            events.log("trigger", host_ms=trigger["host_ms"], pre_trigger_s=args.pre_trigger)
             try:
-                with open(time_file_path, "a") as file:
-                    file.write(f"{current_time}\n")
+                events.log("contact", contact_speed=8, preload_force=2)
+                client.contact(contact_speed=8, preload_force=2, quick_move_speed=15, quick_move_pos=10)
+                client.grasp(goal_force=8.0, load_time=5.0)
             except Exception as e:
-                print(f"Failed to save timestamp: {e}")
+                events.error(e, during="grasp")
+                print(f"Grasp failed: {e}")
                 break
-            print(f"Time saved to {time_file_path}")
+            # grasp 事件开始一个片段，配对时只使用片段内的数据
+            events.log("grasp", goal_force=8.0, load_time=5.0)
+            print("Contact and grasp commands executed.")
+            if args.slip_control:
+                # 夹持后根据滑动检测闭环调整夹持力
+                controller = SlipController(recorder, client, goal_force=8.0, budget_ms=args.slip_budget_ms).start()
             break
         elif key == "f":
             client.pos_goto(10)
@@ -175,8 +190,13 @@ if __name__ == "__main__":
     print("Press 'f' to release hand...")
     while True:
         key = input("Input key: ").strip().lower()
+        if controller is not None:
+            # 松开前停止闭环，避免再次加力
+            print(f"Slip control stats: {controller.stop()}")
+            controller = None
         if key == "f":
             client.pos_goto(10)
+            events.log("release", pos=10)
         break
 
     print("Press 'q' to finish controling hand...")
@@ -184,6 +204,13 @@ if __name__ == "__main__":
         key = input("Input key: ").strip().lower()
         if key == "q":
             client.release_hand()
+            events.log("stop")
             print("Hand control released.")
             break
+
+    # 等待剩余数据写完
+    stats = recorder.close()
+    events.close()
+    print(f"Recorder stats: {stats}")
+    print(f"Events saved to {events.path}")
 # python scripts/H01TacData.py --folder_path data_save/tac_data --exp_number 4
\ No newline at end of file
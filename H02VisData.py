@@ -1,30 +1,39 @@
-import pyrealsense2 as rs
-import numpy as np
+"""
+两个 RealSense 相机的视觉采集，数据分别保存到 base_folder 和 base_folder515 下的实验文件夹。
+采集、对齐和写盘流程见 vis_recorder.py；数据源可以是实时相机、实验文件夹中录制的 .bag 或合成数据，
+--source synthetic 不需要相机和 pyrealsense2，用于测量采集链路的帧率和延迟。
+"""
+
 import os
-import pickle
-import time
 import argparse
-import threading
-import sys
-import select
-
-
-class Realsense:
-    def __init__(self, base_folder="data_save/vis_data", base_folder515="data_save/vis_data515", exp_number="0001"):
-        # 初始化 RealSense 管道
-        self.pipeline_list = []
-        self.config_list = []
-        self.connect_device = []
+import json
+from frame_writer import POLICIES
+from vis_recorder import VisRecorder
+from vis_source import SyntheticSource, SOURCE_KINDS
+from vis_storage import VisEncoder, STORAGE_KINDS, COLOR_FORMATS, DEPTH_FORMATS
+from vis_video import VIDEO_FORMATS
+from vis_roi import CaptureROI, parse_roi
 
-        # 连接设备并获取可用设备列表
-        for d in rs.context().devices:
-            if d.get_info(rs.camera_info.name).lower() != 'platform camera':
-                self.connect_device.append(d.get_info(rs.camera_info.serial_number))
+CAMERA_FPS = 30
+# 每个相机的 (颜色图, 深度图) 分辨率，与实机配置一致
+CAMERA_SIZES = [((640, 480), (640, 480)), ((1280, 720), (640, 480))]
 
-        # 确保至少有两个相机连接
-        if len(self.connect_device) < 2:
-            raise Exception("至少需要两个 RealSense 相机")
 
+class Realsense(VisRecorder):
+    """
+    Args:
+        base_folder (str): 第一个相机的数据保存路径。
+        base_folder515 (str): 第二个相机的数据保存路径。
+        exp_number (str): 实验编号。
+        source (str): 'live'、'bag' 或 'synthetic'。
+        record_bag (bool): 实时采集时只由 SDK 录制 .bag，不对齐和写盘。
+        realtime (bool): 回放 .bag 时是否按录制时的速度播放。
+        global_time (bool): 是否打开相机的 global_time_enabled，让硬件时间戳由 SDK 换算到主机时钟域。
+        synthetic (dict): 合成数据源的参数，见 SyntheticSource。
+        kwargs: 传给 VisRecorder 的参数（队列、对齐、存储、视频等）。
+    """
+    def __init__(self, base_folder="data_save/vis_data", base_folder515="data_save/vis_data515", exp_number="0001",
+                 source="live", record_bag=False, realtime=True, global_time=True, synthetic=None, **kwargs):
         # 设置数据保存路径
         self.base_folder = base_folder
         self.base_folder515 = base_folder515
@@ -33,113 +42,29 @@ class Realsense:
         self.data_folder515 = os.path.join(self.base_folder515, self.exp_number)
         os.makedirs(self.data_folder, exist_ok=True)
         os.makedirs(self.data_folder515, exist_ok=True)
+        data_folders = [self.data_folder, self.data_folder515]
 
-        # 配置每个相机
-        for i in range(len(self.connect_device)):
-            pipeline = rs.pipeline()
-            config = rs.config()
-            config.enable_device(self.connect_device[i])
-            if i == 1:
-                config.enable_stream(rs.stream.color, 1280, 720, rs.format.bgr8, 30)
-            else:
-                config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-            config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-            
-            self.pipeline_list.append(pipeline)
-            self.config_list.append(config)
-            # 启动管道
-            pipeline.start(config)
-
-        # 对齐对象
-        self.align_to = rs.stream.color
-        self.align = rs.align(self.align_to)
-
-        self.running = True
-
-    def stop_on_keypress(self):
-        """监听标准输入，当用户输入 's' 并按下回车时停止运行"""
-        print("Press 's' and Enter to stop...")
-        while self.running:
-            if sys.stdin in select.select([sys.stdin], [], [], 0)[0]:
-                user_input = sys.stdin.readline().strip()
-                if user_input.lower() == 's':
-                    print("Stopping RealSense...")
-                    self.running = False  # 设置为 False，通知主线程停止
-                    break
-
-    def save_data(self, depth_image, color_image, color_timestamp):
-        # Prepare data dictionary
-        data = {
-            "depth_image": depth_image,
-            "color_image": color_image,
-        }
-        
-        # 使用 color_timestamp 作为文件名
-        file_name = f"{color_timestamp}.pkl"
-        file_path = os.path.join(self.data_folder, file_name)
-        
-        # 保存数据到文件
-        with open(file_path, "wb") as f:
-            pickle.dump(data, f)
-
-    def save_data515(self, depth_image, color_image, color_timestamp):
-        # Prepare data dictionary
-        data = {
-            "depth_image": depth_image,
-            "color_image": color_image,
-        }
-        
-        # 使用 color_timestamp 作为文件名
-        file_name = f"{color_timestamp}.pkl"
-        file_path = os.path.join(self.data_folder515, file_name)
-        
-        # 保存数据到文件
-        with open(file_path, "wb") as f:
-            pickle.dump(data, f)
-
-    def run(self):
-        # 在单独的线程中监听键盘输入
-        stop_thread = threading.Thread(target=self.stop_on_keypress)
-        stop_thread.daemon = True  # 设置为守护线程，确保主线程结束时它也会结束
-        stop_thread.start()
-
-        try:
-            while self.running:
-                for i, pipeline in enumerate(self.pipeline_list):
-                    # 从每个相机获取颜色和深度帧
-                    frames = pipeline.wait_for_frames()
-
-                    # 对齐深度帧到颜色帧
-                    aligned_frames = self.align.process(frames)
+        if source == "synthetic":
+            sources = [
+                SyntheticSource(f"SYN-{i:04d}", color_size, depth_size, seed=i, **(synthetic or {}))
+                for i, (color_size, depth_size) in enumerate(CAMERA_SIZES)
+            ]
+        elif source == "bag":
+            from realsense_source import bag_sources
+            sources = bag_sources(data_folders, realtime=realtime)
+        else:
+            from realsense_source import RealsenseSource, connected_serials
+            self.connect_device = connected_serials(global_time)
+            # 确保至少有两个相机连接
+            if len(self.connect_device) < 2:
+                raise Exception("至少需要两个 RealSense 相机")
+            sources = [
+                RealsenseSource(serial, color_size, depth_size, CAMERA_FPS,
+                                record_file=os.path.join(folder, f"{serial}.bag") if record_bag else None)
+                for serial, (color_size, depth_size), folder in zip(self.connect_device, CAMERA_SIZES, data_folders)
+            ]
+        super().__init__(sources, data_folders, video_fps=CAMERA_FPS, **kwargs)
 
-                    # 获取对齐的帧
-                    aligned_depth_frame = aligned_frames.get_depth_frame()
-                    color_frame = aligned_frames.get_color_frame()
-                    
-
-                    # 验证帧的有效性
-                    if not aligned_depth_frame or not color_frame:
-                        continue
-
-                    # 获取时间戳
-                    color_timestamp = str(int(round(time.time(),3)*1000))  # 颜色帧时间戳
-
-                    # 转换数据为 NumPy 数组
-                    depth_image = np.asanyarray(aligned_depth_frame.get_data())
-                    color_image = np.asanyarray(color_frame.get_data())
-                    
-                    # 保存数据
-                    if i == 0:
-                        self.save_data(depth_image, color_image, color_timestamp)
-                    elif i == 1:
-                        self.save_data515(depth_image, color_image, color_timestamp)
-                time.sleep(0.05)
-
-        finally:
-            self.running = False  # 确保停止运行
-            for pipeline in self.pipeline_list:
-                pipeline.stop()  # 停止每个相机的流
-            print("All pipelines stopped.")
 
 def main():
     # 使用 argparse 获取命令行参数
@@ -162,13 +87,217 @@ def main():
         required=True,
         help="Experiment number (e.g., '0001', '0002')."
     )
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        default=64,
+        help="Max frames buffered in each align queue and in the writer queue (default: 64)."
+    )
+    parser.add_argument(
+        "--align_workers",
+        type=int,
+        default=2,
+        help="Number of alignment threads per camera (default: 2)."
+    )
+    parser.add_argument(
+        "--writer_threads",
+        type=int,
+        default=2,
+        help="Number of threads writing frames to disk (default: 2)."
+    )
+    parser.add_argument(
+        "--queue_policy",
+        type=str,
+        default="drop_oldest",
+        choices=POLICIES,
+        help="What to do when a queue is full (default: 'drop_oldest')."
+    )
+    parser.add_argument(
+        "--pool_size",
+        type=int,
+        default=0,
+        help="Preallocated buffers per stream, 0 sizes the pool from the queue and thread counts (default: 0)."
+    )
+    parser.add_argument(
+        "--roi",
+        type=str,
+        default=None,
+        help="Region of interest 'x,y,w,h' in the first camera's color image (default: full image)."
+    )
+    parser.add_argument(
+        "--roi515",
+        type=str,
+        default=None,
+        help="Region of interest 'x,y,w,h' in the second camera's color image (default: full image)."
+    )
+    parser.add_argument(
+        "--decimation",
+        type=int,
+        default=1,
+        help="Keep every n-th pixel of the first camera after cropping (default: 1)."
+    )
+    parser.add_argument(
+        "--decimation515",
+        type=int,
+        default=1,
+        help="Keep every n-th pixel of the second camera after cropping (default: 1)."
+    )
+    parser.add_argument(
+        "--depth_range",
+        type=float,
+        nargs=2,
+        default=None,
+        metavar=("NEAR", "FAR"),
+        help="Zero the first camera's depth outside [NEAR, FAR] meters (default: keep all)."
+    )
+    parser.add_argument(
+        "--depth_range515",
+        type=float,
+        nargs=2,
+        default=None,
+        metavar=("NEAR", "FAR"),
+        help="Zero the second camera's depth outside [NEAR, FAR] meters (default: keep all)."
+    )
+    parser.add_argument(
+        "--no_global_time",
+        action="store_true",
+        help="Keep the cameras' hardware clock domain instead of enabling global time."
+    )
+    parser.add_argument(
+        "--defer_align",
+        action="store_true",
+        help="Save raw depth plus calibration and align offline with vis_align.py."
+    )
+    parser.add_argument(
+        "--storage",
+        type=str,
+        default="raw",
+        choices=STORAGE_KINDS,
+        help="'raw' pickles the arrays, 'compressed' encodes images in the writer threads (default: 'raw')."
+    )
+    parser.add_argument(
+        "--color_format",
+        type=str,
+        default="jpeg",
+        choices=COLOR_FORMATS,
+        help="Color encoding for compressed storage (default: 'jpeg')."
+    )
+    parser.add_argument(
+        "--color_quality",
+        type=int,
+        default=90,
+        help="JPEG/WebP quality 1-100 for compressed storage (default: 90)."
+    )
+    parser.add_argument(
+        "--depth_format",
+        type=str,
+        default="png",
+        choices=DEPTH_FORMATS,
+        help="Lossless depth encoding for compressed storage, 'png' (16-bit) or 'zstd' (default: 'png')."
+    )
+    parser.add_argument(
+        "--depth_level",
+        type=int,
+        default=1,
+        help="Depth compression level, 0-9 for png and 1-22 for zstd (default: 1)."
+    )
+    parser.add_argument(
+        "--color_video",
+        action="store_true",
+        help="Write each camera's color stream into segmented video files with a timestamp index."
+    )
+    parser.add_argument(
+        "--segment_s",
+        type=float,
+        default=60.0,
+        help="Length of each video segment in seconds (default: 60)."
+    )
+    parser.add_argument(
+        "--video_format",
+        type=str,
+        default="mp4",
+        choices=tuple(VIDEO_FORMATS),
+        help="Video container for --color_video (default: 'mp4')."
+    )
+    parser.add_argument(
+        "--record_bag",
+        action="store_true",
+        help="Only record raw streams to <serial>.bag in each camera folder (near-zero CPU)."
+    )
+    parser.add_argument(
+        "--source",
+        type=str,
+        default="live",
+        choices=SOURCE_KINDS,
+        help="'live' cameras, 'bag' plays back the .bag files in the experiment folders, "
+             "'synthetic' generates frames without hardware (default: 'live')."
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="Play back as fast as possible instead of in real time (use with --queue_policy block)."
+    )
+    parser.add_argument(
+        "--fps",
+        type=float,
+        default=CAMERA_FPS,
+        help="Frame rate of the synthetic source (default: 30)."
+    )
+    parser.add_argument(
+        "--jitter_ms",
+        type=float,
+        default=0.0,
+        help="Std of the synthetic frame arrival jitter in ms (default: 0)."
+    )
+    parser.add_argument(
+        "--loss",
+        type=float,
+        default=0.0,
+        help="Probability that the synthetic source drops a frame (default: 0)."
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=1,
+        help="Consecutive synthetic frames dropped per loss (default: 1)."
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=None,
+        help="Seconds of synthetic frames to generate (default: until 's')."
+    )
     args = parser.parse_args()
 
+    # 合成数据源的参数，--duration 换算为帧数
+    synthetic = {
+        "fps": args.fps,
+        "jitter_ms": args.jitter_ms,
+        "loss": args.loss,
+        "burst": args.burst,
+        "num_frames": int(args.duration * args.fps) if args.duration else None,
+    }
+
+    # 每个相机的裁剪、降采样和深度范围
+    rois = [
+        CaptureROI(parse_roi(args.roi), args.decimation, args.depth_range),
+        CaptureROI(parse_roi(args.roi515), args.decimation515, args.depth_range515),
+    ]
+
     # 使用传入的文件夹路径和实验编号运行
-    realsense = Realsense(base_folder=args.base_folder, base_folder515=args.base_folder515, exp_number=args.exp_number)
-    realsense.run()
+    realsense = Realsense(base_folder=args.base_folder, base_folder515=args.base_folder515, exp_number=args.exp_number,
+                          source=args.source, record_bag=args.record_bag, realtime=not args.fast,
+                          global_time=not args.no_global_time, synthetic=synthetic,
+                          queue_size=args.queue_size, align_workers=args.align_workers,
+                          writer_threads=args.writer_threads, queue_policy=args.queue_policy,
+                          pool_size=args.pool_size or None, rois=rois,
+                          defer_align=args.defer_align, storage=args.storage,
+                          encoder=VisEncoder(args.color_format, args.color_quality, args.depth_format, args.depth_level),
+                          color_video=args.color_video, segment_s=args.segment_s, video_format=args.video_format)
+    stats = realsense.run()
+    print(f"Recorder stats: {json.dumps(stats, indent=2)}")
 
 if __name__ == "__main__":
     main()
 
-# python scripts/H02VisData.py --base_folder data_save/vis_data --base_folder515 data_save/vis_data515 --exp_number 1
\ No newline at end of file
+# python scripts/H02VisData.py --base_folder data_save/vis_data --base_folder515 data_save/vis_data515 --exp_number 1
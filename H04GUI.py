@@ -5,10 +5,27 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 import argparse
+from tac_episode import is_tac_episode, TacEpisode, as_stacked
 
-# Global variables to store P1 and P2 from the first pickle file
-global_P1 = None
-global_P2 = None
+# Global variable to store the stacked P (S, 400, 3) of the first frame
+global_P = None
+
+def load_episode_P(folder_path, i):
+    """
+    Load P of frame i from every sensor stream of a TacRecorder episode, stacked as (S, 400, 3).
+    Returns None if any stream has no frames yet.
+    """
+    episode = TacEpisode(folder_path)
+    streams = [episode.streams[SN] for SN in episode.sensors]
+    if any(len(stream) == 0 for stream in streams):
+        return None
+    return np.stack([np.array(stream["P"][i]) for stream in streams])
+
+def load_pickle_P(file_path):
+    """Load P from a pickle file, stacked as (S, 400, 3)."""
+    with open(file_path, 'rb') as f:
+        data = pickle.load(f)
+    return as_stacked(data).get("P", np.zeros((0, 0, 3)))
 
 def load_first_pickle(folder_path):
     """
@@ -21,15 +38,18 @@ def load_first_pickle(folder_path):
             time.sleep(1)  # 等待1秒后再次检查
             continue
 
+        if is_tac_episode(folder_path):
+            P = load_episode_P(folder_path, 0)
+            if P is not None:
+                return P
+            print("No frames found, waiting...")
+            time.sleep(1)
+            continue
+
         files = [f for f in os.listdir(folder_path) if f.endswith('.pkl')]
         if files:
             first_file = min(files, key=lambda x: os.path.getctime(os.path.join(folder_path, x)))
-            file_path = os.path.join(folder_path, first_file)
-            
-            with open(file_path, 'rb') as f:
-                data = pickle.load(f)
-            
-            return data.get("P1", np.zeros((0, 2))), data.get("P2", np.zeros((0, 2)))
+            return load_pickle_P(os.path.join(folder_path, first_file))
         
         print("No files found, waiting...")
         time.sleep(1)  # 等待1秒后再次检查
@@ -40,43 +60,39 @@ def load_latest_pickle(folder_path):
     If no file is found, wait until one is available.
     """
     while True:
+        if is_tac_episode(folder_path):
+            # 每次重新读取 meta，获取采集过程中新写入的帧
+            P = load_episode_P(folder_path, -1)
+            if P is not None:
+                return P
+            print("No frames found, waiting...")
+            time.sleep(1)
+            continue
+
         files = [f for f in os.listdir(folder_path) if f.endswith('.pkl')]
         if files:
             latest_file = max(files, key=lambda x: os.path.getctime(os.path.join(folder_path, x)))
-            file_path = os.path.join(folder_path, latest_file)
-            
-            with open(file_path, 'rb') as f:
-                data = pickle.load(f)
-            
-            return data.get("P1", np.zeros((0, 2))), data.get("P2", np.zeros((0, 2)))
+            return load_pickle_P(os.path.join(folder_path, latest_file))
 
         print("No files found, waiting...")
         time.sleep(1)  # 等待1秒后再次检查
-def update(frame, folder_path, scatter_left, quiver_left, scatter_right, quiver_right):
-    global global_P1, global_P2
-
-    data = load_latest_pickle(folder_path)
-    if data:
-        P1, P2 = data  # 解包返回的元组
 
-        delt_P1 = P1 - global_P1
-        delt_P2 = P2 - global_P2
+def update(frame, folder_path, axes, scatters, quivers):
+    P = load_latest_pickle(folder_path)
+    if P is None:
+        return scatters, quivers
 
-        # 更新左侧图的散点和箭头
-        scatter_left.set_offsets(global_P1[:, :2])
-        if quiver_left[0] is not None:
-            quiver_left[0].remove()
-        quiver_left[0] = ax_left.quiver(global_P1[:, 0], global_P1[:, 1], delt_P1[:, 0], delt_P1[:, 1],
-                                         angles='xy', scale_units='xy', scale=1, color='r', linewidth=2)
+    delt_P = P - global_P  # (S, 400, 3)，所有传感器一起计算
 
-        # 更新右侧图的散点和箭头
-        scatter_right.set_offsets(global_P2[:, :2])
-        if quiver_right[0] is not None:
-            quiver_right[0].remove()
-        quiver_right[0] = ax_right.quiver(global_P2[:, 0], global_P2[:, 1], delt_P2[:, 0], delt_P2[:, 1],
-                                           angles='xy', scale_units='xy', scale=1, color='r', linewidth=2)
+    # 更新每个传感器子图的散点和箭头
+    for k, ax in enumerate(axes):
+        scatters[k].set_offsets(global_P[k, :, :2])
+        if quivers[k] is not None:
+            quivers[k].remove()
+        quivers[k] = ax.quiver(global_P[k, :, 0], global_P[k, :, 1], delt_P[k, :, 0], delt_P[k, :, 1],
+                               angles='xy', scale_units='xy', scale=1, color='r', linewidth=2)
 
-    return scatter_left, quiver_left, scatter_right, quiver_right
+    return scatters, quivers
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Real-time 2D Visualization of Tac3D Data.")
@@ -97,31 +113,24 @@ if __name__ == "__main__":
     # Create the path to the specific experiment folder
     exp_folder_path = os.path.join(args.folder_path, args.exp_number.zfill(4))
 
-    # Load the first P1 and F1
-    global_P1, global_P2 = load_first_pickle(exp_folder_path)
-
-    # 设置图形和两个子图
-    fig, (ax_left, ax_right) = plt.subplots(1, 2, figsize=(10, 5))
+    # Load the first P of all sensors
+    global_P = load_first_pickle(exp_folder_path)
+    num_sensors = len(global_P)
 
-    # 设置左侧图的标签和标题
-    ax_left.set_xlabel('X (P1)')
-    ax_left.set_ylabel('Y (P1)')
-    ax_left.set_title('Left Plot: P1')
-
-    # 设置右侧图的标签和标题
-    ax_right.set_xlabel('X (P2)')
-    ax_right.set_ylabel('Y (P2)')
-    ax_right.set_title('Right Plot: P2')
+    # 每个传感器一个子图
+    fig, axes = plt.subplots(1, num_sensors, figsize=(5 * num_sensors, 5), squeeze=False)
+    axes = axes[0]
+    for k, ax in enumerate(axes):
+        ax.set_xlabel(f'X (P{k + 1})')
+        ax.set_ylabel(f'Y (P{k + 1})')
+        ax.set_title(f'Sensor {k + 1}: P{k + 1}')
 
     # 初始化散点和箭头
-    scatter_left = ax_left.scatter([], [])
-    quiver_left = [None]  # Initialize quiver for left
-
-    scatter_right = ax_right.scatter([], [])
-    quiver_right = [None]  # Initialize quiver for right
+    scatters = [ax.scatter([], []) for ax in axes]
+    quivers = [None] * num_sensors
 
     # 创建动画
-    ani = FuncAnimation(fig, update, fargs=(exp_folder_path, scatter_left, quiver_left, scatter_right, quiver_right), interval=100)
+    ani = FuncAnimation(fig, update, fargs=(exp_folder_path, axes, scatters, quivers), interval=100)
 
     plt.show()
 # python scripts/H07GUI.py --folder_path data_save/tac_data --exp_number 1
\ No newline at end of file
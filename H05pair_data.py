@@ -1,6 +1,11 @@
 import os
 import pickle
 import numpy as np
+from tac_episode import is_tac_episode, TacEpisode, as_stacked
+from event_log import load_segments, segment_slices
+from vis_clock import remap_timestamps
+from vis_storage import decode_frame
+from vis_video import has_video, SegmentedVideoReader
 
 # 路径配置
 vis_data_base_folder = "data_save/vis_data"  # 视觉数据基础路径
@@ -12,6 +17,8 @@ os.makedirs(output_base_folder, exist_ok=True)
 
 # 时间戳匹配限差（单位：毫秒）
 time_threshold = 100  # 允许的时间误差范围
+# 触觉数据使用时钟模型修正后的时间戳时，抖动更小，可以使用更严格的限差
+tac_time_threshold = 50
 
 def load_pickle_files(folder_path):
     """加载指定文件夹下所有的pickle文件，并根据时间戳排序"""
@@ -30,6 +37,48 @@ def load_pickle_files(folder_path):
     pickle_files.sort(key=lambda x: x[0])
     return pickle_files
 
+def load_vis_data(vis_folder):
+    """
+    加载视觉数据，压缩存储的图像解码为数组，颜色图保存在分段视频中时按时间戳从视频读取，
+    有 vis_clock.json 时用采集结束时的时钟映射重新换算时间戳。
+    """
+    frames = [(ts, decode_frame(data)) for ts, data in load_pickle_files(vis_folder)]
+    if has_video(vis_folder):
+        # 帧按时间戳排序，视频基本是顺序解码
+        reader = SegmentedVideoReader(vis_folder)
+        for ts, data in frames:
+            if "color_image" not in data:
+                match = reader.read(data.get("timestamp", ts), threshold=0)
+                if match is not None:
+                    data["color_image"] = match[1]
+        reader.close()
+        frames = [(ts, data) for ts, data in frames if "color_image" in data]
+    return remap_timestamps(vis_folder, frames)
+
+def load_tac_data(tac_folder):
+    """
+    加载触觉数据：优先读取 TacRecorder 的多数据流格式，旧数据仍按逐帧 pickle 读取。
+    两种格式的每帧数据都统一为按传感器堆叠的格式（P/D/F 为 (S, 400, 3)）。
+    返回 (数据列表, 是否使用了时钟模型修正后的时间戳)，基准传感器拟合不出时钟模型时时间戳没有修正。
+    """
+    if is_tac_episode(tac_folder):
+        episode = TacEpisode(tac_folder)
+        return episode.frames(corrected=True), episode.clock(episode.sensors[0]) is not None
+    return [(ts, as_stacked(data)) for ts, data in load_pickle_files(tac_folder)], False
+
+def trim_to_segments(data, segments):
+    """
+    只保留落在实验片段（grasp 到 release/stop）内的数据，data 为按时间戳排序的 (timestamp, value) 列表。
+    按片段二分查找下标范围，没有片段信息时原样返回。
+    """
+    if not segments:
+        return data
+    timestamps = [ts for ts, _ in data]
+    return [item for sl in segment_slices(timestamps, segments) for item in data[sl]]
+
+def is_aligned(vis_data):
+    """使用 --defer_align 采集、还没有运行 vis_align.py 的视觉数据只有原始深度图，不能直接配对。"""
+    return all("depth_image" in vis for _, vis in vis_data)
 
 def load_traj_data(traj_folder):
     """加载轨迹数据并提取时间戳和 O_T_EE 数据"""
@@ -49,7 +98,7 @@ def load_traj_data(traj_folder):
     traj_data.sort(key=lambda x: x[0])
     return traj_data
 
-def find_closest_match(vis_ts, data):
+def find_closest_match(vis_ts, data, threshold=time_threshold):
     """在数据中找到与视觉时间戳最接近的数据"""
     closest = None
     min_diff = float('inf')  # 初始化最小时间差为无穷大
@@ -60,14 +109,14 @@ def find_closest_match(vis_ts, data):
             min_diff = diff
             closest = (ts, value)
     
-    return closest if min_diff <= time_threshold else None
+    return closest if min_diff <= threshold else None
 
-def combine_data(vis_data, vis_data515, tac_data, traj_data, output_folder):
+def combine_data(vis_data, vis_data515, tac_data, traj_data, output_folder, tac_threshold=time_threshold):
     """根据时间戳匹配视觉、触觉和轨迹数据，并保存到新pickle文件中"""
     combined_count = 0
     for vis_ts, vis in vis_data:
         vis515_match = find_closest_match(vis_ts, vis_data515)
-        tac_match = find_closest_match(vis_ts, tac_data)
+        tac_match = find_closest_match(vis_ts, tac_data, tac_threshold)
         traj_match = find_closest_match(vis_ts, traj_data)
 
         # 仅在找到匹配的触觉和轨迹数据时保存
@@ -81,6 +130,9 @@ def combine_data(vis_data, vis_data515, tac_data, traj_data, output_folder):
                 "color_image": vis["color_image"],
                 "depth_image515": vis515["depth_image"],
                 "color_image515": vis515["color_image"],
+                # 采集时裁剪的 ROI（见 vis_roi.py），没有裁剪时为 None
+                "roi": vis.get("roi"),
+                "roi515": vis515.get("roi"),
                 "tac_data": tac,
                 "O_T_EE": otee
             }
@@ -112,15 +164,24 @@ if __name__ == "__main__":
         os.makedirs(output_folder, exist_ok=True)
 
         print(f"加载实验 {exp_number} 的视觉数据...")
-        vis_data = load_pickle_files(vis_folder)
+        vis_data = load_vis_data(vis_folder)
         print(f"视觉数据加载完成，共 {len(vis_data)} 帧！")
 
+        # 按事件日志中的片段裁剪，替代事后删除小于 grasp_time 的文件
+        segments = load_segments(tac_folder)
+        vis_data = trim_to_segments(vis_data, segments)
+        print(f"按 {len(segments)} 个片段裁剪后剩余 {len(vis_data)} 帧视觉数据！")
+
         print(f"加载实验 {exp_number} 的视觉数据...")
-        vis_data515 = load_pickle_files(vis_folder515)
+        vis_data515 = load_vis_data(vis_folder515)
         print(f"视觉数据加载完成，共 {len(vis_data)} 帧！")
 
+        if not (is_aligned(vis_data) and is_aligned(vis_data515)):
+            print(f"实验 {exp_number} 的深度图还没有对齐，请先运行 vis_align.py --exp_number {exp_number}，跳过...")
+            continue
+
         print(f"加载实验 {exp_number} 的触觉数据...")
-        tac_data = load_pickle_files(tac_folder)
+        tac_data, tac_corrected = load_tac_data(tac_folder)
         print(f"触觉数据加载完成，共 {len(tac_data)} 帧！")
 
         print(f"加载实验 {exp_number} 的轨迹数据...")
@@ -128,9 +189,7 @@ if __name__ == "__main__":
         print(f"轨迹数据加载完成，共 {len(traj_data)} 帧！")
 
         print(f"开始匹配并组合实验 {exp_number} 的数据...")
-        combine_data(vis_data, vis_data515, tac_data, traj_data, output_folder)
-
-        # print(f"删除实验 {exp_number} 中小于 grasp_time 的文件...")
-        # remove_files_below_threshold(output_folder, grasp_time)
+        tac_threshold = tac_time_threshold if tac_corrected else time_threshold
+        combine_data(vis_data, vis_data515, tac_data, traj_data, output_folder, tac_threshold)
 
         print(f"实验 {exp_number} 的数据处理完成！")
\ No newline at end of file
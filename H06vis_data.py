@@ -3,6 +3,7 @@ import pickle
 import numpy as np
 import matplotlib.pyplot as plt
 import cv2
+from tac_episode import as_stacked
 
 def load_pickle_file(file_path):
     with open(file_path, 'rb') as f:
@@ -10,7 +11,7 @@ def load_pickle_file(file_path):
 
 def process_and_plot_cal_data(input_base_folder, output_base_folder, x_range=(-50, 50), y_range=(-50, 50)):
     """
-    读取 cal_data 文件夹中的数据，绘制并保存视觉图像、触觉图像，以及 PP1 和 PP2 的二维图像。
+    读取 cal_data 文件夹中的数据，绘制并保存视觉图像、触觉图像，以及每个传感器 P 的二维图像。
     Args:
         input_base_folder (str): 包含 cal_data 的输入文件夹。
         output_base_folder (str): 保存绘图的输出文件夹。
@@ -33,8 +34,7 @@ def process_and_plot_cal_data(input_base_folder, output_base_folder, x_range=(-5
             print(f"No pickle files found in the input folder for experiment {exp_number}.")
             continue
 
-        first_frame = True
-        first_P1, first_P2 = None, None  # 存储第一帧的 P1 和 P2
+        first_P = None  # 存储第一帧所有传感器的 P，(S, 400, 3)
 
         for idx, file_name in enumerate(pickle_files):
             file_path = os.path.join(input_folder, file_name)
@@ -46,21 +46,19 @@ def process_and_plot_cal_data(input_base_folder, output_base_folder, x_range=(-5
             depth_image515 = data.get("depth_image515")
             color_image515 = data.get("color_image515")
 
-            # 获取触觉数据
-            tac_data = data.get("tac_data", {})
-            P1 = tac_data.get("P1")
-            P2 = tac_data.get("P2")
+            # 获取触觉数据，旧格式的 P1/P2 统一堆叠为 (S, 400, 3)
+            tac_data = as_stacked(data.get("tac_data", {}))
+            P = tac_data.get("P")
 
             # 如果视觉或触觉数据缺失，跳过处理
-            if depth_image is None or color_image is None or P1 is None:
+            if depth_image is None or color_image is None or P is None:
                 print(f"Skipping file {file_name} due to missing data.")
                 continue
+            P1 = P[0]
 
-            # 存储第一帧的 P1 和 P2
-            if first_frame:
-                first_P1 = P1
-                first_P2 = P2
-                first_frame = False
+            # 存储第一帧的 P
+            if first_P is None:
+                first_P = P
 
             # 绘制视觉图像
             try:
@@ -105,43 +103,37 @@ def process_and_plot_cal_data(input_base_folder, output_base_folder, x_range=(-5
 
             # 绘制并保存二维图像
             try:
-                plot_title = f"2D Plot of PP1 and PP2 ({file_name})"
+                plot_title = f"2D Plot of P ({file_name})"
                 save_path = os.path.join(output_folder, f"{file_name.split('.')[0]}_2d_plot.png")
-                plot_2d_data_with_two_subplots(first_P1, first_P2, P1, P2, plot_title, save_path, x_range, y_range)
+                plot_2d_data_per_sensor(first_P, P, plot_title, save_path, x_range, y_range)
             except Exception as e:
                 print(f"Error saving 2D plot for {file_name}: {e}")
 
-def plot_2d_data_with_two_subplots(first_P1, first_P2, P1, P2, title, save_path, x_range=(-50, 50), y_range=(-50, 50)):
-    if (P1 is None or P1.shape[1] < 2 or 
-        P2 is None or P2.shape[1] < 2):
+def plot_2d_data_per_sensor(first_P, P, title, save_path, x_range=(-50, 50), y_range=(-50, 50)):
+    """
+    每个传感器一个子图，蓝色为第一帧，红色为当前帧。
+    Args:
+        first_P (np.ndarray): 第一帧的 P，(S, 400, 3)。
+        P (np.ndarray): 当前帧的 P，(S, 400, 3)。
+    """
+    if (first_P is None or P is None or P.ndim != 3 or P.shape[-1] < 2
+            or first_P.shape != P.shape):
         print("Invalid data for 2D plotting.")
         return
 
-    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
-
-    # 左侧子图：P1
-    ax1 = axes[0]
-    ax1.scatter(first_P1[:, 0], first_P1[:, 1], c='blue', s=10, alpha=0.7, label="First Frame P1")  # 蓝色点
-    ax1.scatter(P1[:, 0], P1[:, 1], c='red', s=10, alpha=0.7, label="Current Frame P1")  # 红色点
-    ax1.set_xlim(x_range)
-    ax1.set_ylim(y_range)
-    ax1.set_xlabel('X Coordinate')
-    ax1.set_ylabel('Y Coordinate')
-    ax1.set_title("First Frame Data")
-    ax1.legend()
-    ax1.grid(True)
-
-    # 右侧子图：P2
-    ax2 = axes[1]
-    ax2.scatter(first_P2[:, 0], first_P2[:, 1], c='blue', s=10, alpha=0.7, label="First Frame P2")  # 蓝色点
-    ax2.scatter(P2[:, 0], P2[:, 1], c='red', s=10, alpha=0.7, label="Current Frame P2")  # 红色点
-    ax2.set_xlim(x_range)
-    ax2.set_ylim(y_range)
-    ax2.set_xlabel('X Coordinate')
-    ax2.set_ylabel('Y Coordinate')
-    ax2.set_title("Current Frame Data")
-    ax2.legend()
-    ax2.grid(True)
+    num_sensors = len(P)
+    fig, axes = plt.subplots(1, num_sensors, figsize=(8 * num_sensors, 6), squeeze=False)
+
+    for k, ax in enumerate(axes[0]):
+        ax.scatter(first_P[k, :, 0], first_P[k, :, 1], c='blue', s=10, alpha=0.7, label=f"First Frame P{k + 1}")  # 蓝色点
+        ax.scatter(P[k, :, 0], P[k, :, 1], c='red', s=10, alpha=0.7, label=f"Current Frame P{k + 1}")  # 红色点
+        ax.set_xlim(x_range)
+        ax.set_ylim(y_range)
+        ax.set_xlabel('X Coordinate')
+        ax.set_ylabel('Y Coordinate')
+        ax.set_title(f"Sensor {k + 1}")
+        ax.legend()
+        ax.grid(True)
 
     # 设置总标题
     fig.suptitle(title, fontsize=16)
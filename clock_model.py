@@ -0,0 +1,143 @@
+import threading
+import numpy as np
+
+
+class ClockModel:
+    """
+    在线拟合设备时间到主机时间的线性映射：host = drift * (device - device0) + offset + host0。
+    drift 和 offset 用递推最小二乘估计；min_residual 记录主机时间相对拟合直线的最小残差，
+    即传输延迟最小的那一帧（下包络），用它修正后的时间不含回调线程的排队抖动。
+    任意直线下的最小残差都在样本下凸包的顶点上取到，所以只保留凸包顶点，每次用当前的拟合重新计算下包络。
+    设备时间单位任意（drift 会把它换算到毫秒），主机时间单位为毫秒。
+    Args:
+        min_samples (int): 样本数达到该值后才开始跟踪下包络，太少时斜率估计不准会拉低下包络。
+        latency_ms (float): 设备打时间戳之前的固定延迟（毫秒），无法由时钟拟合得到，需要单独标定。
+    """
+    def __init__(self, min_samples=100, latency_ms=0.0):
+        self.min_samples = min_samples
+        self.latency_ms = float(latency_ms)
+        self.device0 = None
+        self.host0 = None
+        self.n = 0
+        # 以第一帧为原点的累加量，避免大数相减损失精度
+        self._sx = 0.0
+        self._sy = 0.0
+        self._sxx = 0.0
+        self._sxy = 0.0
+        self.min_residual = None
+        self._hull = []  # 样本 (x, y) 的下凸包顶点，按 x 排序
+        self._fixed = None  # 从保存结果恢复时固定的 (drift, offset)
+        self._lock = threading.Lock()
+
+    def update(self, device_t, host_t):
+        """加入一对 (设备时间, 主机时间) 样本。"""
+        if device_t is None or host_t is None:
+            return
+        with self._lock:
+            if self.device0 is None:
+                self.device0 = float(device_t)
+                self.host0 = float(host_t)
+            x = float(device_t) - self.device0
+            y = float(host_t) - self.host0
+            self.n += 1
+            self._sx += x
+            self._sy += y
+            self._sxx += x * x
+            self._sxy += x * y
+            self._add_hull_locked(x, y)
+            if self.n >= self.min_samples:
+                # 早期的拟合不准，每次用当前的拟合对全部样本（的凸包顶点）重新求下包络
+                drift, offset = self._fit_locked()
+                self.min_residual = min(hy - (drift * hx + offset) for hx, hy in self._hull)
+
+    def _add_hull_locked(self, x, y):
+        if self._hull and x < self._hull[-1][0]:
+            # 设备时间回退（很少见）时用凸包顶点和新样本重建
+            points = sorted(self._hull + [(x, y)])
+            self._hull = []
+            for px, py in points:
+                self._push_hull_locked(px, py)
+        else:
+            self._push_hull_locked(x, y)
+
+    def _push_hull_locked(self, x, y):
+        hull = self._hull
+        while len(hull) >= 2:
+            (x1, y1), (x2, y2) = hull[-2], hull[-1]
+            # 最后一个顶点不在 (x1, y1) 到新样本的连线下方时不再是下凸包的顶点
+            if (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1) > 0:
+                break
+            hull.pop()
+        hull.append((x, y))
+
+    def _fit_locked(self):
+        if self._fixed is not None:
+            return self._fixed
+        n = self.n
+        denom = n * self._sxx - self._sx * self._sx
+        if n < 2 or denom <= 0:
+            return 1.0, (self._sy - self._sx) / max(n, 1)
+        drift = (n * self._sxy - self._sx * self._sy) / denom
+        offset = (self._sy - drift * self._sx) / n
+        return drift, offset
+
+    @property
+    def ready(self):
+        return self.n >= self.min_samples
+
+    def fit(self):
+        """返回 (drift, offset)，offset 为以 device0/host0 为原点的截距（毫秒）。"""
+        with self._lock:
+            return self._fit_locked()
+
+    def predict(self, device_t):
+        """把设备时间换算为主机时间（毫秒），支持标量和数组。"""
+        with self._lock:
+            drift, offset = self._fit_locked()
+            min_residual = self.min_residual or 0.0
+        x = np.asarray(device_t, dtype=np.float64) - self.device0
+        return drift * x + offset + min_residual + self.host0 - self.latency_ms
+
+    def to_dict(self):
+        """保存到 episode meta 中的拟合结果。"""
+        with self._lock:
+            drift, offset = self._fit_locked()
+            return {
+                "drift": drift,
+                "offset": offset,
+                "min_residual": self.min_residual or 0.0,
+                "device0": self.device0,
+                "host0": self.host0,
+                "latency_ms": self.latency_ms,
+                "samples": self.n,
+            }
+
+    @classmethod
+    def from_dict(cls, d):
+        """从保存的拟合结果恢复，只用于 predict。"""
+        model = cls(min_samples=0, latency_ms=d.get("latency_ms", 0.0))
+        model.device0 = d["device0"]
+        model.host0 = d["host0"]
+        model.n = d["samples"]
+        model.min_residual = d.get("min_residual", 0.0)
+        model._fixed = (d["drift"], d["offset"])
+        return model
+
+    @classmethod
+    def from_samples(cls, device_t, host_t, latency_ms=0.0):
+        """离线用整段数据拟合，例如采集中断、meta 中没有保存拟合结果时。"""
+        model = cls(min_samples=2, latency_ms=latency_ms)
+        device_t = np.asarray(device_t, dtype=np.float64)
+        host_t = np.asarray(host_t, dtype=np.float64)
+        if len(device_t) == 0:
+            return model
+        model.device0 = float(device_t[0])
+        model.host0 = float(host_t[0])
+        x = device_t - model.device0
+        y = host_t - model.host0
+        model.n = len(x)
+        model._sx, model._sy = float(x.sum()), float(y.sum())
+        model._sxx, model._sxy = float((x * x).sum()), float((x * y).sum())
+        drift, offset = model._fit_locked()
+        model.min_residual = float(np.min(y - (drift * x + offset)))
+        return model
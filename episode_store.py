@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from tac_codec import FieldCodec, DecodedArray
+
+# 一个 episode 对应一个文件夹：meta.json 记录字段信息，每个字段一个追加写入的 .bin 文件
+META_FILE = "meta.json"
+INDEX_FIELD = "timestamp"  # int64 时间戳索引列（毫秒）
+
+
+def is_episode(folder):
+    """判断文件夹是否为 episode 存储格式。"""
+    return os.path.exists(os.path.join(folder, META_FILE))
+
+
+def write_json(path, data):
+    # 先写临时文件再替换，避免读取端读到写了一半的 meta
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class EpisodeWriter:
+    """
+    按块追加写入的 episode 存储。每个字段在内存中预分配一个 (chunk_size, *shape) 的缓冲区，
+    写满一块（或超过 flush_interval）后整体追加到对应的 .bin 文件中。
+    Args:
+        folder (str): episode 文件夹路径。
+        fields (dict): 字段名 -> (shape, dtype)，例如 {"P1": ((400, 3), "float32")}。
+        chunk_size (int): 每次写盘的帧数。
+        flush_interval (float): 缓冲区中最老的数据超过该时间（秒）时提前写盘，0 表示只按块写。
+        attrs (dict): 额外保存在 meta.json 中的信息。
+        codecs (dict): 字段名 -> FieldCodec，这些字段以压缩编码保存，参考帧单独保存为 <name>.ref.npy。
+        on_flush (callable): 每块写盘后调用 on_flush({字段名: 本块数据})，用于统计写盘延迟等。
+    """
+    def __init__(self, folder, fields, chunk_size=64, flush_interval=0.5, attrs=None, codecs=None,
+                 on_flush=None):
+        os.makedirs(folder, exist_ok=True)
+        if is_episode(folder):
+            raise FileExistsError(f"Episode already exists in {folder}")
+        self.folder = folder
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.attrs = dict(attrs or {})
+        self.codecs = dict(codecs or {})
+        self.on_flush = on_flush
+
+        # 编码字段在文件中以编码后的 dtype 保存
+        self.fields = {INDEX_FIELD: ((), np.dtype("int64"))}
+        for name, (shape, dtype) in fields.items():
+            codec = self.codecs.get(name)
+            self.fields[name] = (tuple(shape), codec.dtype if codec else np.dtype(dtype))
+
+        # 预分配每个字段的块缓冲区
+        self._buffers = {
+            name: np.zeros((chunk_size,) + shape, dtype=dtype)
+            for name, (shape, dtype) in self.fields.items()
+        }
+        self._files = {
+            name: open(os.path.join(folder, f"{name}.bin"), "ab")
+            for name in self.fields
+        }
+        self._fill = 0  # 当前块中已填充的帧数
+        self._first_pending = None  # 当前块中第一帧进入缓冲区的时间
+        self.count = 0  # 已写盘的帧数
+        self._lock = threading.Lock()
+        self._closed = False
+        self._write_meta()
+
+    def append(self, timestamp, **values):
+        """追加一帧数据，未给出的字段保持为 0。"""
+        with self._lock:
+            row = self._fill
+            self._buffers[INDEX_FIELD][row] = timestamp
+            for name, value in values.items():
+                if value is not None:
+                    self._buffers[name][row] = self._encode(name, value, batch=False)
+            self._fill += 1
+            if self._first_pending is None:
+                self._first_pending = time.monotonic()
+            if self._fill >= self.chunk_size or (
+                self.flush_interval and time.monotonic() - self._first_pending >= self.flush_interval
+            ):
+                self._flush_locked()
+
+    def append_batch(self, timestamps, **values):
+        """一次追加多帧，values 中每个数组的第一维为帧数。"""
+        timestamps = np.asarray(timestamps)
+        total = len(timestamps)
+        with self._lock:
+            values = {
+                name: self._encode(name, value, batch=True)
+                for name, value in values.items() if value is not None
+            }
+            start = 0
+            while start < total:
+                n = min(self.chunk_size - self._fill, total - start)
+                rows = slice(self._fill, self._fill + n)
+                self._buffers[INDEX_FIELD][rows] = timestamps[start:start + n]
+                for name, value in values.items():
+                    self._buffers[name][rows] = value[start:start + n]
+                self._fill += n
+                start += n
+                if self._first_pending is None:
+                    self._first_pending = time.monotonic()
+                if self._fill >= self.chunk_size:
+                    self._flush_locked()
+            if self._fill and self.flush_interval and time.monotonic() - self._first_pending >= self.flush_interval:
+                self._flush_locked()
+
+    def _encode(self, name, value, batch):
+        codec = self.codecs.get(name)
+        if codec is None:
+            return value
+        if codec.needs_ref:
+            # 第一帧作为参考帧，只保存一次
+            codec.set_ref(value[0] if batch else value)
+            np.save(os.path.join(self.folder, f"{name}.ref.npy"), codec.ref)
+        return codec.encode(value)
+
+    def update_attrs(self, **attrs):
+        """在采集过程中更新 meta.json 中的 attrs，可在任意线程中调用。"""
+        with self._lock:
+            self.attrs.update(attrs)
+            self._write_meta()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._fill == 0:
+            return
+        for name, f in self._files.items():
+            f.write(self._buffers[name][:self._fill].tobytes())
+            f.flush()
+        if self.on_flush is not None:
+            self.on_flush({name: buf[:self._fill] for name, buf in self._buffers.items()})
+        self.count += self._fill
+        self._fill = 0
+        self._first_pending = None
+        # 写完的缓冲区清零，避免缺失字段沿用上一块的数据
+        for buf in self._buffers.values():
+            buf.fill(0)
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {
+            "version": 1,
+            "count": self.count,
+            "chunk_size": self.chunk_size,
+            "index": INDEX_FIELD,
+            "fields": {
+                name: {"shape": list(shape), "dtype": dtype.str}
+                for name, (shape, dtype) in self.fields.items()
+            },
+            "codecs": {name: codec.to_dict() for name, codec in self.codecs.items()},
+            "attrs": self.attrs,
+        }
+        write_json(os.path.join(self.folder, META_FILE), meta)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._write_meta()
+            for f in self._files.values():
+                f.close()
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EpisodeReader:
+    """
+    读取 episode 存储，字段以 np.memmap 的形式返回 (T, *shape) 数组，不需要逐帧反序列化。
+    压缩编码的字段返回 DecodedArray，索引时才解码为 float32；raw() 返回编码后的原始数组。
+    采集过程中也可以读取，帧数以 meta.json 和各 .bin 文件中完整写入的帧数为准。
+    Args:
+        folder (str): episode 文件夹路径。
+        mmap (bool): True 时使用内存映射，False 时一次性读入内存。
+    """
+    def __init__(self, folder, mmap=True):
+        self.folder = folder
+        self.mmap = mmap
+        with open(os.path.join(folder, META_FILE), "r") as f:
+            self.meta = json.load(f)
+        self.attrs = self.meta.get("attrs", {})
+        self.fields = {
+            name: (tuple(info["shape"]), np.dtype(info["dtype"]))
+            for name, info in self.meta["fields"].items()
+        }
+        # 以各文件中完整写入的帧数为准（meta 可能落后于数据文件，或采集中途崩溃）
+        counts = []
+        for name, (shape, dtype) in self.fields.items():
+            frame_bytes = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+            counts.append(os.path.getsize(self._path(name)) // frame_bytes)
+        self.count = int(min(counts))
+        self.codecs = {}
+        for name, info in self.meta.get("codecs", {}).items():
+            ref_path = os.path.join(folder, f"{name}.ref.npy")
+            ref = np.load(ref_path) if os.path.exists(ref_path) else None
+            self.codecs[name] = FieldCodec.from_dict(info, ref)
+        self._cache = {}
+
+    def _path(self, name):
+        return os.path.join(self.folder, f"{name}.bin")
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def __getitem__(self, name):
+        codec = self.codecs.get(name)
+        if codec is not None:
+            return DecodedArray(self.raw(name), codec)
+        return self.raw(name)
+
+    def raw(self, name):
+        """字段在文件中保存的原始数组（编码字段不解码）。"""
+        if name not in self._cache:
+            shape, dtype = self.fields[name]
+            if self.count == 0:
+                arr = np.zeros((0,) + shape, dtype=dtype)
+            elif self.mmap:
+                arr = np.memmap(self._path(name), dtype=dtype, mode="r", shape=(self.count,) + shape)
+            else:
+                arr = np.fromfile(self._path(name), dtype=dtype,
+                                  count=self.count * int(np.prod(shape, dtype=np.int64)))
+                arr = arr.reshape((self.count,) + shape)
+            self._cache[name] = arr
+        return self._cache[name]
+
+    @property
+    def timestamps(self):
+        return self[INDEX_FIELD]
+
+    def frame(self, i):
+        """返回第 i 帧，格式与原来的单帧 pickle 字典一致。"""
+        return {
+            name: np.array(self[name][i]) if self.fields[name][0] else self[name][i].item()
+            for name in self.fields if name != INDEX_FIELD
+        }
+
+    def frames(self):
+        """按时间戳顺序返回 (timestamp, frame_dict) 列表。"""
+        order = np.argsort(self.timestamps, kind="stable")
+        return [(int(self.timestamps[i]), self.frame(i)) for i in order]
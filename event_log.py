@@ -0,0 +1,167 @@
+"""
+实验事件日志：每个实验文件夹一个只追加的 events.jsonl，每行一个带类型的事件，
+同时记录墙上时间（毫秒，与数据文件的时间戳一致）和单调时钟（纳秒，不受系统校时影响）。
+grasp 开始一个片段，release / stop 结束当前片段；片段的起止时间另存为 events_index.json，
+配对和裁剪时直接按片段取时间范围，不需要扫描文件或事后删除文件。
+"""
+
+import os
+import json
+import time
+import threading
+import numpy as np
+from episode_store import write_json
+
+EVENT_LOG_FILE = "events.jsonl"
+EVENT_INDEX_FILE = "events_index.json"
+LEGACY_GRASP_FILE = "grasp_time.txt"
+
+EVENT_TYPES = ("calibrate", "contact", "grasp", "release", "stop", "trigger", "error", "note")
+SEGMENT_START = ("grasp",)
+SEGMENT_END = ("release", "stop")
+
+
+def wall_time_ms():
+    return int(time.time() * 1000)
+
+
+class EventLog:
+    """
+    只追加的事件日志，可在多个线程中调用 log()。
+    Args:
+        folder (str): 实验文件夹。
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, EVENT_LOG_FILE)
+        self._lock = threading.Lock()
+        # 继续写已有的日志时恢复序号和片段
+        self.events = load_events(folder) if os.path.exists(self.path) else []
+        self.segments = build_segments(self.events)
+        self._file = open(self.path, "a")
+
+    @property
+    def current_segment(self):
+        """当前未结束的片段序号，没有时为 None。"""
+        if self.segments and self.segments[-1]["end_ms"] is None:
+            return self.segments[-1]["segment"]
+        return None
+
+    def log(self, event_type, **data):
+        """
+        写入一个事件并立即刷新到磁盘。
+        Args:
+            event_type (str): EVENT_TYPES 之一。
+            data: 事件的附加信息，需要能被 JSON 序列化。
+        Returns:
+            dict: 写入的事件。
+        """
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type '{event_type}', expected one of {EVENT_TYPES}")
+        with self._lock:
+            event = {
+                "seq": len(self.events),
+                "type": event_type,
+                "wall_ms": wall_time_ms(),
+                "mono_ns": time.monotonic_ns(),
+                "segment": None,
+                **data,
+            }
+            # 片段边界：grasp 开始新片段（先结束未结束的片段），release / stop 结束当前片段
+            if event_type in SEGMENT_START:
+                self._end_segment(event)
+                self.segments.append({"segment": len(self.segments), "start_ms": event["wall_ms"],
+                                      "end_ms": None, "start_seq": event["seq"], "end_seq": None})
+            event["segment"] = self.current_segment
+            if event_type in SEGMENT_END:
+                self._end_segment(event)
+
+            self._file.write(json.dumps(event) + "\n")
+            self._file.flush()
+            self.events.append(event)
+            if event_type in SEGMENT_START + SEGMENT_END:
+                write_json(os.path.join(self.folder, EVENT_INDEX_FILE), {"segments": self.segments})
+        return event
+
+    def _end_segment(self, event):
+        if self.current_segment is not None:
+            self.segments[-1]["end_ms"] = event["wall_ms"]
+            self.segments[-1]["end_seq"] = event["seq"]
+
+    def error(self, message, **data):
+        return self.log("error", message=str(message), **data)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_events(folder, event_type=None):
+    """读取事件日志，可按类型过滤。最后一行写了一半时忽略该行。"""
+    events = []
+    path = os.path.join(folder, EVENT_LOG_FILE)
+    if not os.path.exists(path):
+        return events
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if event_type is None or event["type"] == event_type:
+                events.append(event)
+    return events
+
+
+def build_segments(events):
+    """由事件列表重建片段表。"""
+    segments = []
+    for event in events:
+        if event["type"] in SEGMENT_START or event["type"] in SEGMENT_END:
+            if segments and segments[-1]["end_ms"] is None:
+                segments[-1]["end_ms"] = event["wall_ms"]
+                segments[-1]["end_seq"] = event["seq"]
+        if event["type"] in SEGMENT_START:
+            segments.append({"segment": len(segments), "start_ms": event["wall_ms"],
+                             "end_ms": None, "start_seq": event["seq"], "end_seq": None})
+    return segments
+
+
+def load_segments(folder):
+    """
+    读取实验的片段表 [{"segment", "start_ms", "end_ms", ...}]，end_ms 为 None 表示到数据结尾。
+    优先读 events_index.json，没有时从 events.jsonl 重建；旧实验使用 grasp_time.txt 中的时间作为片段起点。
+    """
+    index_path = os.path.join(folder, EVENT_INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path, "r") as f:
+            return json.load(f)["segments"]
+    if os.path.exists(os.path.join(folder, EVENT_LOG_FILE)):
+        return build_segments(load_events(folder))
+    legacy = os.path.join(folder, LEGACY_GRASP_FILE)
+    if os.path.exists(legacy):
+        with open(legacy, "r") as f:
+            starts = [int(line.strip()) for line in f if line.strip()]
+        return [{"segment": k, "start_ms": ts, "end_ms": None} for k, ts in enumerate(starts[-1:])]
+    return []
+
+
+def segment_slices(sorted_ts, segments):
+    """
+    在有序时间戳中二分查找每个片段 [start_ms, end_ms) 对应的下标范围，返回 slice 列表，不需要逐个比较。
+    """
+    sorted_ts = np.asarray(sorted_ts)
+    slices = []
+    for seg in segments:
+        start = int(np.searchsorted(sorted_ts, seg["start_ms"], side="left"))
+        end = len(sorted_ts) if seg.get("end_ms") is None else int(np.searchsorted(sorted_ts, seg["end_ms"], side="left"))
+        slices.append(slice(start, end))
+    return slices
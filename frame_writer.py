@@ -0,0 +1,141 @@
+import queue
+import threading
+
+# 队列满时的处理策略
+POLICIES = ("block", "drop_oldest", "drop_newest")
+
+# 通知 writer 线程退出的哨兵对象
+_STOP = object()
+
+
+class FrameWriter:
+    """
+    后台写盘队列：采集回调只负责把数据放进有界队列，由一个或多个 writer 线程取出并写盘，
+    这样 SDK 的接收线程不会被磁盘 IO 阻塞。
+    Args:
+        sink (callable): 写盘函数，每次接收队列中的一个元素。
+        maxsize (int): 队列最大长度。
+        num_workers (int): writer 线程数量。
+        policy (str): 队列满时的策略，'block' 阻塞等待，'drop_oldest' 丢弃最旧的帧，'drop_newest' 丢弃新帧。
+        name (str): 线程名前缀，用于打印信息。
+        on_drop (callable): 帧因队列满被丢弃时调用，接收被丢弃的元素（例如归还其中的缓冲区）。
+    """
+    def __init__(self, sink, maxsize=256, num_workers=1, policy="drop_oldest", name="writer", on_drop=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}', expected one of {POLICIES}")
+        self.sink = sink
+        self.policy = policy
+        self.name = name
+        self.on_drop = on_drop
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()  # 保护计数器以及 drop_oldest 的出队/入队
+
+        # 统计计数
+        self.put_count = 0  # 提交的帧数
+        self.written_count = 0  # 写盘成功的帧数
+        self.dropped_count = 0  # 因队列满被丢弃的帧数
+        self.error_count = 0  # 写盘出错的帧数
+        self.max_depth = 0  # 队列深度峰值
+
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"{name}-{i}", daemon=True)
+            for i in range(max(1, num_workers))
+        ]
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            for worker in self._workers:
+                worker.start()
+            self._started = True
+        return self
+
+    def put(self, item):
+        """在采集线程中调用，按 policy 处理队列满的情况。返回该帧是否入队。"""
+        with self._lock:
+            self.put_count += 1
+
+        if self.policy == "block":
+            self.queue.put(item)
+            accepted = True
+        elif self.policy == "drop_newest":
+            try:
+                self.queue.put_nowait(item)
+                accepted = True
+            except queue.Full:
+                self._on_drop(item)
+                accepted = False
+        else:  # drop_oldest
+            with self._lock:
+                while True:
+                    try:
+                        self.queue.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            dropped = self.queue.get_nowait()
+                            self.queue.task_done()
+                            self._on_drop(dropped, locked=True)
+                        except queue.Empty:
+                            pass
+            accepted = True
+
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return accepted
+
+    def _on_drop(self, item, locked=False):
+        if locked:
+            self.dropped_count += 1
+            dropped = self.dropped_count
+        else:
+            with self._lock:
+                self.dropped_count += 1
+                dropped = self.dropped_count
+        # 第一次以及之后每 100 次丢帧打印一次警告
+        if dropped == 1 or dropped % 100 == 0:
+            print(f"[{self.name}] Warning: queue full, {dropped} frames dropped ({self.policy}).")
+        if self.on_drop is not None and item is not _STOP:
+            self.on_drop(item)
+
+    def _worker_loop(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    break
+                self.sink(item)
+                with self._lock:
+                    self.written_count += 1
+            except Exception as e:
+                with self._lock:
+                    self.error_count += 1
+                print(f"[{self.name}] Error writing frame: {e}")
+            finally:
+                self.queue.task_done()
+                # 不在等待下一帧时持有上一帧（及其中的 SDK 帧或缓冲区）
+                item = None
+
+    def stats(self):
+        """返回队列深度和丢帧等计数。"""
+        with self._lock:
+            return {
+                "depth": self.queue.qsize(),
+                "max_depth": self.max_depth,
+                "put": self.put_count,
+                "written": self.written_count,
+                "dropped": self.dropped_count,
+                "errors": self.error_count,
+            }
+
+    def stop(self, timeout=None):
+        """等待队列中剩余的数据写完，然后结束 writer 线程。"""
+        if not self._started:
+            return self.stats()
+        for _ in self._workers:
+            self.queue.put(_STOP)  # 哨兵不受 policy 影响，必须送达
+        for worker in self._workers:
+            worker.join(timeout)
+        self._started = False
+        return self.stats()
@@ -0,0 +1,143 @@
+"""
+RealSense 数据源：实时采集（可同时由 SDK 录制 .bag）和 .bag 回放，接口见 vis_source.CameraSource。
+"""
+
+import os
+import glob
+import threading
+import numpy as np
+import pyrealsense2 as rs
+from vis_source import CameraSource
+
+CAMERA_FPS = 30
+
+
+class RealsenseSource(CameraSource):
+    """
+    单个 RealSense 相机或一个 .bag 文件。
+    Args:
+        serial (str): 相机序列号，回放时为 .bag 文件名。
+        color_size (tuple): 颜色流 (宽, 高)，回放时忽略（使用录制的全部数据流）。
+        depth_size (tuple): 深度流 (宽, 高)，回放时忽略。
+        fps (int): 帧率，回放时忽略。
+        bag_file (str): 回放的 .bag 文件。
+        record_file (str): 实时采集时由 SDK 录制到该 .bag 文件，此时 record_only 为 True。
+        realtime (bool): 回放时是否按录制时的速度播放。
+    """
+    def __init__(self, serial, color_size=(640, 480), depth_size=(640, 480), fps=CAMERA_FPS, bag_file=None,
+                 record_file=None, realtime=True):
+        self.serial = serial
+        self.playback = bag_file is not None
+        self.record_only = record_file is not None
+        self.pipeline = rs.pipeline()
+        self.config = rs.config()
+        if self.playback:
+            # 回放录制的全部数据流，播放完不重复
+            self.config.enable_device_from_file(bag_file, repeat_playback=False)
+        else:
+            self.config.enable_device(serial)
+            self.config.enable_stream(rs.stream.color, color_size[0], color_size[1], rs.format.bgr8, fps)
+            self.config.enable_stream(rs.stream.depth, depth_size[0], depth_size[1], rs.format.z16, fps)
+            if record_file is not None:
+                self.config.enable_record_to_file(record_file)
+        self.realtime = realtime
+        self.profile = None
+        self._playback = None
+        # 对齐对象不是线程安全的，每个对齐线程各自创建一个
+        self._local = threading.local()
+
+    def start(self):
+        self.profile = self.pipeline.start(self.config)
+        if self.playback:
+            self._playback = self.profile.get_device().as_playback()
+            self._playback.set_real_time(self.realtime)
+        return self
+
+    def read(self, timeout_ms=1000):
+        try:
+            frames = self.pipeline.wait_for_frames(timeout_ms)
+        except RuntimeError:
+            return None
+        # 帧要在其他线程中处理，从 SDK 的帧池中取出，避免阻塞后续的帧
+        frames.keep()
+        return frames
+
+    @property
+    def finished(self):
+        return self._playback is not None and self._playback.current_status() == rs.playback_status.stopped
+
+    def frame_info(self, frames):
+        color_frame = frames.get_color_frame()
+        if not color_frame:
+            return None
+        depth_frame = frames.get_depth_frame()
+        return {
+            "hw_timestamp": color_frame.get_timestamp(),
+            "domain": str(color_frame.get_frame_timestamp_domain()),
+            "frame_number": color_frame.get_frame_number(),
+            "depth_timestamp": depth_frame.get_timestamp() if depth_frame else None,
+            "depth_frame_number": depth_frame.get_frame_number() if depth_frame else None,
+        }
+
+    def images(self, frames, align=True):
+        if align:
+            align_block = getattr(self._local, "align", None)
+            if align_block is None:
+                align_block = self._local.align = rs.align(rs.stream.color)
+            # 对齐深度帧到颜色帧
+            frames = align_block.process(frames)
+            frames.keep()
+
+        depth_frame = frames.get_depth_frame()
+        color_frame = frames.get_color_frame()
+        # 验证帧的有效性
+        if not depth_frame or not color_frame:
+            return None
+        return np.asanyarray(depth_frame.get_data()), np.asanyarray(color_frame.get_data())
+
+    def calibration(self):
+        depth_profile = self.profile.get_stream(rs.stream.depth).as_video_stream_profile()
+        color_profile = self.profile.get_stream(rs.stream.color).as_video_stream_profile()
+        return {
+            "depth_intrinsics": depth_profile.get_intrinsics(),
+            "color_intrinsics": color_profile.get_intrinsics(),
+            "depth_to_color": depth_profile.get_extrinsics_to(color_profile),
+            "depth_scale": self.profile.get_device().first_depth_sensor().get_depth_scale(),
+        }
+
+    def stop(self):
+        self.pipeline.stop()
+
+
+def enable_global_time(device):
+    for sensor in device.query_sensors():
+        if sensor.supports(rs.option.global_time_enabled):
+            sensor.set_option(rs.option.global_time_enabled, 1)
+
+
+def connected_serials(global_time=True):
+    """已连接的 RealSense 相机序列号，global_time 时打开相机的 global_time_enabled。"""
+    serials = []
+    for d in rs.context().devices:
+        if d.get_info(rs.camera_info.name).lower() != 'platform camera':
+            serials.append(d.get_info(rs.camera_info.serial_number))
+            if global_time:
+                enable_global_time(d)
+    return serials
+
+
+def find_bag(folder):
+    bag_files = sorted(glob.glob(os.path.join(folder, "*.bag")))
+    if not bag_files:
+        raise FileNotFoundError(f"No .bag file to play back in {folder}")
+    return bag_files[0]
+
+
+def bag_sources(folders, realtime=True):
+    """回放每个相机文件夹中录制的 .bag，文件名为相机序列号。"""
+    sources = []
+    for folder in folders:
+        bag_file = find_bag(folder)
+        serial = os.path.splitext(os.path.basename(bag_file))[0]
+        sources.append(RealsenseSource(serial, bag_file=bag_file, realtime=realtime))
+    return sources
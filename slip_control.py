@@ -0,0 +1,238 @@
+"""
+基于触觉的滑动检测闭环：Tac3D 新帧发布后立即唤醒控制线程，由切向力/法向力之比和切向位移速度
+判断是否即将滑动，通过 DexHandClient.grasp 增大夹持力；一段时间没有滑动则逐步减小夹持力。
+每次从帧到达（回调执行）到发出命令的延迟都会记录，超过预算时打印警告。
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import threading
+import numpy as np
+from episode_store import write_json
+from tac_recorder import TacRecorder, TacFrame, host_time_ms
+from tac_features import FeatureExtractor
+
+SLIP_LOG_FILE = "slip_control.json"
+
+
+class SlipDetector:
+    """
+    单个传感器的滑动检测。
+    Args:
+        ratio_threshold (float): 切向力与法向力之比超过该值判定为滑动。
+        rate_threshold (float): 接触区域平均切向位移的速度（mm/s）超过该值判定为滑动。
+        min_load (float): 法向力小于该值（N）时认为没有夹持物体，不做判定。
+        contact_threshold (float): 判定接触的单点法向力阈值（N）。
+    """
+    def __init__(self, ratio_threshold=0.4, rate_threshold=1.0, min_load=0.5, contact_threshold=0.005):
+        self.ratio_threshold = ratio_threshold
+        self.rate_threshold = rate_threshold
+        self.min_load = min_load
+        self.extractor = FeatureExtractor(contact_threshold)
+        self._prev_shear = None
+        self._prev_time = None
+
+    def update(self, frame):
+        """
+        输入一帧 TacFrame，返回 (是否滑动, 切向/法向力之比, 切向位移速度)。
+        """
+        features = self.extractor(frame.P[None], frame.D[None], frame.F[None])
+        load = float(features["normal_load"][0])
+        shear = features["shear"][0]
+        ratio = float(np.linalg.norm(features["shear_force"][0])) / load if load > 0 else 0.0
+
+        # 速度使用传感器自身的发送时间戳（秒），不受主机接收抖动影响
+        t = frame.sendTimestamp
+        rate = 0.0
+        if self._prev_time is not None and t > self._prev_time:
+            rate = float(np.linalg.norm(shear - self._prev_shear)) / (t - self._prev_time)
+        self._prev_shear = shear
+        self._prev_time = t
+
+        slip = load >= self.min_load and (ratio > self.ratio_threshold or rate > self.rate_threshold)
+        return slip, ratio, rate
+
+
+class SlipController:
+    """
+    滑动检测闭环控制器，作为 TacRecorder 的新帧消费者运行在单独的高优先级线程中。
+    Args:
+        recorder (TacRecorder): 触觉采集器，提供最新帧和新帧通知。
+        client: DexHandClient 或 FakeDexHandClient。
+        goal_force (float): 初始夹持力（N），应与 grasp 命令一致。
+        min_force (float): 放松时的最小夹持力（N）。
+        max_force (float): 最大夹持力（N）。
+        step_up (float): 每次检测到滑动时增加的力（N）。
+        step_down (float): 每次放松时减小的力（N）。
+        relax_time (float): 多长时间（秒）没有滑动后放松一次。
+        min_interval (float): 两次加力命令的最小间隔（秒），避免同一次滑动重复加力。
+        load_time (float): 每条 grasp 命令的加载时间（秒）。
+        budget_ms (float): 帧到达到发出命令的延迟预算（毫秒）。
+        realtime (bool): 是否尝试把控制线程设为 SCHED_FIFO 实时优先级（需要权限）。
+        detector_kwargs: 传给 SlipDetector 的参数。
+    """
+    def __init__(self, recorder, client, goal_force=8.0, min_force=4.0, max_force=15.0, step_up=1.0,
+                 step_down=0.5, relax_time=1.0, min_interval=0.05, load_time=0.05, budget_ms=20.0,
+                 realtime=False, **detector_kwargs):
+        self.recorder = recorder
+        self.client = client
+        self.goal_force = goal_force
+        self.min_force = min_force
+        self.max_force = max_force
+        self.step_up = step_up
+        self.step_down = step_down
+        self.relax_time = relax_time
+        self.min_interval = min_interval
+        self.load_time = load_time
+        self.budget_ms = budget_ms
+        self.realtime = realtime
+        self.detectors = {SN: SlipDetector(**detector_kwargs) for SN in recorder.sensors}
+        self._frames = {SN: TacFrame() for SN in recorder.sensors}
+        self._last_seq = {SN: 0 for SN in recorder.sensors}
+        self._event = threading.Event()
+        self._running = False
+        self._thread = None
+        self._last_command = 0.0
+        self._last_slip = time.monotonic()
+        self.frame_count = 0  # 处理的帧数
+        self.slip_count = 0  # 判定为滑动的帧数
+        self.detect_ms = []  # 每帧检测耗时
+        self.commands = []  # 每条命令：时间、力、原因、延迟
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="slip-control", daemon=True)
+        self._thread.start()
+        self.recorder.add_listener(self._on_frame)
+        return self
+
+    def _on_frame(self, SN, frame):
+        self._event.set()
+
+    def _set_priority(self):
+        try:
+            os.sched_setscheduler(threading.get_native_id(), os.SCHED_FIFO, os.sched_param(50))
+        except (AttributeError, PermissionError, OSError) as e:
+            print(f"Warning: cannot set real-time priority for the slip control thread: {e}")
+
+    def _loop(self):
+        if self.realtime:
+            self._set_priority()
+        while self._running:
+            if not self._event.wait(timeout=0.1):
+                continue
+            self._event.clear()
+            for SN, frame in self._frames.items():
+                seq = self.recorder.latest(SN, frame)
+                if seq == self._last_seq[SN]:
+                    continue
+                self._last_seq[SN] = seq
+                self._process(SN, frame)
+
+    def _process(self, SN, frame):
+        start = time.perf_counter()
+        slip, ratio, rate = self.detectors[SN].update(frame)
+        self.detect_ms.append(1000.0 * (time.perf_counter() - start))
+        self.frame_count += 1
+
+        now = time.monotonic()
+        if slip:
+            self.slip_count += 1
+            self._last_slip = now
+            if now - self._last_command >= self.min_interval and self.goal_force < self.max_force:
+                self._command(min(self.max_force, self.goal_force + self.step_up), "slip", SN, frame,
+                              ratio=ratio, rate=rate)
+        elif (now - self._last_slip >= self.relax_time and now - self._last_command >= self.relax_time
+              and self.goal_force > self.min_force):
+            self._command(max(self.min_force, self.goal_force - self.step_down), "relax", SN, frame)
+
+    def _command(self, goal_force, reason, SN, frame, **info):
+        latency = host_time_ms() - frame.hostTimestamp  # 帧到达到发出命令
+        start = time.perf_counter()
+        self.client.grasp(goal_force=goal_force, load_time=self.load_time)
+        call_ms = 1000.0 * (time.perf_counter() - start)
+        self._last_command = time.monotonic()
+        self.goal_force = goal_force
+        self.commands.append({
+            "host_ms": int(host_time_ms()),
+            "SN": SN,
+            "frame_index": int(frame.frameIndex),
+            "reason": reason,
+            "goal_force": goal_force,
+            "latency_ms": latency,
+            "call_ms": call_ms,
+            **info,
+        })
+        if latency > self.budget_ms:
+            print(f"Warning: slip control latency {latency:.1f} ms exceeds the {self.budget_ms} ms budget.")
+
+    def stats(self):
+        latency = np.array([c["latency_ms"] for c in self.commands])
+        detect = np.array(self.detect_ms)
+        return {
+            "frames": self.frame_count,
+            "slip_frames": self.slip_count,
+            "commands": len(self.commands),
+            "goal_force": self.goal_force,
+            "latency_ms_p50": float(np.percentile(latency, 50)) if len(latency) else None,
+            "latency_ms_p99": float(np.percentile(latency, 99)) if len(latency) else None,
+            "latency_ms_max": float(latency.max()) if len(latency) else None,
+            "over_budget": int(np.count_nonzero(latency > self.budget_ms)),
+            "detect_ms_p99": float(np.percentile(detect, 99)) if len(detect) else None,
+        }
+
+    def stop(self):
+        """停止控制线程，把命令记录和延迟统计保存到实验文件夹的 slip_control.json。"""
+        self.recorder.remove_listener(self._on_frame)
+        self._running = False
+        self._event.set()
+        if self._thread is not None:
+            self._thread.join()
+        stats = self.stats()
+        write_json(os.path.join(self.recorder.folder, SLIP_LOG_FILE), {
+            "budget_ms": self.budget_ms,
+            "stats": stats,
+            "commands": self.commands,
+        })
+        return stats
+
+
+if __name__ == "__main__":
+    # 用合成的滑动数据和机械手替身测试闭环，不需要硬件
+    from tac_replay import slip_frames, ReplaySender, ReplaySensor, FakeDexHandClient
+
+    parser = argparse.ArgumentParser(description="Simulate the slip control loop with replayed Tac3D frames.")
+    parser.add_argument('--rate', type=float, default=60.0, help="Tac3D frame rate in Hz (default: 60).")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run (default: 10).")
+    parser.add_argument('--port', type=int, default=19989, help="Local UDP port (default: 19989).")
+    parser.add_argument('--budget_ms', type=float, default=20.0, help="Latency budget in ms (default: 20).")
+    parser.add_argument('--realtime', action='store_true', help="Try to run the control thread with SCHED_FIFO.")
+    parser.add_argument('--folder', type=str, default=None, help="Where to write data (default: a temp folder).")
+    args = parser.parse_args()
+
+    sensors = ["SIM-0000", "SIM-0001"]
+    folder = args.folder or tempfile.mkdtemp(prefix="slip_control_")
+    recorder = TacRecorder(folder, sensors).start()
+    client = FakeDexHandClient(recvCallback_hand=recorder.hand_callback)
+    sensor = ReplaySensor(recvCallback=recorder.tac_callback, port=args.port)
+    client.start_server()
+    client.grasp(goal_force=8.0, load_time=0.5)
+    recorder.trigger("grasp")
+    controller = SlipController(recorder, client, goal_force=8.0, budget_ms=args.budget_ms,
+                                realtime=args.realtime).start()
+
+    sender = ReplaySender({SN: slip_frames(rate=args.rate, seed=i) for i, SN in enumerate(sensors)},
+                          port=args.port, rate=args.rate)
+    sender.run(int(args.duration * args.rate))
+    time.sleep(0.2)
+
+    stats = controller.stop()
+    sensor.stop()
+    client.release_hand()
+    recorder.close()
+    print(f"Slip control stats: {stats}")
+    print(f"Saved to {os.path.join(folder, SLIP_LOG_FILE)}")
+
+# python scripts/slip_control.py --rate 60 --duration 10
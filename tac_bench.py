@@ -0,0 +1,287 @@
+"""
+触觉采集链路的基准测试：用合成或录制的数据按设定帧率驱动采集回调，统计
+回调到写盘的延迟分位数、持续帧率、丢帧/重复帧数和每帧 CPU 时间，结果保存为 JSON，便于比较不同版本的脚本。
+    legacy    F01/G01 的写法：Tac3D 回调只更新最新值，机械手回调每两帧在回调线程中写一个 pickle
+    recorder  H01 的写法：TacRecorder 环形缓冲 + 分块写入 episode
+"""
+
+import os
+import json
+import time
+import pickle
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import numpy as np
+from tac_recorder import TacRecorder, host_time_ms
+from tac_episode import TacEpisode
+from tac_codec import CODEC_KINDS
+from tac_replay import synthetic_frames, episode_frames, ReplaySender, ReplaySensor, FakeDexHandClient
+
+MODES = ("legacy", "recorder")
+TRANSPORTS = ("direct", "udp")
+
+
+def summarize_latency(latencies):
+    if len(latencies) == 0:
+        return {"p50": None, "p99": None, "max": None, "mean": None}
+    lat = np.asarray(latencies, dtype=np.float64)
+    return {
+        "p50": float(np.percentile(lat, 50)),
+        "p99": float(np.percentile(lat, 99)),
+        "max": float(lat.max()),
+        "mean": float(lat.mean()),
+    }
+
+
+def folder_bytes(folder):
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class DirectDriver:
+    """不经过网络，在每个传感器的线程中按帧率直接调用 Tac3D 回调。"""
+    def __init__(self, sources, rate, jitter_ms=0.0, loss=0.0, duplicate=0.0, seed=0):
+        self.sources = sources
+        self.rate = rate
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.duplicate = duplicate
+        self.seed = seed
+        self.sent = {SN: 0 for SN in sources}
+        self.duplicates_sent = 0
+
+    def run(self, callback, num_frames):
+        threads = [
+            threading.Thread(target=self._run_sensor, args=(SN, pool, callback, num_frames, k), daemon=True)
+            for k, (SN, pool) in enumerate(self.sources.items())
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def _run_sensor(self, SN, pool, callback, num_frames, k):
+        rng = random.Random(self.seed + k)
+        period = 1.0 / self.rate
+        start = time.perf_counter()
+        device_start = time.monotonic()
+        for i in range(num_frames):
+            delay = start + i * period + rng.gauss(0, self.jitter_ms / 1000.0) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if rng.random() < self.loss:
+                continue
+            frame = dict(pool[i % len(pool)], SN=SN, index=i,
+                         sendTimestamp=time.monotonic() - device_start, recvTimestamp=time.time())
+            callback(frame, None)
+            self.sent[SN] += 1
+            if rng.random() < self.duplicate:
+                callback(frame, None)
+                self.duplicates_sent += 1
+
+
+class UDPDriver:
+    """通过 ReplaySender/ReplaySensor 走本机 UDP，包含 SDK 接收队列的丢帧行为。"""
+    def __init__(self, sources, rate, jitter_ms=0.0, loss=0.0, duplicate=0.0, burst=1, port=19988, seed=0):
+        self.sources = sources
+        self.rate = rate
+        self.port = port
+        self.sender = ReplaySender({SN: iter(self._cycle(pool)) for SN, pool in sources.items()},
+                                   port=port, rate=rate, jitter_ms=jitter_ms, loss=loss,
+                                   burst=burst, duplicate=duplicate, seed=seed)
+
+    @property
+    def sent(self):
+        return self.sender.sent_frames
+
+    @property
+    def duplicates_sent(self):
+        return self.sender.duplicate_count
+
+    @staticmethod
+    def _cycle(pool):
+        while True:
+            for frame in pool:
+                yield frame
+
+    def run(self, callback, num_frames):
+        sensor = ReplaySensor(recvCallback=callback, port=self.port, maxQSize=5)
+        self.sender.run(num_frames)
+        time.sleep(0.2)  # 等待接收线程处理完剩余的报文
+        sensor.stop()
+        self.sender.sock.close()
+
+
+def run_recorder(folder, sensors, driver, num_frames, args):
+    latencies = []
+    lock = threading.Lock()
+
+    def on_flush(rows):
+        # 每块写盘完成的时刻减去该帧进入回调的时刻
+        now = host_time_ms()
+        with lock:
+            latencies.extend((now - rows["host_ts"]).tolist())
+
+    recorder = TacRecorder(folder, sensors, chunk_size=args.chunk_size, codec=args.codec,
+                           on_flush=on_flush).start()
+    recorder.trigger("bench")
+    hand = FakeDexHandClient(recvCallback_hand=recorder.hand_callback, rate=args.hand_rate)
+    hand.start_server()
+    driver.run(recorder.tac_callback, num_frames)
+    hand.release_hand()
+    stats = recorder.close()
+
+    episode = TacEpisode(folder)
+    saved = {SN: np.asarray(episode.streams[SN]["index"]) for SN in sensors}
+    return latencies, saved, stats
+
+
+def run_legacy(folder, sensors, driver, num_frames, args):
+    latencies = []
+    saved = {SN: [] for SN in sensors}
+    latest = {SN: {"index": -1, "host_ts": None, "P": None, "D": None, "F": None, "Fr": None, "Mr": None}
+              for SN in sensors}
+    os.makedirs(folder, exist_ok=True)
+
+    def tac_callback(frame, param):
+        info = latest[frame["SN"]]
+        info["index"] = frame["index"]
+        info["host_ts"] = host_time_ms()
+        info["P"] = frame.get("3D_Positions")
+        info["D"] = frame.get("3D_Displacements")
+        info["F"] = frame.get("3D_Forces")
+        info["Fr"] = frame.get("3D_ResultantForce")
+        info["Mr"] = frame.get("3D_ResultantMoment")
+
+    def hand_callback(client):
+        info = client.hand_info
+        if info._frame_cnt % 2 != 0:
+            return
+        data = {"pos": info.now_pos, "force": info.avg_force}
+        for k, SN in enumerate(sensors, start=1):
+            for name in ("P", "D", "F", "Fr", "Mr"):
+                data[f"{name}{k}"] = latest[SN][name]
+        file_path = os.path.join(folder, f"{int(time.time() * 1000 - 100)}.pkl")
+        with open(file_path, "wb") as f:
+            pickle.dump(data, f)
+        now = host_time_ms()
+        for SN in sensors:
+            if latest[SN]["host_ts"] is not None:
+                latencies.append(now - latest[SN]["host_ts"])
+                saved[SN].append(latest[SN]["index"])
+
+    hand = FakeDexHandClient(recvCallback_hand=hand_callback, rate=args.hand_rate)
+    hand.start_server()
+    driver.run(tac_callback, num_frames)
+    hand.release_hand()
+    return latencies, {SN: np.asarray(v) for SN, v in saved.items()}, {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tactile capture path.")
+    parser.add_argument('--mode', type=str, default='recorder', choices=MODES, help="Capture path to benchmark.")
+    parser.add_argument('--generation', type=str, default=None,
+                        help="Label stored in the result, e.g. 'F01', 'G01', 'H01' (default: the mode).")
+    parser.add_argument('--transport', type=str, default='direct', choices=TRANSPORTS,
+                        help="'direct' calls the Tac3D callback in-process, 'udp' goes through tac_replay.")
+    parser.add_argument('--source', type=str, default='synthetic',
+                        help="'synthetic' or a recorded experiment folder used as frame payload.")
+    parser.add_argument('--sensors', type=int, default=2, help="Number of sensors (default: 2).")
+    parser.add_argument('--rate', type=float, default=60.0, help="Tac3D frame rate per sensor in Hz.")
+    parser.add_argument('--hand_rate', type=float, default=100.0, help="DexHand callback rate in Hz.")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of frames to send.")
+    parser.add_argument('--jitter_ms', type=float, default=0.0, help="Std of frame time jitter in ms.")
+    parser.add_argument('--loss', type=float, default=0.0, help="Probability of a frame never arriving.")
+    parser.add_argument('--duplicate', type=float, default=0.0, help="Probability of a frame arriving twice.")
+    parser.add_argument('--burst', type=int, default=1, help="Frames sent back-to-back (udp transport only).")
+    parser.add_argument('--codec', type=str, default='int16', choices=CODEC_KINDS, help="Recorder storage codec.")
+    parser.add_argument('--chunk_size', type=int, default=64, help="Recorder chunk size.")
+    parser.add_argument('--folder', type=str, default=None, help="Where to write data (default: a temp folder).")
+    parser.add_argument('--keep', action='store_true', help="Keep the written data.")
+    parser.add_argument('--output', type=str, default=None,
+                        help="Result JSON path (default: bench_results/tac_<generation>.json).")
+    args = parser.parse_args()
+    generation = args.generation or args.mode
+
+    sensors = [f"SIM-{k:04d}" for k in range(args.sensors)]
+    if args.source == "synthetic":
+        pools = {SN: list(synthetic_frames(64, rate=args.rate, seed=k)) for k, SN in enumerate(sensors)}
+    else:
+        real = TacEpisode(args.source).sensors
+        pools = {SN: list(episode_frames(args.source, real[k % len(real)], loop=False))
+                 for k, SN in enumerate(sensors)}
+
+    num_frames = int(args.duration * args.rate)
+    if args.transport == "direct":
+        driver = DirectDriver(pools, args.rate, args.jitter_ms, args.loss, args.duplicate)
+    else:
+        driver = UDPDriver(pools, args.rate, args.jitter_ms, args.loss, args.duplicate, args.burst)
+
+    folder = args.folder or tempfile.mkdtemp(prefix="tac_bench_")
+    run = run_recorder if args.mode == "recorder" else run_legacy
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    latencies, saved, stats = run(folder, sensors, driver, num_frames, args)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    # 按帧序号统计：发送但没保存的为丢帧，同一帧保存多次的为重复帧
+    sent_total = sum(driver.sent.values())
+    unique_saved = sum(len(np.unique(v)) for v in saved.values())
+    rows_saved = sum(len(v) for v in saved.values())
+    disk_bytes = folder_bytes(folder)
+    result = {
+        "generation": generation,
+        "mode": args.mode,
+        "transport": args.transport,
+        "timestamp": int(time.time() * 1000),
+        "config": {
+            "sensors": args.sensors,
+            "rate": args.rate,
+            "hand_rate": args.hand_rate,
+            "duration": args.duration,
+            "jitter_ms": args.jitter_ms,
+            "loss": args.loss,
+            "duplicate": args.duplicate,
+            "burst": args.burst,
+            "codec": args.codec if args.mode == "recorder" else "pickle",
+            "source": args.source,
+        },
+        "results": {
+            "wall_s": wall,
+            "frames_sent": sent_total,
+            "duplicates_sent": driver.duplicates_sent,
+            "frames_saved": unique_saved,
+            "fps": unique_saved / wall,
+            "dropped": max(0, sent_total - unique_saved),
+            "duplicated_on_disk": rows_saved - unique_saved,
+            "latency_ms": summarize_latency(latencies),
+            "cpu_ms_per_frame": 1000.0 * cpu / max(unique_saved, 1),
+            "bytes_on_disk": disk_bytes,
+            "bytes_per_frame": disk_bytes / max(unique_saved, 1),
+            "recorder_stats": stats,
+        },
+    }
+
+    output = args.output or os.path.join("bench_results", f"tac_{generation}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result["results"], indent=2))
+    print(f"Saved results to {output}")
+
+    if not args.keep and args.folder is None:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
+
+# python scripts/tac_bench.py --mode legacy --generation G01 --rate 60 --duration 10
+# python scripts/tac_bench.py --mode recorder --generation H01 --rate 60 --duration 10
\ No newline at end of file
@@ -0,0 +1,122 @@
+import numpy as np
+
+# 支持的编码方式：float32 原样保存，float16 半精度，int16 按固定比例量化
+CODEC_KINDS = ("float32", "float16", "int16")
+
+# 触觉数据默认的量化误差上限：P/D 单位 mm，F 单位 N
+DEFAULT_ERROR_BOUNDS = {"P": 1e-3, "D": 1e-3, "F": 1e-4}
+
+
+class FieldCodec:
+    """
+    单个字段的压缩编码。int16 量化时 scale = 2 * error_bound，解码误差不超过 error_bound；
+    use_ref 为 True 时以第一帧为参考值（例如 P 的初始形貌），只保存每帧相对参考值的差。
+    解码结果为 float32。
+    Args:
+        kind (str): 'float32'、'float16' 或 'int16'。
+        error_bound (float): int16 量化的最大误差。
+        use_ref (bool): 是否减去参考帧。
+    """
+    def __init__(self, kind="int16", error_bound=1e-3, use_ref=False):
+        if kind not in CODEC_KINDS:
+            raise ValueError(f"Unknown codec '{kind}', expected one of {CODEC_KINDS}")
+        self.kind = kind
+        self.error_bound = float(error_bound)
+        self.scale = 2.0 * self.error_bound
+        self.use_ref = use_ref
+        self.ref = None
+        self.clipped_count = 0  # 超出 int16 范围被截断的数值个数
+
+    @property
+    def dtype(self):
+        return np.dtype(self.kind)
+
+    @property
+    def needs_ref(self):
+        return self.use_ref and self.ref is None
+
+    def set_ref(self, ref):
+        self.ref = np.asarray(ref, dtype=np.float32).copy()
+
+    def encode(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        if self.use_ref:
+            x = x - self.ref
+        if self.kind == "float32":
+            return x
+        if self.kind == "float16":
+            return x.astype(np.float16)
+        q = np.rint(x / self.scale)
+        out_of_range = np.abs(q) > 32767
+        if out_of_range.any():
+            self.clipped_count += int(np.count_nonzero(out_of_range))
+            q = np.clip(q, -32767, 32767)
+        return q.astype(np.int16)
+
+    def decode(self, q):
+        q = np.asarray(q)
+        if self.kind == "int16":
+            x = q.astype(np.float32) * np.float32(self.scale)
+        else:
+            x = q.astype(np.float32)
+        if self.use_ref:
+            x += self.ref
+        return x
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "error_bound": self.error_bound,
+            "use_ref": self.use_ref,
+            "clipped": self.clipped_count,
+        }
+
+    @classmethod
+    def from_dict(cls, d, ref=None):
+        codec = cls(d["kind"], d["error_bound"], d["use_ref"])
+        codec.clipped_count = d.get("clipped", 0)
+        if ref is not None:
+            codec.set_ref(ref)
+        return codec
+
+
+class DecodedArray:
+    """对编码后的 memmap 数组做惰性解码，只有被索引的帧才会被解码。"""
+    def __init__(self, raw, codec):
+        self.raw = raw
+        self.codec = codec
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    @property
+    def dtype(self):
+        return np.dtype(np.float32)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, idx):
+        if not isinstance(idx, tuple) or len(idx) == 1:
+            return self.codec.decode(self.raw[idx[0] if isinstance(idx, tuple) else idx])
+        # 先按帧取出再解码，保证参考帧能正确广播，然后再索引帧内的维度
+        frames = self.codec.decode(self.raw[idx[0]])
+        lead = (slice(None),) if frames.ndim == self.raw.ndim else ()
+        return frames[lead + idx[1:]]
+
+    def __array__(self, dtype=None, copy=None):
+        x = self.codec.decode(self.raw)
+        return x if dtype is None else x.astype(dtype)
+
+
+def tactile_codecs(kind="int16", error_bounds=None):
+    """Tac3D 数据流的默认编码：P 相对第一帧保存，D 和 F 直接量化，合力/合力矩保持 float32。"""
+    bounds = dict(DEFAULT_ERROR_BOUNDS, **(error_bounds or {}))
+    if kind == "float32":
+        return {}
+    return {
+        "P": FieldCodec(kind, bounds["P"], use_ref=True),
+        "D": FieldCodec(kind, bounds["D"]),
+        "F": FieldCodec(kind, bounds["F"]),
+    }
@@ -0,0 +1,207 @@
+import os
+import json
+import numpy as np
+from episode_store import EpisodeReader, is_episode, INDEX_FIELD
+from clock_model import ClockModel
+from tac_codec import DecodedArray
+from tac_geometry import TacGrid
+from tac_recorder import TAC_EPISODE_FILE, TAC_LATENCY_MS, TAC_FIELDS, TAC_FRAME_KEYS
+
+# 按传感器堆叠的字段
+TAC_STACK_FIELDS = ("P", "D", "F", "Fr", "Mr")
+# 每个字段在 valid 中对应的位
+_VALID_BITS = {name: 1 << bit for bit, (name, _) in enumerate(TAC_FRAME_KEYS)}
+# 堆叠时其余传感器最近一帧与基准时刻的最大时间差（毫秒），约为 60 Hz 下的 3 帧
+TAC_MAX_GAP_MS = 50.0
+
+
+def is_tac_episode(folder):
+    """判断实验文件夹是否为 TacRecorder 写出的多数据流格式。"""
+    return os.path.exists(os.path.join(folder, TAC_EPISODE_FILE))
+
+
+class TacEpisode:
+    """
+    读取 TacRecorder 写出的一次实验：每个传感器一个原生帧率的数据流，机械手一个数据流。
+    Args:
+        folder (str): 实验文件夹路径。
+        mmap (bool): 是否使用内存映射读取。
+    """
+    def __init__(self, folder, mmap=True):
+        self.folder = folder
+        with open(os.path.join(folder, TAC_EPISODE_FILE), "r") as f:
+            self.info = json.load(f)
+        self.sensors = self.info["sensors"]
+        self.latency_ms = self.info.get("latency_ms", TAC_LATENCY_MS)
+        self.triggers = self.info.get("triggers", [])  # 触发事件，host_ms 为触发时的主机时间
+        self.streams = {SN: EpisodeReader(os.path.join(folder, SN), mmap=mmap) for SN in self.sensors}
+        # 机械手数据流在第一次回调时才创建，机械手还没有回报过数据时为 None
+        hand_folder = os.path.join(folder, self.info["hand"])
+        self.hand = EpisodeReader(hand_folder, mmap=mmap) if is_episode(hand_folder) else None
+        # 采集时计算的特征表，旧数据没有
+        feature_stream = self.info.get("features")
+        self.features = {
+            SN: EpisodeReader(os.path.join(folder, feature_stream, SN), mmap=mmap)
+            for SN in self.sensors
+            if feature_stream and is_episode(os.path.join(folder, feature_stream, SN))
+        }
+
+    def clock(self, SN):
+        """
+        获取传感器的时钟模型：优先用记录的全部时间戳离线重新拟合（比在线拟合更准），
+        时间戳列缺失时使用采集时保存的拟合结果。
+        """
+        stream = self.streams[SN]
+        valid = stream["host_ts"] > 0
+        if np.count_nonzero(valid) >= 2:
+            return ClockModel.from_samples(stream["send_ts"][valid], stream["host_ts"][valid],
+                                           latency_ms=self.latency_ms)
+        clock = stream.attrs.get("clock")
+        if clock and clock.get("device0") is not None:
+            return ClockModel.from_dict(clock)
+        return None
+
+    def marker_grid(self, SN):
+        """传感器的标志点网格：优先使用采集时计算并保存的结果，否则由第一帧 P 计算。"""
+        features = self.features.get(SN)
+        saved = features.attrs.get("extractor", {}).get("grid") if features is not None else None
+        if saved:
+            return TacGrid.from_dict(saved)
+        return TacGrid.from_positions(np.asarray(self.streams[SN]["P"][0]))
+
+    def grid_view(self, SN, name="P"):
+        """
+        整段数据的 (T, 20, 20, C) 网格张量。float32 保存的字段直接是 memmap 的视图（不拷贝）；
+        压缩编码的字段先整段解码一次再取视图。
+        """
+        arr = self.streams[SN][name]
+        if isinstance(arr, DecodedArray):
+            arr = np.asarray(arr)
+        return self.marker_grid(SN).grid(arr)
+
+    def timestamps(self, SN, corrected=True):
+        """传感器每帧的主机时间戳（毫秒），corrected 为 True 时使用时钟模型修正。"""
+        stream = self.streams[SN]
+        clock = self.clock(SN) if corrected else None
+        if clock is None:
+            return np.asarray(stream.timestamps, dtype=np.int64)
+        return np.rint(clock.predict(stream["send_ts"])).astype(np.int64)
+
+    def stacked(self, corrected=True, max_gap_ms=TAC_MAX_GAP_MS):
+        """
+        以第一个传感器的帧为时间基准，取其余传感器时间最接近的帧，并把机械手状态插值到该时刻。
+        所有传感器的数据按 SN 顺序堆叠，没有数据的传感器、最接近的帧与基准时刻相差超过 max_gap_ms
+        （例如该传感器丢帧或已经停止）以及帧中缺少的字段填 NaN。
+        Args:
+            corrected (bool): 是否使用时钟模型修正后的时间戳。
+            max_gap_ms (float): 允许的最大时间差（毫秒），None 表示不限制。
+        Returns:
+            (timestamps, data)：timestamps 为 (T,) 毫秒时间戳；data 包含 "SN" 列表、
+            P/D/F (T, S, 400, 3)、Fr/Mr (T, S, 1, 3) 以及 pos/force (T,)。
+        """
+        ref_ts = self.timestamps(self.sensors[0], corrected)
+        order = np.argsort(ref_ts, kind="stable")
+        ref_ts = ref_ts[order]
+        T, S = len(ref_ts), len(self.sensors)
+
+        data = {"SN": list(self.sensors)}
+        for name in TAC_STACK_FIELDS:
+            shape = TAC_FIELDS[name][0]
+            data[name] = np.full((T, S) + shape, np.nan, dtype=np.float32)
+        for k, SN in enumerate(self.sensors):
+            # 每个传感器在基准时刻对应的帧
+            ts = self.timestamps(SN, corrected)
+            if len(ts) == 0 or T == 0:
+                continue
+            sort = np.argsort(ts, kind="stable")
+            rows = sort[_nearest(ts[sort], ref_ts)]
+            far = np.abs(ts[rows] - ref_ts) > max_gap_ms if max_gap_ms is not None else None
+            stream = self.streams[SN]
+            # 旧数据没有 valid 字段，认为全部有效
+            valid = stream["valid"][rows] if "valid" in stream else None
+            for name in TAC_STACK_FIELDS:
+                data[name][:, k] = stream[name][rows]
+                if valid is not None:
+                    data[name][(valid & _VALID_BITS[name]) == 0, k] = np.nan
+                if far is not None:
+                    data[name][far, k] = np.nan
+
+        # 机械手状态按时间线性插值
+        data.update(self.hand_state(ref_ts, ("pos", "force")))
+        return ref_ts, data
+
+    def hand_state(self, times, names=None):
+        """
+        把机械手数据流插值到给定时刻（毫秒）：浮点字段线性插值，整数/布尔字段取之前最近的一帧。
+        Args:
+            times (np.ndarray): 查询时刻。
+            names (tuple): 需要的字段，默认为全部字段（不含时间戳和 tac_index）。
+        Returns:
+            dict: 字段名 -> (len(times), *shape) 数组，没有机械手数据时为 0。
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if self.hand is None:
+            return {name: np.zeros(len(times)) for name in (names or ())}
+        names = names or [name for name in self.hand.fields if name not in (INDEX_FIELD, "tac_index")]
+        hand_ts = np.asarray(self.hand.timestamps, dtype=np.float64)
+        order = np.argsort(hand_ts, kind="stable")
+        hand_ts = hand_ts[order]
+        out = {}
+        for name in names:
+            shape, dtype = self.hand.fields[name]
+            if len(hand_ts) == 0:
+                out[name] = np.zeros((len(times),) + tuple(shape), dtype=dtype)
+                continue
+            values = np.asarray(self.hand[name])[order]
+            if np.dtype(dtype).kind == "f":
+                flat = values.reshape(len(values), -1)
+                cols = [np.interp(times, hand_ts, flat[:, k]) for k in range(flat.shape[1])]
+                out[name] = np.stack(cols, axis=-1).reshape((len(times),) + tuple(shape))
+            else:
+                rows = np.clip(np.searchsorted(hand_ts, times, side="right") - 1, 0, len(hand_ts) - 1)
+                out[name] = values[rows]
+        return out
+
+    def frames(self, corrected=True, max_gap_ms=TAC_MAX_GAP_MS):
+        """
+        按 stacked() 的结果逐帧返回 (timestamp, dict) 列表，dict 中 P/D/F 为 (S, 400, 3)，
+        Fr/Mr 为 (S, 1, 3)，SN 为传感器顺序，pos/force 为标量。
+        """
+        ref_ts, data = self.stacked(corrected, max_gap_ms)
+        frames = []
+        for i, ts in enumerate(ref_ts):
+            frame = {"SN": data["SN"], "pos": float(data["pos"][i]), "force": float(data["force"][i])}
+            for name in TAC_STACK_FIELDS:
+                frame[name] = data[name][i]
+            frames.append((int(ts), frame))
+        return frames
+
+
+def as_stacked(tac):
+    """
+    把一帧触觉数据统一成堆叠格式：旧数据的 P1..Mr1、P2..Mr2 等按编号顺序堆叠为 (S, 400, 3)，
+    已经是堆叠格式的直接返回。缺少的传感器编号之后的数据会被忽略。
+    """
+    if "P" in tac:
+        return tac
+    out = {key: tac[key] for key in ("pos", "force") if key in tac}
+    count = 0
+    while f"P{count + 1}" in tac and tac[f"P{count + 1}"] is not None:
+        count += 1
+    out["SN"] = [str(k) for k in range(1, count + 1)]
+    for name in TAC_STACK_FIELDS:
+        values = [tac.get(f"{name}{k}") for k in range(1, count + 1)]
+        if all(v is not None for v in values) and count:
+            out[name] = np.stack([np.asarray(v, dtype=np.float32) for v in values])
+    return out
+
+
+def _nearest(sorted_ts, query):
+    """在有序时间戳中查找与每个 query 最接近的位置。"""
+    pos = np.searchsorted(sorted_ts, query)
+    pos = np.clip(pos, 1, len(sorted_ts) - 1) if len(sorted_ts) > 1 else np.zeros_like(pos)
+    if len(sorted_ts) > 1:
+        left = sorted_ts[pos - 1]
+        right = sorted_ts[pos]
+        pos = pos - ((query - left) <= (right - query))
+    return pos
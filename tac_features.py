@@ -0,0 +1,91 @@
+"""
+Tac3D 每帧的派生特征，采集时按批向量化计算，作为原始数据旁边的小表保存，
+分析和对齐画图时不需要再读取 400 个标志点的数组。空间导数在 TacGrid 的 20x20 网格上计算。
+"""
+
+import numpy as np
+from tac_geometry import GRID_SIZE, TacGrid
+
+# 特征数据流字段：(shape, dtype)
+FEATURE_FIELDS = {
+    "contact": ((GRID_SIZE * GRID_SIZE,), "bool"),  # 接触掩码，法向力超过阈值的标志点
+    "contact_area": ((), "float32"),  # 接触面积（mm^2）
+    "cop": ((2,), "float32"),  # 压力中心 (x, y)（mm），按法向力加权
+    "shear": ((2,), "float32"),  # 接触区域内平均切向位移 (Dx, Dy)（mm）
+    "shear_force": ((2,), "float32"),  # 切向合力 (Fx, Fy)（N）
+    "normal_load": ((), "float32"),  # 法向合力（N）
+    "divergence": ((), "float32"),  # 切向位移场的散度，接触区域内平均
+    "curl": ((), "float32"),  # 切向位移场的旋度，接触区域内平均
+}
+
+
+def compute_features(P, D, F, grid, contact_threshold=0.005):
+    """
+    批量计算触觉特征。
+    Args:
+        P, D, F (np.ndarray): (T, 400, 3) 的形貌、变形场和分布力场。
+        grid (TacGrid): 传感器的标志点网格，提供间距和网格映射。
+        contact_threshold (float): 判定接触的单点法向力阈值（N）。
+    Returns:
+        dict: 字段与 FEATURE_FIELDS 一致，第一维为 T。
+    """
+    P = np.asarray(P, dtype=np.float32)
+    D = np.asarray(D, dtype=np.float32)
+    F = np.asarray(F, dtype=np.float32)
+    T = len(P)
+
+    # 法向力取绝对值，不依赖传感器坐标系 z 轴的正负方向
+    Fn = np.abs(F[..., 2])  # (T, 400)
+    contact = Fn > contact_threshold
+    n_contact = contact.sum(axis=1)
+    weight = np.where(contact, Fn, 0.0)
+    load = weight.sum(axis=1)
+
+    safe_load = np.where(load > 0, load, 1.0)[:, None]
+    cop = np.einsum("tn,tnk->tk", weight, P[..., :2]) / safe_load
+    cop[load <= 0] = np.nan
+
+    # 没有接触时对全部标志点取平均
+    mask = np.where(n_contact[:, None] > 0, contact, True).astype(np.float32)
+    count = mask.sum(axis=1)
+    shear = np.einsum("tn,tnk->tk", mask, D[..., :2]) / count[:, None]
+
+    # 20x20 网格上的切向位移场，结果按网格展平后与 mask 的标志点顺序对齐
+    flow = grid.grid(D)
+    divergence = grid.divergence(flow).reshape(T, -1)[:, grid.inverse]
+    curl = grid.curl(flow).reshape(T, -1)[:, grid.inverse]
+    pitch = grid.pitch
+
+    return {
+        "contact": contact,
+        "contact_area": (n_contact * pitch * pitch).astype(np.float32),
+        "cop": cop.astype(np.float32),
+        "shear": shear.astype(np.float32),
+        "shear_force": F[..., :2].sum(axis=1),
+        "normal_load": load.astype(np.float32),
+        "divergence": ((divergence * mask).sum(axis=1) / count).astype(np.float32),
+        "curl": ((curl * mask).sum(axis=1) / count).astype(np.float32),
+    }
+
+
+class FeatureExtractor:
+    """
+    单个传感器的在线特征计算，标志点网格由收到的第一帧 P 计算一次。
+    Args:
+        contact_threshold (float): 判定接触的单点法向力阈值（N）。
+        grid (TacGrid): 标志点网格，None 表示从第一帧计算。
+    """
+    def __init__(self, contact_threshold=0.005, grid=None):
+        self.contact_threshold = contact_threshold
+        self.grid = grid
+
+    def __call__(self, P, D, F):
+        if self.grid is None:
+            self.grid = TacGrid.from_positions(P[0])
+        return compute_features(P, D, F, self.grid, self.contact_threshold)
+
+    def to_dict(self):
+        return {
+            "contact_threshold": self.contact_threshold,
+            "grid": self.grid.to_dict() if self.grid is not None else None,
+        }
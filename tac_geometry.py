@@ -0,0 +1,145 @@
+"""
+Tac3D 标志点的网格结构：400 个标志点是 20x20 的网格，按传感器计算一次标志点顺序到网格的映射和邻接表，
+之后整段数据可以看作 (T, 20, 20, 3) 的张量，空间梯度、平滑、散度等都用数组运算完成。
+标志点顺序与网格行优先顺序只差转置/翻转时（通常如此），grid() 返回不拷贝的视图。
+"""
+
+import numpy as np
+
+GRID_SIZE = 20
+
+# 4 邻域和 8 邻域的 (行, 列) 偏移
+NEIGHBOR_OFFSETS_4 = ((-1, 0), (1, 0), (0, -1), (0, 1))
+NEIGHBOR_OFFSETS_8 = NEIGHBOR_OFFSETS_4 + ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+def _dihedral(base):
+    """行优先网格的 8 种转置/翻转，返回 [(变换, 结果)]，变换为 (transpose, flip_rows, flip_cols)。"""
+    out = []
+    for transpose in (False, True):
+        g = base.T if transpose else base
+        for flip_rows in (False, True):
+            for flip_cols in (False, True):
+                v = g[::-1] if flip_rows else g
+                v = v[:, ::-1] if flip_cols else v
+                out.append(((transpose, flip_rows, flip_cols), v))
+    return out
+
+
+class TacGrid:
+    """
+    单个传感器的标志点网格。
+    Args:
+        perm (np.ndarray): (20, 20)，perm[i, j] 为网格第 i 行（y）第 j 列（x）对应的标志点序号。
+        pitch (float): 标志点间距（mm）。
+    """
+    def __init__(self, perm, pitch=1.0):
+        self.perm = np.asarray(perm, dtype=np.int64)
+        self.size = self.perm.shape[0]
+        self.pitch = float(pitch)
+        n = self.perm.size
+        self.inverse = np.empty(n, dtype=np.int64)  # 标志点序号 -> 网格中的展平位置
+        self.inverse[self.perm.ravel()] = np.arange(n)
+
+        # 与行优先顺序只差转置/翻转时可以用视图表示
+        base = np.arange(n).reshape(self.size, self.size)
+        self.transform = next((t for t, v in _dihedral(base) if np.array_equal(v, self.perm)), None)
+
+        self.neighbors4 = self._neighbor_table(NEIGHBOR_OFFSETS_4)
+        self.neighbors8 = self._neighbor_table(NEIGHBOR_OFFSETS_8)
+        # 4 邻域的无向边 (E, 2)，每条边只出现一次
+        right = np.stack([self.perm[:, :-1].ravel(), self.perm[:, 1:].ravel()], axis=1)
+        down = np.stack([self.perm[:-1, :].ravel(), self.perm[1:, :].ravel()], axis=1)
+        self.edges = np.concatenate([right, down])
+
+    @classmethod
+    def from_positions(cls, P, size=GRID_SIZE):
+        """
+        由一帧标志点位置 (400, 3) 计算网格映射：按 y 分成 size 行，每行按 x 排序。
+        要求网格与传感器坐标轴大致对齐。
+        """
+        P = np.asarray(P, dtype=np.float64)
+        rows = np.argsort(P[:, 1], kind="stable").reshape(size, size)
+        cols = np.argsort(P[rows, 0], axis=1, kind="stable")
+        perm = np.take_along_axis(rows, cols, axis=1)
+        grid = P[perm]
+        spacing = np.concatenate([
+            np.linalg.norm(np.diff(grid, axis=0), axis=-1).ravel(),
+            np.linalg.norm(np.diff(grid, axis=1), axis=-1).ravel(),
+        ])
+        return cls(perm, float(np.median(spacing)))
+
+    @classmethod
+    def default(cls, pitch=1.0, size=GRID_SIZE):
+        """标志点已按行优先排列的网格。"""
+        return cls(np.arange(size * size).reshape(size, size), pitch)
+
+    def _neighbor_table(self, offsets):
+        """(400, K) 的邻居标志点序号，越界处为 -1。"""
+        n, size = self.perm.size, self.size
+        table = np.full((n, len(offsets)), -1, dtype=np.int64)
+        i, j = np.divmod(self.inverse, size)
+        for k, (di, dj) in enumerate(offsets):
+            ni, nj = i + di, j + dj
+            valid = (ni >= 0) & (ni < size) & (nj >= 0) & (nj < size)
+            table[valid, k] = self.perm[ni[valid], nj[valid]]
+        return table
+
+    @property
+    def is_view(self):
+        return self.transform is not None
+
+    def grid(self, x):
+        """
+        (..., 400, C) -> (..., 20, 20, C)。可以用视图表示时不拷贝（包括 np.memmap），否则按 perm 取出。
+        """
+        if self.transform is None:
+            return x[..., self.perm, :]
+        transpose, flip_rows, flip_cols = self.transform
+        g = x.reshape(x.shape[:-2] + (self.size, self.size, x.shape[-1]))
+        if transpose:
+            g = np.swapaxes(g, -3, -2)
+        if flip_rows:
+            g = g[..., ::-1, :, :]
+        if flip_cols:
+            g = g[..., :, ::-1, :]
+        return g
+
+    def flat(self, g):
+        """(..., 20, 20, C) -> (..., 400, C)，恢复原来的标志点顺序。"""
+        g = np.asarray(g)
+        flat = g.reshape(g.shape[:-3] + (self.size * self.size, g.shape[-1]))
+        return flat[..., self.inverse, :]
+
+    def gradient(self, g):
+        """标量场 (..., 20, 20) 在网格上的空间导数，返回 (d/dy, d/dx)。"""
+        return np.gradient(g, self.pitch, axis=(-2, -1))
+
+    def divergence(self, g):
+        """切向场 (..., 20, 20, >=2) 的散度 dUx/dx + dUy/dy。"""
+        _, dUx_dx = self.gradient(g[..., 0])
+        dUy_dy, _ = self.gradient(g[..., 1])
+        return dUx_dx + dUy_dy
+
+    def curl(self, g):
+        """切向场 (..., 20, 20, >=2) 的旋度 dUy/dx - dUx/dy。"""
+        dUx_dy, _ = self.gradient(g[..., 0])
+        _, dUy_dx = self.gradient(g[..., 1])
+        return dUy_dx - dUx_dy
+
+    def smooth(self, g):
+        """3x3 均值平滑，边界按边缘值延拓，g 为 (..., 20, 20, C)。"""
+        pad = [(0, 0)] * (g.ndim - 3) + [(1, 1), (1, 1), (0, 0)]
+        p = np.pad(g, pad, mode="edge")
+        out = np.zeros(g.shape, dtype=np.result_type(g, np.float32))
+        for di in range(3):
+            for dj in range(3):
+                out += p[..., di:di + self.size, dj:dj + self.size, :]
+        return out / 9.0
+
+    def to_dict(self):
+        return {"perm": self.perm.tolist(), "pitch": self.pitch}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["perm"], d["pitch"])
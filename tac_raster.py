@@ -0,0 +1,112 @@
+"""
+把 Tac3D 每帧的变形场/力场插值成固定分辨率的图像（例如 64x64x3），供训练使用。
+标志点先通过 TacGrid 排成 20x20 网格，再做双线性插值；插值可分离为行、列两个权重矩阵，
+整段数据按批用矩阵乘法完成，结果写入可内存映射的 .npy 文件。
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+from episode_store import write_json
+from tac_episode import TacEpisode
+
+RASTER_FOLDER = "raster"
+RASTER_META_FILE = "raster.json"
+
+
+def interp_matrix(n_src, n_dst):
+    """
+    一维线性插值的权重矩阵 (n_dst, n_src)：输出像素中心均匀覆盖源网格的范围，边缘按最近的标志点取值。
+    """
+    pos = (np.arange(n_dst) + 0.5) * n_src / n_dst - 0.5
+    pos = np.clip(pos, 0, n_src - 1)
+    left = np.minimum(np.floor(pos).astype(np.int64), n_src - 2)
+    frac = pos - left
+    W = np.zeros((n_dst, n_src), dtype=np.float32)
+    rows = np.arange(n_dst)
+    W[rows, left] = 1.0 - frac
+    W[rows, left + 1] += frac
+    return W
+
+
+class GridRasterizer:
+    """
+    单个传感器的栅格化，插值权重只计算一次。
+    Args:
+        grid (TacGrid): 传感器的标志点网格。
+        size (int or tuple): 输出图像大小 H 或 (H, W)。
+    """
+    def __init__(self, grid, size=64):
+        self.grid = grid
+        self.size = (size, size) if np.isscalar(size) else tuple(size)
+        self.Wy = interp_matrix(grid.size, self.size[0])  # (H, 20)
+        self.Wx_T = interp_matrix(grid.size, self.size[1]).T.copy()  # (20, W)
+
+    def render(self, x):
+        """
+        (T, 400, C) -> (T, H, W, C)，float32。
+        """
+        g = self.grid.grid(np.asarray(x, dtype=np.float32))  # (T, 20, 20, C)
+        g = np.moveaxis(g, -1, 1)  # (T, C, 20, 20)
+        img = self.Wy @ g @ self.Wx_T  # (T, C, H, W)
+        return np.moveaxis(img, 1, -1)
+
+
+def render_episode(folder, fields=("D", "F"), size=64, dtype="float32", batch_size=1024, output=None):
+    """
+    把一次实验中每个传感器的字段渲染为图像，保存为 <output>/<SN>_<field>.npy，形状 (T, H, W, 3)，
+    行顺序与传感器数据流一致（时间戳见数据流的 timestamp）。
+    Args:
+        folder (str): TacRecorder 录制的实验文件夹。
+        fields (tuple): 需要渲染的字段，例如 ("D", "F")。
+        size (int): 输出图像大小。
+        dtype (str): 输出数据类型，'float32' 或 'float16'。
+        batch_size (int): 每批渲染的帧数，控制内存占用。
+        output (str): 输出文件夹，默认 <folder>/raster。
+    Returns:
+        dict: 输出文件的描述，同时保存为 raster.json。
+    """
+    episode = TacEpisode(folder)
+    output = output or os.path.join(folder, RASTER_FOLDER)
+    os.makedirs(output, exist_ok=True)
+    meta = {"size": [size, size], "dtype": dtype, "fields": list(fields), "files": {}}
+    for SN in episode.sensors:
+        stream = episode.streams[SN]
+        rasterizer = GridRasterizer(episode.marker_grid(SN), size)
+        T = len(stream)
+        for name in fields:
+            path = os.path.join(output, f"{SN}_{name}.npy")
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(T,) + rasterizer.size + (3,))
+            for start in range(0, T, batch_size):
+                stop = min(T, start + batch_size)
+                out[start:stop] = rasterizer.render(stream[name][start:stop])
+            out.flush()
+            del out
+            meta["files"].setdefault(SN, {})[name] = os.path.basename(path)
+    write_json(os.path.join(output, RASTER_META_FILE), meta)
+    return meta
+
+
+def load_raster(folder, SN, name="D"):
+    """以内存映射方式读取渲染结果 (T, H, W, 3)。"""
+    return np.load(os.path.join(folder, RASTER_FOLDER, f"{SN}_{name}.npy"), mmap_mode="r")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render Tac3D displacement/force fields to images.")
+    parser.add_argument('--folder_path', type=str, default='data_save/tac_data', help="Tactile data folder.")
+    parser.add_argument('--exp_number', type=str, required=True, help="Experiment number (e.g., '0001').")
+    parser.add_argument('--fields', type=str, nargs='+', default=["D", "F"], help="Fields to render (default: D F).")
+    parser.add_argument('--size', type=int, default=64, help="Output image size (default: 64).")
+    parser.add_argument('--dtype', type=str, default='float32', choices=["float32", "float16"],
+                        help="Output dtype (default: float32).")
+    parser.add_argument('--batch_size', type=int, default=1024, help="Frames rendered per batch (default: 1024).")
+    args = parser.parse_args()
+
+    exp_folder = os.path.join(args.folder_path, args.exp_number.zfill(4))
+    start = time.perf_counter()
+    meta = render_episode(exp_folder, args.fields, args.size, args.dtype, args.batch_size)
+    print(f"Rendered {meta['files']} in {time.perf_counter() - start:.2f} s")
+
+# python scripts/tac_raster.py --folder_path data_save/tac_data --exp_number 4 --size 64
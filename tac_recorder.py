@@ -0,0 +1,393 @@
+import os
+import math
+import time
+import threading
+import numpy as np
+from episode_store import EpisodeWriter, write_json
+from clock_model import ClockModel
+from tac_ring import TacRing
+from tac_codec import tactile_codecs
+from tac_features import FEATURE_FIELDS, FeatureExtractor
+
+# 传感器从采样到发出数据的固定延迟（毫秒），手动标定得到
+TAC_LATENCY_MS = 100
+
+# Tac3D 和机械手的最高帧率（Hz），用于按触发前保留时长估算环形缓冲区的大小
+TAC_MAX_RATE = 120
+HAND_MAX_RATE = 200
+
+# 实验文件夹中描述各数据流的文件，每个传感器和机械手各对应一个 episode 子文件夹
+TAC_EPISODE_FILE = "tac_episode.json"
+HAND_STREAM = "hand"
+FEATURE_STREAM = "features"  # 每个传感器的特征表保存在 features/<SN>/
+
+# 每个 Tac3D 传感器的数据流字段：(shape, dtype)
+TAC_FIELDS = {
+    "P": ((400, 3), "float32"),  # 三维形貌
+    "D": ((400, 3), "float32"),  # 三维变形场
+    "F": ((400, 3), "float32"),  # 三维分布力场
+    "Fr": ((1, 3), "float32"),  # 三维合力
+    "Mr": ((1, 3), "float32"),  # 三维合力矩
+    "send_ts": ((), "float64"),  # 传感器发送时间戳
+    "recv_ts": ((), "float64"),  # SDK 接收时间戳
+    "host_ts": ((), "float64"),  # 回调执行时的主机时间（毫秒）
+    "valid": ((), "uint8"),  # 第 k 位表示 TAC_FRAME_KEYS 中第 k 个字段在这一帧中存在
+}
+# TacFrame 的数组字段和 SDK 帧中对应的键
+TAC_FRAME_KEYS = (("P", "3D_Positions"), ("D", "3D_Displacements"), ("F", "3D_Forces"),
+                  ("Fr", "3D_ResultantForce"), ("Mr", "3D_ResultantMoment"))
+TAC_VALID_ALL = (1 << len(TAC_FRAME_KEYS)) - 1
+
+
+# hand_info 属性在数据流中的字段名，其余数值属性去掉开头的下划线后原样保存
+HAND_FIELD_NAMES = {"now_pos": "pos", "avg_force": "force", "_frame_cnt": "frame_cnt"}
+
+
+def hand_fields(num_sensors, info=None):
+    """
+    机械手数据流字段：hand_info 中所有数值类型的属性（标量或数组），缺少 info 时只有 pos/force/frame_cnt。
+    tac_index 记录该时刻每个传感器最新的帧序号，用于关联两个数据流。
+    Returns:
+        (fields, attrs)：fields 为字段名 -> (shape, dtype)，attrs 为字段名 -> hand_info 属性名。
+    """
+    fields = {
+        "pos": ((), "float64"),
+        "force": ((), "float64"),
+        "frame_cnt": ((), "int64"),
+    }
+    attrs = {name: attr for attr, name in HAND_FIELD_NAMES.items()}
+    for attr, value in (vars(info).items() if info is not None else ()):
+        if value is None or isinstance(value, str):
+            continue
+        try:
+            arr = np.asarray(value)
+        except Exception:
+            continue
+        if arr.dtype.kind not in "biuf" or arr.ndim > 2:
+            continue
+        name = HAND_FIELD_NAMES.get(attr, attr.lstrip("_"))
+        dtype = {"b": "bool", "f": "float64"}.get(arr.dtype.kind, "int64")
+        fields[name] = (arr.shape, dtype)
+        attrs[name] = attr
+    fields["tac_index"] = ((num_sensors,), "int64")
+    return fields, attrs
+
+
+def host_time_ms():
+    return time.time() * 1000
+
+
+class TacFrame:
+    """Tac3D 的一帧测量结果，数组预先分配，更新时原地拷贝。"""
+    __slots__ = ("frameIndex", "sendTimestamp", "recvTimestamp", "hostTimestamp", "valid", "P", "D", "F", "Fr", "Mr")
+
+    def __init__(self):
+        self.frameIndex = -1  # 帧序号
+        self.sendTimestamp = 0.0  # 传感器发送时间戳
+        self.recvTimestamp = 0.0  # SDK 接收时间戳
+        self.hostTimestamp = 0.0  # 回调执行时的主机时间（毫秒）
+        self.valid = TAC_VALID_ALL  # 这一帧中存在的字段，见 TAC_FIELDS["valid"]
+        self.P = np.zeros((400, 3))  # 三维形貌测量结果
+        self.D = np.zeros((400, 3))  # 三维变形场测量结果
+        self.F = np.zeros((400, 3))  # 三维分布力场测量结果
+        self.Fr = np.zeros((1, 3))  # 三维合力
+        self.Mr = np.zeros((1, 3))  # 三维合力矩
+
+    def copy_to(self, out):
+        out.frameIndex = self.frameIndex
+        out.sendTimestamp = self.sendTimestamp
+        out.recvTimestamp = self.recvTimestamp
+        out.hostTimestamp = self.hostTimestamp
+        out.valid = self.valid
+        np.copyto(out.P, self.P)
+        np.copyto(out.D, self.D)
+        np.copyto(out.F, self.F)
+        np.copyto(out.Fr, self.Fr)
+        np.copyto(out.Mr, self.Mr)
+
+
+class TacSnapshot:
+    """
+    Tac3D 最新测量结果的双缓冲快照，替代逐个属性赋值的 Tac3D_info。
+    写线程（Tac3D 回调）把新帧写进非活动缓冲区后再递增序号发布；读线程按序号取活动缓冲区拷贝，
+    拷贝期间序号发生变化（写线程可能已开始重写该缓冲区）则重读。读到的 P/D/F/Fr/Mr 一定来自同一帧，
+    不需要加锁，也没有逐帧的内存分配。
+    Args:
+        SN (str): 传感器 SN。
+    """
+    __slots__ = ("SN", "clock", "_buffers", "_seq")
+
+    def __init__(self, SN):
+        self.SN = SN  # 传感器 SN
+        self.clock = ClockModel(latency_ms=TAC_LATENCY_MS)  # 传感器时间到主机时间的映射
+        self._buffers = (TacFrame(), TacFrame())
+        self._seq = 0  # 已发布的帧数，活动缓冲区为 _buffers[_seq & 1]
+
+    def publish(self, frame, host_time):
+        """只在写线程中调用：把 SDK 回传的一帧写入非活动缓冲区并发布。"""
+        seq = self._seq
+        buf = self._buffers[(seq + 1) & 1]
+        buf.frameIndex = frame["index"]
+        buf.sendTimestamp = frame["sendTimestamp"]
+        buf.recvTimestamp = frame["recvTimestamp"]
+        buf.hostTimestamp = host_time
+        valid = 0
+        for bit, (name, key) in enumerate(TAC_FRAME_KEYS):
+            value = frame.get(key)
+            if value is None:
+                # 这一帧缺少该字段：置零并标记为无效，不保留缓冲区中两帧之前的数据
+                getattr(buf, name).fill(0)
+            else:
+                np.copyto(getattr(buf, name), value)
+                valid |= 1 << bit
+        buf.valid = valid
+        self._seq = seq + 1  # 数据写完后再发布
+        return buf
+
+    def read(self, out):
+        """拷贝一份一致的最新帧到 out（TacFrame），返回其序号。"""
+        while True:
+            seq = self._seq
+            self._buffers[seq & 1].copy_to(out)
+            if self._seq == seq:
+                return seq
+
+    @property
+    def seq(self):
+        return self._seq
+
+    @property
+    def frameIndex(self):
+        return self._buffers[self._seq & 1].frameIndex
+
+
+class TacRecorder:
+    """
+    触觉采集器：Tac3D 回调以传感器原生帧率把每一帧写入各自的环形缓冲区（按帧序号去重），
+    后台线程批量取出写入每个传感器的 episode；机械手状态（hand_info 的全部数值字段）以 SDK 的全帧率写入
+    单独的环形缓冲区，由同一个后台线程按块写入机械手数据流。
+    Args:
+        folder (str): 当前实验的数据文件夹。
+        sensors (list): 传感器 SN 列表。
+        chunk_size (int): 每次写盘的帧数。
+        ring_capacity (int): 每个传感器环形缓冲区的帧数。
+        drain_interval (float): 写盘线程读取环形缓冲区的间隔（秒）。
+        hand_capacity (int): 机械手数据环形缓冲区的帧数。
+        codec (str): P/D/F 的保存编码，'float32'、'float16' 或 'int16'。
+        error_bounds (dict): int16 编码时各字段的最大量化误差，例如 {"P": 1e-3, "F": 1e-4}。
+        on_flush (callable): 传给每个传感器 EpisodeWriter 的写盘回调。
+        pre_trigger_s (float): 触发前在内存中保留的时长（秒），触发时一次性写盘，0 表示不保留。
+        features (bool): 是否在写盘时计算触觉特征并保存特征表。
+        contact_threshold (float): 特征计算中判定接触的单点法向力阈值（N）。
+        queue_policy (str): 环形缓冲区满时的策略，'block'、'drop_oldest' 或 'drop_newest'，见 TacRing。
+    """
+    def __init__(self, folder, sensors, chunk_size=64, ring_capacity=256, drain_interval=0.01,
+                 hand_capacity=256,
+                 codec="int16", error_bounds=None, on_flush=None, pre_trigger_s=0.0,
+                 features=True, contact_threshold=0.005, queue_policy="drop_oldest"):
+        self.folder = folder
+        self.queue_policy = queue_policy
+        self.sensors = list(sensors)
+        self.drain_interval = drain_interval
+        self.pre_trigger_ms = 1000.0 * pre_trigger_s
+        os.makedirs(folder, exist_ok=True)
+        self.info = {
+            "sensors": self.sensors,
+            "hand": HAND_STREAM,
+            "features": FEATURE_STREAM if features else None,
+            "latency_ms": TAC_LATENCY_MS,
+            "pre_trigger_s": pre_trigger_s,
+            "queue_policy": queue_policy,
+            "triggers": [],
+        }
+        write_json(os.path.join(folder, TAC_EPISODE_FILE), self.info)
+
+        # 触发前的数据留在环形缓冲区中，容量需要覆盖保留时长再加上正常写盘的余量
+        ring_capacity += math.ceil(pre_trigger_s * TAC_MAX_RATE)
+        store_fields = dict(TAC_FIELDS, index=((), "int64"))
+        self.snapshots = {SN: TacSnapshot(SN) for SN in self.sensors}
+        self.rings = {SN: TacRing(TAC_FIELDS, ring_capacity, queue_policy) for SN in self.sensors}
+        self.tac_stores = {
+            SN: EpisodeWriter(os.path.join(folder, SN), store_fields, chunk_size=chunk_size,
+                              attrs={"SN": SN, "stream": "tactile"},
+                              codecs=tactile_codecs(codec, error_bounds), on_flush=on_flush)
+            for SN in self.sensors
+        }
+        self.extractors = {}
+        self.feature_stores = {}
+        if features:
+            self.extractors = {SN: FeatureExtractor(contact_threshold) for SN in self.sensors}
+            self.feature_stores = {
+                SN: EpisodeWriter(os.path.join(folder, FEATURE_STREAM, SN),
+                                  dict(FEATURE_FIELDS, index=((), "int64")), chunk_size=chunk_size,
+                                  attrs={"SN": SN, "stream": "features"})
+                for SN in self.sensors
+            }
+        # 机械手数据流的字段取决于 hand_info 的属性，在第一次回调时创建
+        self.chunk_size = chunk_size
+        self.hand_capacity = hand_capacity + math.ceil(pre_trigger_s * HAND_MAX_RATE)
+        self.hand_ring = None
+        self.hand_store = None
+        self._hand_attrs = {}
+        self.hand_errors = 0  # hand_info 数据与字段定义不一致的帧数
+
+        self.recording = False  # 为 True 时才把数据写盘
+        self._listeners = []  # 新帧发布后立即调用，用于低延迟的在线处理
+        self._running = False
+        self._drain_thread = threading.Thread(target=self._drain_loop, name="tac-drain", daemon=True)
+
+    def start(self):
+        self._running = True
+        self._drain_thread.start()
+        return self
+
+    def add_listener(self, listener):
+        """
+        注册新帧回调 listener(SN, frame)，在 SDK 回调线程中、写入环形缓冲区之前调用。
+        listener 应该只做唤醒等轻量操作，帧数据通过 latest() 读取。
+        """
+        # 替换整个列表而不是原地修改，SDK 回调线程遍历时不受影响
+        self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener):
+        """注销 add_listener 注册的回调，返回后不会再有新的调用（正在进行的调用除外）。"""
+        self._listeners = [l for l in self._listeners if l != listener]
+
+    def trigger(self, label="grasp"):
+        """
+        记录一次触发事件并开始写盘：触发前 pre_trigger_s 内的数据随下一次写盘一起写入，之后持续写盘。
+        触发事件保存在 tac_episode.json 和每个数据流的 meta.json 中。
+        Args:
+            label (str): 事件名称。
+        """
+        event = {
+            "label": label,
+            "host_ms": int(host_time_ms()),
+            "pre_trigger_s": self.pre_trigger_ms / 1000.0,
+            "tac_index": {SN: int(self.snapshots[SN].frameIndex) for SN in self.sensors},
+        }
+        self.info["triggers"].append(event)
+        write_json(os.path.join(self.folder, TAC_EPISODE_FILE), self.info)
+        stores = list(self.tac_stores.values()) + list(self.feature_stores.values())
+        if self.hand_store is not None:
+            stores.append(self.hand_store)
+        for store in stores:
+            store.update_attrs(triggers=store.attrs.get("triggers", []) + [event])
+        self.recording = True
+        return event
+
+    def latest(self, SN, out):
+        """把传感器 SN 的最新一帧拷贝到 out（TacFrame），可在任意线程中调用。"""
+        return self.snapshots[SN].read(out)
+
+    # Tac3D 的回调函数，在 SDK 接收线程中执行
+    def tac_callback(self, frame, param=None):
+        host_time = host_time_ms()
+        SN = frame["SN"]  # 通过 SN 号确定哪一个 Tac3D 调用了回调函数
+        snapshot = self.snapshots.get(SN)
+        if snapshot is None:
+            return
+
+        # 发布最新一帧，并用帧的发送时间更新时钟模型
+        buf = snapshot.publish(frame, host_time)
+        for listener in self._listeners:
+            listener(SN, buf)
+        snapshot.clock.update(buf.sendTimestamp, host_time)
+
+        self.rings[SN].push(
+            int(host_time - TAC_LATENCY_MS), buf.frameIndex,
+            P=buf.P, D=buf.D, F=buf.F, Fr=buf.Fr, Mr=buf.Mr,
+            send_ts=buf.sendTimestamp, recv_ts=buf.recvTimestamp, host_ts=host_time, valid=buf.valid,
+        )
+
+    # 机械手的回调函数，在 DexHand SDK 接收线程中执行，每一帧都写入环形缓冲区
+    def hand_callback(self, client):
+        now = host_time_ms()
+        info = client.hand_info
+        if self.hand_ring is None:
+            self._create_hand_stream(info)
+        values = {name: getattr(info, attr, None) for name, attr in self._hand_attrs.items()}
+        values["tac_index"] = [self.snapshots[SN].frameIndex for SN in self.sensors]
+        frame_cnt = values.get("frame_cnt")
+        try:
+            self.hand_ring.push(int(now), frame_cnt, **values)
+        except (ValueError, TypeError):
+            self.hand_errors += 1
+
+    def _create_hand_stream(self, info=None):
+        fields, self._hand_attrs = hand_fields(len(self.sensors), info)
+        self.hand_store = EpisodeWriter(
+            os.path.join(self.folder, HAND_STREAM), fields, chunk_size=self.chunk_size,
+            attrs={"stream": "hand", "hand_info": self._hand_attrs, "triggers": list(self.info["triggers"])},
+        )
+        self.hand_ring = TacRing(fields, self.hand_capacity, self.queue_policy)  # 最后赋值，写盘线程看到时数据流已创建好
+
+    def _drain_loop(self):
+        while self._running:
+            self._drain_once()
+            time.sleep(self.drain_interval)
+
+    def _drain_once(self):
+        recording = self.recording
+        now = host_time_ms()
+        hand_ring = self.hand_ring
+        if hand_ring is not None:
+            if not recording:
+                hand_ring.discard_before(now - self.pre_trigger_ms)
+            else:
+                batch = hand_ring.drain()
+                if batch is not None:
+                    timestamps, _, values = batch
+                    self.hand_store.append_batch(timestamps, **values)
+
+        # 触发前的帧时间戳为 host - TAC_LATENCY_MS，与保留时长比较时使用同样的时间基准
+        cutoff = now - TAC_LATENCY_MS - self.pre_trigger_ms
+        for SN, ring in self.rings.items():
+            if not recording:
+                ring.discard_before(cutoff)
+                continue
+            batch = ring.drain()
+            if batch is None:
+                continue
+            timestamps, frame_index, values = batch
+            self.tac_stores[SN].append_batch(timestamps, index=frame_index, **values)
+            if SN in self.extractors:
+                # 特征在写盘线程中按批计算，不占用 SDK 回调线程
+                features = self.extractors[SN](values["P"], values["D"], values["F"])
+                self.feature_stores[SN].append_batch(timestamps, index=frame_index, **features)
+
+    def stats(self):
+        hand = self.hand_ring.stats() if self.hand_ring is not None else {}
+        return {
+            "hand": dict(hand, errors=self.hand_errors),
+            "tactile": {SN: ring.stats() for SN, ring in self.rings.items()},
+        }
+
+    def close(self):
+        """停止后台线程，写完剩余数据并保存时钟拟合结果和缓冲区统计。"""
+        self._running = False
+        if self._drain_thread.is_alive():
+            self._drain_thread.join()
+        self._drain_once()
+        if self.hand_store is None:
+            self._create_hand_stream()
+        for SN, store in self.tac_stores.items():
+            store.attrs["clock"] = self.snapshots[SN].clock.to_dict()
+            store.attrs["ring"] = self.rings[SN].stats()
+            store.close()
+            for name, field_codec in store.codecs.items():
+                if field_codec.clipped_count:
+                    print(f"Warning: {SN} {name}: {field_codec.clipped_count} values clipped by the {field_codec.kind} codec.")
+        for SN, store in self.feature_stores.items():
+            store.attrs["extractor"] = self.extractors[SN].to_dict()
+            store.close()
+        stats = self.stats()
+        self.hand_store.attrs["ring"] = stats["hand"]
+        self.hand_store.close()
+        self.info["stats"] = stats
+        write_json(os.path.join(self.folder, TAC_EPISODE_FILE), self.info)
+        for name, ring_stats in [("hand", stats["hand"])] + list(stats["tactile"].items()):
+            lost = ring_stats.get("overruns", 0) + ring_stats.get("dropped", 0)
+            if lost:
+                print(f"Warning: {name}: {lost} frames lost in the ring buffer ({ring_stats['policy']}).")
+        return stats
@@ -0,0 +1,412 @@
+"""
+不依赖硬件的 Tac3D / DexHand 替身，用于在任意 Linux 机器上压测触觉采集：
+    ReplaySender       把录制的 episode 或合成的 400 点数据按设定的帧率、抖动、丢包、突发模式通过 UDP 发到本机
+    ReplaySensor       接收 ReplaySender 的数据包，接口与 PyTac3D.Sensor 相同（recvCallback / callbackParam / calibrate）
+    FakeDexHandClient  按设定频率调用 recvCallback_hand，接口与 DexHandClient 相同
+PyTac3D 的原始报文格式不在本仓库中，这里使用自定义的报文格式，回调收到的 frame 字典与 PyTac3D 相同。
+"""
+
+import time
+import queue
+import socket
+import struct
+import random
+import argparse
+import threading
+import numpy as np
+
+# 报文格式：magic, SN 长度, 帧序号, 发送时间戳, 然后是 SN 和 P/D/F/Fr/Mr（float32）
+PACKET_MAGIC = b"TRPL"
+PACKET_HEADER = struct.Struct("<4sHqd")
+FRAME_KEYS = (
+    ("3D_Positions", (400, 3)),
+    ("3D_Displacements", (400, 3)),
+    ("3D_Forces", (400, 3)),
+    ("3D_ResultantForce", (1, 3)),
+    ("3D_ResultantMoment", (1, 3)),
+)
+PAYLOAD_FLOATS = sum(int(np.prod(shape)) for _, shape in FRAME_KEYS)
+
+
+def encode_packet(SN, index, send_ts, frame):
+    sn = SN.encode()
+    payload = np.concatenate([np.asarray(frame[key], dtype=np.float32).ravel() for key, _ in FRAME_KEYS])
+    return PACKET_HEADER.pack(PACKET_MAGIC, len(sn), index, send_ts) + sn + payload.tobytes()
+
+
+def decode_packet(packet):
+    magic, sn_len, index, send_ts = PACKET_HEADER.unpack_from(packet)
+    if magic != PACKET_MAGIC:
+        return None
+    offset = PACKET_HEADER.size
+    SN = packet[offset:offset + sn_len].decode()
+    payload = np.frombuffer(packet, dtype=np.float32, count=PAYLOAD_FLOATS, offset=offset + sn_len)
+    frame = {"SN": SN, "index": index, "sendTimestamp": send_ts}
+    start = 0
+    for key, shape in FRAME_KEYS:
+        size = int(np.prod(shape))
+        frame[key] = payload[start:start + size].reshape(shape).astype(np.float64)
+        start += size
+    return frame
+
+
+def synthetic_frames(num_frames=None, rate=30.0, pitch=1.0, seed=0):
+    """
+    生成合成的 20x20 标志点数据：一个在传感器表面缓慢移动、先压下再抬起的高斯凸包。
+    Args:
+        num_frames (int): 帧数，None 表示无限循环。
+        rate (float): 帧率，决定运动速度。
+        pitch (float): 标志点间距（mm）。
+    """
+    rng = np.random.default_rng(seed)
+    ax = (np.arange(20) - 9.5) * pitch
+    gx, gy = np.meshgrid(ax, ax)
+    P0 = np.stack([gx.ravel(), gy.ravel(), np.zeros(400)], axis=1)
+    i = 0
+    while num_frames is None or i < num_frames:
+        t = i / rate
+        cx, cy = 3 * np.sin(0.5 * t), 3 * np.cos(0.3 * t)
+        depth = 0.5 * max(0.0, np.sin(0.8 * t))
+        r2 = (P0[:, 0] - cx) ** 2 + (P0[:, 1] - cy) ** 2
+        bump = np.exp(-r2 / 8.0)
+        D = np.zeros((400, 3))
+        D[:, 0] = 0.1 * depth * bump * np.cos(t)
+        D[:, 1] = 0.1 * depth * bump * np.sin(t)
+        D[:, 2] = -depth * bump
+        D += rng.normal(0, 0.002, D.shape)
+        F = -0.05 * D
+        F[:, 2] *= 4
+        Fr = F.sum(axis=0, keepdims=True)
+        Mr = np.cross(P0, F).sum(axis=0, keepdims=True)
+        yield {
+            "3D_Positions": P0 + D,
+            "3D_Displacements": D,
+            "3D_Forces": F,
+            "3D_ResultantForce": Fr,
+            "3D_ResultantMoment": Mr,
+        }
+        i += 1
+
+
+def slip_frames(num_frames=None, rate=30.0, period=3.0, slip_time=0.5, pitch=1.0, seed=0):
+    """
+    生成带周期性滑动的合成数据：传感器中心保持按压，每 period 秒中的最后 slip_time 秒
+    切向位移和切向力线性增大，模拟物体开始滑动，用于测试滑动检测闭环。
+    Args:
+        num_frames (int): 帧数，None 表示无限循环。
+        rate (float): 帧率（Hz）。
+        period (float): 滑动的周期（秒）。
+        slip_time (float): 每个周期中滑动的时长（秒）。
+    """
+    rng = np.random.default_rng(seed)
+    ax = (np.arange(20) - 9.5) * pitch
+    gx, gy = np.meshgrid(ax, ax)
+    P0 = np.stack([gx.ravel(), gy.ravel(), np.zeros(400)], axis=1)
+    bump = np.exp(-(P0[:, 0] ** 2 + P0[:, 1] ** 2) / 12.0)
+    i = 0
+    while num_frames is None or i < num_frames:
+        phase = (i / rate) % period
+        slip = max(0.0, (phase - (period - slip_time)) / slip_time)  # 0 -> 1
+        D = np.zeros((400, 3))
+        D[:, 0] = 0.3 * slip * bump
+        D[:, 2] = -0.4 * bump
+        D += rng.normal(0, 0.002, D.shape)
+        F = np.zeros((400, 3))
+        F[:, :2] = 0.5 * D[:, :2]
+        F[:, 2] = 0.2 * 0.4 * bump
+        yield {
+            "3D_Positions": P0 + D,
+            "3D_Displacements": D,
+            "3D_Forces": F,
+            "3D_ResultantForce": F.sum(axis=0, keepdims=True),
+            "3D_ResultantMoment": np.cross(P0, F).sum(axis=0, keepdims=True),
+        }
+        i += 1
+
+
+def episode_frames(folder, SN, loop=True):
+    """从 TacRecorder 录制的实验文件夹中按顺序读取传感器 SN 的数据。"""
+    from tac_episode import TacEpisode
+    stream = TacEpisode(folder).streams[SN]
+    while True:
+        for i in range(len(stream)):
+            yield {
+                "3D_Positions": stream["P"][i],
+                "3D_Displacements": stream["D"][i],
+                "3D_Forces": stream["F"][i],
+                "3D_ResultantForce": stream["Fr"][i],
+                "3D_ResultantMoment": stream["Mr"][i],
+            }
+        if not loop or len(stream) == 0:
+            return
+
+
+class ReplaySender:
+    """
+    以设定节奏把触觉数据通过 UDP 发送到本机端口，每个 SN 一路数据。
+    Args:
+        sources (dict): SN -> 帧生成器（synthetic_frames 或 episode_frames）。
+        host (str): 目标地址。
+        port (int): 目标端口。
+        rate (float): 帧率（Hz）。
+        jitter_ms (float): 发送时刻的高斯抖动标准差（毫秒）。
+        loss (float): 随机丢包概率。
+        burst (int): 突发模式下每次连续发送的帧数，1 表示均匀发送。
+        duplicate (float): 重复发送同一帧的概率，用于测试去重。
+    """
+    def __init__(self, sources, host="127.0.0.1", port=9988, rate=30.0, jitter_ms=0.0,
+                 loss=0.0, burst=1, duplicate=0.0, seed=0):
+        self.sources = sources
+        self.address = (host, port)
+        self.rate = rate
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.burst = max(1, burst)
+        self.duplicate = duplicate
+        self.random = random.Random(seed)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 22)
+        self.sent_count = 0  # 发送的报文数（含重复）
+        self.lost_count = 0  # 模拟丢包的帧数
+        self.duplicate_count = 0  # 重复发送的帧数
+        self.sent_frames = {SN: 0 for SN in sources}  # 每个传感器实际发出的帧数（不含重复）
+        self.running = False
+        self._thread = None
+
+    def run(self, num_frames=None):
+        """在当前线程中发送，num_frames 为每个传感器发送的帧数，None 表示直到 stop()。"""
+        self.running = True
+        period = 1.0 / self.rate
+        start = time.perf_counter()
+        device_start = time.monotonic()
+        index = 0
+        while self.running and (num_frames is None or index < num_frames):
+            # 突发模式：每 burst 帧按一次的节奏集中发送
+            if index % self.burst == 0:
+                target = start + index * period + self.random.gauss(0, self.jitter_ms / 1000.0)
+                delay = target - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            send_ts = time.monotonic() - device_start  # 模拟传感器自身的时钟（秒）
+            for SN, source in self.sources.items():
+                frame = next(source, None)
+                if frame is None:
+                    self.running = False
+                    break
+                if self.random.random() < self.loss:
+                    self.lost_count += 1
+                    continue
+                packet = encode_packet(SN, index, send_ts, frame)
+                self.sock.sendto(packet, self.address)
+                self.sent_count += 1
+                self.sent_frames[SN] += 1
+                if self.random.random() < self.duplicate:
+                    self.sock.sendto(packet, self.address)
+                    self.sent_count += 1
+                    self.duplicate_count += 1
+            index += 1
+        self.running = False
+
+    def start(self, num_frames=None):
+        self._thread = threading.Thread(target=self.run, args=(num_frames,), name="replay-sender", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
+        self.sock.close()
+
+
+class ReplaySensor:
+    """
+    PyTac3D.Sensor 的替身：从 UDP 端口接收 ReplaySender 的报文，在回调线程中调用 recvCallback(frame, callbackParam)。
+    与 SDK 一样，接收队列最长为 maxQSize，满了丢弃最旧的帧。
+    """
+    def __init__(self, recvCallback=None, port=9988, maxQSize=5, callbackParam=None):
+        self.recvCallback = recvCallback
+        self.callbackParam = callbackParam
+        self.queue = queue.Queue(maxsize=maxQSize)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(("0.0.0.0", port))
+        self.sock.settimeout(0.1)
+        self.received_count = 0
+        self.dropped_count = 0
+        self.running = True
+        self._recv_thread = threading.Thread(target=self._recv_loop, name="replay-recv", daemon=True)
+        self._callback_thread = threading.Thread(target=self._callback_loop, name="replay-callback", daemon=True)
+        self._recv_thread.start()
+        self._callback_thread.start()
+
+    def _recv_loop(self):
+        while self.running:
+            try:
+                packet, _ = self.sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            frame = decode_packet(packet)
+            if frame is None:
+                continue
+            frame["recvTimestamp"] = time.time()
+            self.received_count += 1
+            while True:
+                try:
+                    self.queue.put_nowait(frame)
+                    break
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped_count += 1
+                    except queue.Empty:
+                        pass
+
+    def _callback_loop(self):
+        while self.running:
+            try:
+                frame = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if self.recvCallback is not None:
+                self.recvCallback(frame, self.callbackParam)
+
+    def calibrate(self, SN):
+        print(f"[ReplaySensor] calibrate {SN} (no-op)")
+
+    def stop(self):
+        self.running = False
+        self._recv_thread.join()
+        self._callback_thread.join()
+        self.sock.close()
+
+
+class _HandInfo:
+    def __init__(self):
+        self.now_pos = 0.0
+        self.avg_force = 0.0
+        self.goal_force = 0.0
+        self.status = 0
+        self._frame_cnt = 0
+
+
+class FakeDexHandClient:
+    """
+    DexHandClient 的替身：后台线程按 rate 调用 recvCallback_hand(client)，grasp 时力按 load_time 线性加载。
+    Args:
+        rate (float): 回调频率（Hz），真机约为 100Hz。
+        jitter_ms (float): 回调时刻的高斯抖动标准差（毫秒）。
+    """
+    def __init__(self, ip="127.0.0.1", port=60031, recvCallback_hand=None, rate=100.0, jitter_ms=0.0, seed=0):
+        self.recvCallback_hand = recvCallback_hand
+        self.rate = rate
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+        self.hand_info = _HandInfo()
+        self.command_log = []  # (主机时间, 命令, 参数)，便于测试闭环控制
+        self._goal_force = 0.0
+        self._load_start = None
+        self._load_time = 0.0
+        self._start_force = 0.0
+        self._thread = None
+        self.running = False
+
+    def _log(self, name, **kwargs):
+        self.command_log.append((time.time(), name, kwargs))
+
+    def _loop(self):
+        period = 1.0 / self.rate
+        start = time.perf_counter()
+        i = 0
+        while self.running:
+            target = start + i * period + self.random.gauss(0, self.jitter_ms / 1000.0)
+            delay = target - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            info = self.hand_info
+            if self._load_start is not None:
+                alpha = 1.0 if self._load_time <= 0 else min(1.0, (time.time() - self._load_start) / self._load_time)
+                info.avg_force = self._start_force + alpha * (self._goal_force - self._start_force)
+                info.goal_force = self._goal_force
+                info.status = 1 if alpha < 1.0 else 2  # 1 加载中，2 已到达目标力
+            info._frame_cnt += 1
+            if self.recvCallback_hand is not None:
+                self.recvCallback_hand(self)
+            i += 1
+
+    def start_server(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, name="fake-hand", daemon=True)
+        self._thread.start()
+
+    def acquire_hand(self):
+        self._log("acquire_hand")
+
+    def set_home(self):
+        self._log("set_home")
+        self.hand_info.now_pos = 0.0
+
+    def calibrate_force_zero(self):
+        self._log("calibrate_force_zero")
+        self.hand_info.avg_force = 0.0
+
+    def contact(self, contact_speed=8, preload_force=2, quick_move_speed=15, quick_move_pos=10):
+        self._log("contact", contact_speed=contact_speed, preload_force=preload_force)
+        self.hand_info.now_pos = quick_move_pos
+        self.hand_info.avg_force = preload_force
+
+    def grasp(self, goal_force=5.0, load_time=5.0):
+        self._log("grasp", goal_force=goal_force, load_time=load_time)
+        self._start_force = self.hand_info.avg_force
+        self._goal_force = goal_force
+        self._load_time = load_time
+        self._load_start = time.time()
+
+    def pos_goto(self, pos):
+        self._log("pos_goto", pos=pos)
+        self.hand_info.now_pos = pos
+        self._goal_force = 0.0
+        self._load_start = time.time()
+        self._load_time = 0.0
+
+    def release_hand(self):
+        self._log("release_hand")
+        self.running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay Tac3D frames over UDP on localhost.")
+    parser.add_argument('--source', type=str, default='synthetic',
+                        help="'synthetic', 'slip' or a recorded experiment folder (e.g. data_save/tac_data/0004).")
+    parser.add_argument('--sensors', type=str, nargs='+', default=["HDL1-GWH0017", "HDL1-GWH0018"],
+                        help="Sensor SNs to replay.")
+    parser.add_argument('--port', type=int, default=9988, help="UDP port of the receiver (default: 9988).")
+    parser.add_argument('--rate', type=float, default=30.0, help="Frame rate per sensor in Hz (default: 30).")
+    parser.add_argument('--jitter_ms', type=float, default=0.0, help="Std of send time jitter in ms.")
+    parser.add_argument('--loss', type=float, default=0.0, help="Packet loss probability.")
+    parser.add_argument('--burst', type=int, default=1, help="Frames sent back-to-back per burst.")
+    parser.add_argument('--duplicate', type=float, default=0.0, help="Probability of sending a frame twice.")
+    parser.add_argument('--num_frames', type=int, default=None, help="Frames per sensor (default: until Ctrl-C).")
+    args = parser.parse_args()
+
+    if args.source == "synthetic":
+        sources = {SN: synthetic_frames(rate=args.rate, seed=i) for i, SN in enumerate(args.sensors)}
+    elif args.source == "slip":
+        sources = {SN: slip_frames(rate=args.rate, seed=i) for i, SN in enumerate(args.sensors)}
+    else:
+        sources = {SN: episode_frames(args.source, SN) for SN in args.sensors}
+
+    sender = ReplaySender(sources, port=args.port, rate=args.rate, jitter_ms=args.jitter_ms,
+                          loss=args.loss, burst=args.burst, duplicate=args.duplicate)
+    print(f"Replaying {args.source} to 127.0.0.1:{args.port} at {args.rate} Hz, Ctrl-C to stop...")
+    try:
+        sender.run(args.num_frames)
+    except KeyboardInterrupt:
+        pass
+    print(f"Sent {sender.sent_count} packets, dropped {sender.lost_count}.")
+
+# python scripts/tac_replay.py --source synthetic --rate 60 --jitter_ms 2 --loss 0.01
\ No newline at end of file
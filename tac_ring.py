@@ -0,0 +1,143 @@
+import time
+import numpy as np
+from frame_writer import POLICIES
+
+
+class TacRing:
+    """
+    单生产者/单消费者的无锁环形缓冲区，用于在 Tac3D 回调中以传感器原生帧率缓存每一帧。
+    生产者（SDK 回调线程）只写 head，消费者（写盘线程）只写 tail；先写数据再推进 head，
+    消费者读取时不会看到写了一半的帧。缓冲区满时按 policy 处理（与 FrameWriter 的队列策略相同）：
+    'drop_oldest' 覆盖最旧的帧并计入 overrun_count，'drop_newest' 丢弃新帧并计入 dropped_count，
+    'block' 在生产者线程中等待消费者读取，超过 block_timeout 仍然没有空位时丢弃新帧。
+    Args:
+        fields (dict): 字段名 -> (shape, dtype)，与 EpisodeWriter 的字段定义一致。
+        capacity (int): 缓冲的帧数。
+        policy (str): 缓冲区满时的策略，'block'、'drop_oldest' 或 'drop_newest'。
+        block_timeout (float): 'block' 策略下最长等待时间（秒）。
+    """
+    def __init__(self, fields, capacity=256, policy="drop_oldest", block_timeout=0.1):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}', expected one of {POLICIES}")
+        self.capacity = capacity
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.fields = {name: (tuple(shape), np.dtype(dtype)) for name, (shape, dtype) in fields.items()}
+        self._slots = {
+            name: np.zeros((capacity,) + shape, dtype=dtype)
+            for name, (shape, dtype) in self.fields.items()
+        }
+        self._timestamps = np.zeros(capacity, dtype=np.int64)
+        self._frame_index = np.full(capacity, -1, dtype=np.int64)
+        self.head = 0  # 已写入的帧总数，只由生产者修改
+        self.tail = 0  # 已读取的帧总数，只由消费者修改
+        self.last_index = None  # 最近一次写入的传感器帧序号
+        self.duplicate_count = 0  # 帧序号重复而被忽略的帧数
+        self.overrun_count = 0  # 消费者来不及读取而被覆盖的帧数
+        self.dropped_count = 0  # 缓冲区满时被丢弃的新帧数
+        self.blocked_count = 0  # 'block' 策略下需要等待的帧数
+        self.max_depth = 0  # 未读帧数的峰值
+
+    def push(self, timestamp, frame_index, **values):
+        """在生产者线程中调用。帧序号与上一帧相同时忽略，返回是否写入。"""
+        if frame_index is not None and frame_index == self.last_index:
+            self.duplicate_count += 1
+            return False
+        if self.policy != "drop_oldest" and not self._wait_for_space():
+            self.dropped_count += 1
+            return False
+        slot = self.head % self.capacity
+        self._timestamps[slot] = timestamp
+        self._frame_index[slot] = -1 if frame_index is None else frame_index
+        for name, value in values.items():
+            if value is not None:
+                self._slots[name][slot] = value
+        self.last_index = frame_index
+        self.head += 1  # 数据写完后再发布
+        depth = min(self.head - self.tail, self.capacity)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    def _wait_for_space(self):
+        """生产者线程中检查是否还有空位，'block' 策略下等待消费者读取。"""
+        if self.head - self.tail < self.capacity:
+            return True
+        if self.policy != "block":
+            return False
+        self.blocked_count += 1
+        deadline = time.perf_counter() + self.block_timeout
+        while self.head - self.tail >= self.capacity:
+            if time.perf_counter() > deadline:
+                return False
+            time.sleep(0.0005)
+        return True
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def drain(self, max_frames=None):
+        """
+        在消费者线程中调用，按顺序取出尚未读取的帧（拷贝）。
+        Returns:
+            (timestamps, frame_index, values) 或 None（没有新帧）。
+        """
+        head = self.head
+        tail = self.tail
+        if head - tail > self.capacity:
+            self.overrun_count += head - tail - self.capacity
+            tail = head - self.capacity
+        if max_frames is not None:
+            head = min(head, tail + max_frames)
+        n = head - tail
+        if n <= 0:
+            return None
+
+        idx = np.arange(tail, head) % self.capacity
+        timestamps = self._timestamps[idx]
+        frame_index = self._frame_index[idx]
+        values = {name: slots[idx] for name, slots in self._slots.items()}
+
+        # 'drop_oldest' 时拷贝期间生产者可能已经覆盖（或正在覆盖）最前面的几帧，丢弃这些帧
+        overwritten = self.head + 1 - self.capacity - tail if self.policy == "drop_oldest" else 0
+        if overwritten > 0:
+            self.overrun_count += overwritten
+            timestamps = timestamps[overwritten:]
+            frame_index = frame_index[overwritten:]
+            values = {name: v[overwritten:] for name, v in values.items()}
+        self.tail = head
+        if len(timestamps) == 0:
+            return None
+        return timestamps, frame_index, values
+
+    def discard_before(self, timestamp):
+        """
+        在消费者线程中调用，丢弃时间戳早于 timestamp 的未读帧，用于触发前只保留最近一段时间的数据。
+        Returns:
+            丢弃的帧数。
+        """
+        head = self.head
+        tail = self.tail
+        if head - tail > self.capacity:
+            self.overrun_count += head - tail - self.capacity
+            tail = head - self.capacity
+        if head <= tail:
+            return 0
+        ts = self._timestamps[np.arange(tail, head) % self.capacity]
+        keep = ts >= timestamp
+        n = int(np.argmax(keep)) if keep.any() else len(ts)
+        self.tail = tail + n
+        return n
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "capacity": self.capacity,
+            "pushed": self.head,
+            "pending": len(self),
+            "max_depth": self.max_depth,
+            "duplicates": self.duplicate_count,
+            "overruns": self.overrun_count,
+            "dropped": self.dropped_count,
+            "blocked": self.blocked_count,
+        }
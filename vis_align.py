@@ -0,0 +1,390 @@
+"""
+离线深度对齐：采集时不运行 rs.align，只保存原始深度图、颜色图以及设备的内参、外参和深度比例（vis_calib.json）。
+实验结束后按批把深度图重投影到颜色相机，算法与 librealsense 的 align（深度对齐到颜色）一致：
+每个深度像素的两个角点反投影到三维、变换到颜色相机坐标系、再投影，覆盖的颜色像素取最近的深度值。
+反投影射线只计算一次，整批帧用向量化的 NumPy 一起计算，多批在多个进程中并行。
+采集时设置了 ROI 的帧（颜色图已经裁剪），对齐到完整颜色图后再按同样的 ROI 裁剪深度图。
+"""
+
+import os
+import json
+import time
+import pickle
+import argparse
+import numpy as np
+from multiprocessing import Pool
+from episode_store import write_json
+from vis_storage import VisEncoder, ENCODING_KEY, decode_image
+from vis_roi import CaptureROI, ROI_KEY
+
+CALIB_FILE = "vis_calib.json"
+RAW_DEPTH_KEY = "depth_raw"  # 未对齐的深度图
+ALIGNED_DEPTH_KEY = "depth_image"  # 对齐到颜色图的深度图，与 rs.align 的结果一致
+_EMPTY = np.iinfo(np.uint16).max  # 对齐时没有深度的像素，最后置为 0
+POINT_BLOCK = 1 << 17  # 每块处理的深度点数
+
+
+def intrinsics_to_dict(intr):
+    """rs.intrinsics -> dict，畸变模型保存为名称，例如 'brown_conrady'。"""
+    return {
+        "width": intr.width,
+        "height": intr.height,
+        "fx": intr.fx,
+        "fy": intr.fy,
+        "ppx": intr.ppx,
+        "ppy": intr.ppy,
+        "model": str(intr.model).split(".")[-1],
+        "coeffs": list(intr.coeffs),
+    }
+
+
+def extrinsics_to_dict(extr):
+    """rs.extrinsics -> dict，rotation 与 SDK 一致为按列存储的 3x3 矩阵。"""
+    return {"rotation": list(extr.rotation), "translation": list(extr.translation)}
+
+
+def save_calibration(folder, serial, depth_intrinsics, color_intrinsics, depth_to_color, depth_scale):
+    """
+    保存离线对齐需要的标定信息。
+    Args:
+        folder (str): 相机数据文件夹。
+        serial (str): 相机序列号。
+        depth_intrinsics, color_intrinsics: rs.intrinsics 或 intrinsics_to_dict 的结果。
+        depth_to_color: rs.extrinsics 或 extrinsics_to_dict 的结果。
+        depth_scale (float): 深度单位（米）。
+    """
+    if not isinstance(depth_intrinsics, dict):
+        depth_intrinsics = intrinsics_to_dict(depth_intrinsics)
+    if not isinstance(color_intrinsics, dict):
+        color_intrinsics = intrinsics_to_dict(color_intrinsics)
+    if not isinstance(depth_to_color, dict):
+        depth_to_color = extrinsics_to_dict(depth_to_color)
+    calib = {
+        "serial": serial,
+        "depth_intrinsics": depth_intrinsics,
+        "color_intrinsics": color_intrinsics,
+        "depth_to_color": depth_to_color,
+        "depth_scale": float(depth_scale),
+    }
+    write_json(os.path.join(folder, CALIB_FILE), calib)
+    return calib
+
+
+def load_calibration(folder):
+    path = os.path.join(folder, CALIB_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def deproject(intr, u, v):
+    """像素 -> 归一化平面坐标 (x, y)，每个畸变模型的处理与 rs2_deproject_pixel_to_point 一致（z=1）。"""
+    x = (u - intr["ppx"]) / intr["fx"]
+    y = (v - intr["ppy"]) / intr["fy"]
+    c = intr["coeffs"]
+    model = intr["model"]
+    if model == "brown_conrady" and any(c):
+        # 迭代去畸变，10 次与 SDK 相同
+        xo, yo = x, y
+        for _ in range(10):
+            r2 = x * x + y * y
+            icdist = 1.0 / (1.0 + ((c[4] * r2 + c[1]) * r2 + c[0]) * r2)
+            dx = 2 * c[2] * x * y + c[3] * (r2 + 2 * x * x)
+            dy = 2 * c[3] * x * y + c[2] * (r2 + 2 * y * y)
+            x = (xo - dx) * icdist
+            y = (yo - dy) * icdist
+    elif model == "inverse_brown_conrady" and any(c):
+        # 逆畸变模型反投影时直接套用正向多项式
+        r2 = x * x + y * y
+        f = 1 + c[0] * r2 + c[1] * r2 * r2 + c[4] * r2 * r2 * r2
+        x, y = (x * f + 2 * c[2] * x * y + c[3] * (r2 + 2 * x * x),
+                y * f + 2 * c[3] * x * y + c[2] * (r2 + 2 * y * y))
+    # modified_brown_conrady 的图像不能反投影（SDK 中是 assert），与 SDK 的 release 版本一样不去畸变
+    return x, y
+
+
+def project(intr, x, y):
+    """归一化平面坐标 -> 像素，每个畸变模型的处理与 rs2_project_point_to_pixel 一致。"""
+    c = intr["coeffs"]
+    model = intr["model"]
+    if model in ("modified_brown_conrady", "brown_conrady") and any(c):
+        r2 = x * x + y * y
+        f = 1 + c[0] * r2 + c[1] * r2 * r2 + c[4] * r2 * r2 * r2
+        if model == "modified_brown_conrady":
+            # 先做径向畸变，切向畸变用畸变后的坐标
+            x, y = x * f, y * f
+            xf, yf = x, y
+        else:
+            xf, yf = x * f, y * f
+        x, y = (xf + 2 * c[2] * x * y + c[3] * (r2 + 2 * x * x),
+                yf + 2 * c[3] * x * y + c[2] * (r2 + 2 * y * y))
+    # inverse_brown_conrady 的图像投影时不加畸变（D415/D435 的颜色流），其他模型同样不处理
+    return x * intr["fx"] + intr["ppx"], y * intr["fy"] + intr["ppy"]
+
+
+class DepthAligner:
+    """
+    单个相机的深度对齐，反投影射线和外参只计算一次。
+    Args:
+        calib (dict): load_calibration 的结果。
+    """
+    def __init__(self, calib):
+        self.calib = calib
+        self.depth_intr = calib["depth_intrinsics"]
+        self.color_intr = calib["color_intrinsics"]
+        self.depth_scale = calib["depth_scale"]
+        self.depth_shape = (self.depth_intr["height"], self.depth_intr["width"])
+        self.color_shape = (self.color_intr["height"], self.color_intr["width"])
+        extr = calib["depth_to_color"]
+        self.rotation = np.array(extr["rotation"], dtype=np.float64).reshape(3, 3).T  # 按列存储 -> 矩阵
+        self.translation = np.array(extr["translation"], dtype=np.float64)
+
+        # 每个深度像素左上角和右下角的反投影射线，各为 (x, y) 两个长度 N 的数组，与 SDK 一样用 float32 计算
+        v, u = np.indices(self.depth_shape, dtype=np.float32)
+        u, v = u.ravel(), v.ravel()
+        self.rays = [deproject(self.depth_intr, u + np.float32(d), v + np.float32(d)) for d in (-0.5, 0.5)]
+
+    def _project_corner(self, ray, pixel, z):
+        """角点射线和深度 z（米）-> 颜色图中的整数像素坐标，无法投影的为 NaN。"""
+        X = ray[0][pixel] * z
+        Y = ray[1][pixel] * z
+        (r00, r01, r02), (r10, r11, r12), (r20, r21, r22) = self.rotation.astype(np.float32)
+        t0, t1, t2 = self.translation.astype(np.float32)
+        Z = r20 * X + r21 * Y + r22 * z + t2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = (r00 * X + r01 * Y + r02 * z + t0) / Z
+            y = (r10 * X + r11 * Y + r12 * z + t1) / Z
+        px, py = project(self.color_intr, x, y)
+        # SDK 用 static_cast<int>(p + 0.5f)，即向零取整
+        half = np.float32(0.5)
+        return np.trunc(px + half), np.trunc(py + half)
+
+    def _splat(self, out, frame, pixel, values):
+        """把一组深度点投影到颜色图，out 为 (T * Hc * Wc,) 的输出。"""
+        Hc, Wc = self.color_shape
+        z = values.astype(np.float32) * np.float32(self.depth_scale)
+        x0, y0 = self._project_corner(self.rays[0], pixel, z)
+        x1, y1 = self._project_corner(self.rays[1], pixel, z)
+        # 与 align_images 一样，矩形超出颜色图时整个丢弃（不裁剪到图像内），空矩形（包括 NaN）也丢弃
+        with np.errstate(invalid="ignore"):
+            ok = (x0 >= 0) & (y0 >= 0) & (x1 < Wc) & (y1 < Hc) & (x0 <= x1) & (y0 <= y1)
+        x0, y0 = x0[ok].astype(np.int64), y0[ok].astype(np.int64)
+        width, height = x1[ok].astype(np.int64) - x0, y1[ok].astype(np.int64) - y0
+        values = values[ok]
+        base = (frame[ok] * Hc + y0) * Wc + x0
+
+        # 矩形内的颜色像素都取该深度，重叠时取最近的（最小值）
+        for dy in range(int(height.max(initial=0)) + 1):
+            rows = np.flatnonzero(height >= dy)
+            for dx in range(int(width[rows].max(initial=0)) + 1):
+                sel = rows[width[rows] >= dx] if dx else rows
+                np.minimum.at(out, base[sel] + (dy * Wc + dx), values[sel])
+
+    def align(self, depth):
+        """
+        Args:
+            depth (np.ndarray): (T, H, W) 或 (H, W) 的原始深度图（uint16）。
+        Returns:
+            np.ndarray: 对齐到颜色图的深度图 (T, Hc, Wc) 或 (Hc, Wc)，uint16，没有深度的像素为 0。
+        """
+        depth = np.asarray(depth)
+        single = depth.ndim == 2
+        if single:
+            depth = depth[None]
+        T = len(depth)
+        Hc, Wc = self.color_shape
+        flat = depth.reshape(T, -1)
+        frame, pixel = np.nonzero(flat)
+        values = flat[frame, pixel]
+
+        # 整批的有效深度点按块处理，每块的中间数组能放进 CPU 缓存
+        out = np.full(T * Hc * Wc, _EMPTY, dtype=np.uint16)
+        for start in range(0, len(pixel), POINT_BLOCK):
+            block = slice(start, start + POINT_BLOCK)
+            self._splat(out, frame[block], pixel[block], values[block])
+        out[out == _EMPTY] = 0
+        out = out.reshape(T, Hc, Wc)
+        return out[0] if single else out
+
+
+def align_reference(calib, depth):
+    """
+    逐像素移植 librealsense 的 align_images（深度对齐到颜色），只用于检查 DepthAligner，速度很慢。
+    Args:
+        calib (dict): load_calibration 的结果。
+        depth (np.ndarray): (H, W) 的原始深度图。
+    """
+    depth_intr, color_intr = calib["depth_intrinsics"], calib["color_intrinsics"]
+    r = np.array(calib["depth_to_color"]["rotation"], dtype=np.float32)  # 按列存储，与 rs2_transform_point_to_point 相同
+    t = np.array(calib["depth_to_color"]["translation"], dtype=np.float32)
+    scale = np.float32(calib["depth_scale"])
+    Hc, Wc = color_intr["height"], color_intr["width"]
+    out = np.zeros((Hc, Wc), dtype=np.uint16)
+    for v in range(depth.shape[0]):
+        for u in range(depth.shape[1]):
+            if not depth[v, u]:
+                continue
+            z = np.array([depth[v, u]], dtype=np.float32) * scale
+            corners = []
+            for d in (-0.5, 0.5):
+                x, y = deproject(depth_intr, np.array([u + d], dtype=np.float32), np.array([v + d], dtype=np.float32))
+                X, Y, Z = x * z, y * z, z
+                ox = r[0] * X + r[3] * Y + r[6] * Z + t[0]
+                oy = r[1] * X + r[4] * Y + r[7] * Z + t[1]
+                oz = r[2] * X + r[5] * Y + r[8] * Z + t[2]
+                px, py = project(color_intr, ox / oz, oy / oz)
+                corners.append((px[0] + np.float32(0.5), py[0] + np.float32(0.5)))
+            if not np.all(np.isfinite(corners)):
+                continue
+            (x0, y0), (x1, y1) = [(int(px), int(py)) for px, py in corners]
+            if x0 < 0 or y0 < 0 or x1 >= Wc or y1 >= Hc:
+                continue
+            for y in range(y0, y1 + 1):
+                for x in range(x0, x1 + 1):
+                    out[y, x] = min(out[y, x], depth[v, u]) if out[y, x] else depth[v, u]
+    return out
+
+
+def check_aligner(seed=0):
+    """
+    检查 DepthAligner 与 rs.align 的一致性：手算的 3x3 帧，以及带畸变和外参的随机帧与 align_reference 逐像素比较。
+    Returns:
+        bool: 是否全部一致。
+    """
+    identity = {"rotation": [1, 0, 0, 0, 1, 0, 0, 0, 1], "translation": [0, 0, 0]}
+    pinhole = {"width": 3, "height": 3, "fx": 2.0, "fy": 2.0, "ppx": 1.0, "ppy": 1.0, "model": "none",
+               "coeffs": [0.0] * 5}
+    calib = {"depth_intrinsics": pinhole, "color_intrinsics": pinhole, "depth_to_color": identity,
+             "depth_scale": 1 / 1024}
+    # 内参相同、外参为单位阵时，深度像素 (u, v) 覆盖颜色像素 [u, u+1] x [v, v+1]，
+    # 超出最后一行或一列的矩形整个丢弃，重叠处取最近的深度
+    depth = np.array([[512, 1024, 2048], [4096, 256, 8192], [128, 64, 32]], dtype=np.uint16)
+    expected = np.array([[512, 512, 1024], [512, 256, 256], [4096, 256, 256]], dtype=np.uint16)
+    hand_ok = np.array_equal(DepthAligner(calib).align(depth), expected)
+    print(f"Hand-computed 3x3 frame: {'ok' if hand_ok else 'MISMATCH'}")
+
+    rng = np.random.default_rng(seed)
+    angle = 0.02
+    rotation = np.array([[np.cos(angle), 0, np.sin(angle)], [0, 1, 0], [-np.sin(angle), 0, np.cos(angle)]])
+    calib = {
+        "depth_intrinsics": {"width": 40, "height": 30, "fx": 38.0, "fy": 37.5, "ppx": 19.6, "ppy": 15.2,
+                             "model": "brown_conrady", "coeffs": [0.05, -0.02, 0.001, -0.001, 0.003]},
+        "color_intrinsics": {"width": 48, "height": 36, "fx": 45.0, "fy": 45.2, "ppx": 24.3, "ppy": 17.8,
+                             "model": "inverse_brown_conrady", "coeffs": [0.1, -0.05, 0.002, 0.001, 0.01]},
+        "depth_to_color": {"rotation": rotation.T.ravel().tolist(), "translation": [0.015, 0.001, -0.002]},
+        "depth_scale": 0.001,
+    }
+    depth = rng.integers(300, 2000, (30, 40)).astype(np.uint16)
+    depth[rng.random(depth.shape) < 0.1] = 0
+    aligned, reference = DepthAligner(calib).align(depth), align_reference(calib, depth)
+    mismatched = int(np.count_nonzero(aligned != reference))
+    print(f"Distorted random frame: {mismatched} of {reference.size} pixels differ from align_reference, "
+          f"{int(np.count_nonzero(reference == 0))} empty")
+    return hand_ok and mismatched == 0
+
+
+# 每个工作进程缓存一个 DepthAligner，避免每批重新计算射线
+_ALIGNERS = {}
+
+
+def _load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _write_pickle(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _is_pending(frame):
+    return isinstance(frame, dict) and RAW_DEPTH_KEY in frame and ALIGNED_DEPTH_KEY not in frame
+
+
+def _raw_depth(frame):
+    spec = frame.get(ENCODING_KEY, {}).get(RAW_DEPTH_KEY)
+    return frame[RAW_DEPTH_KEY] if spec is None else decode_image(frame[RAW_DEPTH_KEY], spec)
+
+
+def _align_files(args):
+    """工作进程：对齐一批帧文件并原地写回，已经对齐的帧跳过，返回处理的帧数。"""
+    folder, files, keep_raw = args
+    aligner = _ALIGNERS.get(folder)
+    if aligner is None:
+        aligner = _ALIGNERS[folder] = DepthAligner(load_calibration(folder))
+    paths, frames = [], []
+    for name in files:
+        path = os.path.join(folder, name)
+        frame = _load_pickle(path)
+        if _is_pending(frame):
+            paths.append(path)
+            frames.append(frame)
+    if not frames:
+        return 0
+    aligned = aligner.align(np.stack([_raw_depth(frame) for frame in frames]))
+    for path, frame, depth in zip(paths, frames, aligned):
+        if frame.get(ROI_KEY) is not None:
+            depth = np.ascontiguousarray(CaptureROI.from_dict(frame[ROI_KEY]).crop(depth))
+        # 压缩存储的帧按原始深度图的编码方式保存对齐结果，颜色图不重新编码
+        encoding = frame.get(ENCODING_KEY, {})
+        spec = encoding.get(RAW_DEPTH_KEY)
+        if spec is not None:
+            depth, encoding[ALIGNED_DEPTH_KEY] = VisEncoder(depth_format=spec["codec"]).encode_depth(depth)
+        frame[ALIGNED_DEPTH_KEY] = depth
+        frame["aligned"] = True
+        if not keep_raw:
+            del frame[RAW_DEPTH_KEY]
+            encoding.pop(RAW_DEPTH_KEY, None)
+        _write_pickle(path, frame)
+    return len(frames)
+
+
+def align_folder(folder, workers=None, batch_size=16, keep_raw=False):
+    """
+    离线对齐一个相机数据文件夹中的所有原始帧，结果写回每个 pickle 的 depth_image。
+    Args:
+        folder (str): 使用 H02VisData.py --defer_align 采集的相机数据文件夹。
+        workers (int): 工作进程数，默认 CPU 核数。
+        batch_size (int): 每批对齐的帧数。
+        keep_raw (bool): 是否保留原始深度图。
+    Returns:
+        int: 对齐的帧数。
+    """
+    if load_calibration(folder) is None:
+        raise FileNotFoundError(f"No {CALIB_FILE} in {folder}, cannot align depth offline.")
+    files = sorted(name for name in os.listdir(folder) if name.endswith(".pkl"))
+    batches = [(folder, files[i:i + batch_size], keep_raw) for i in range(0, len(files), batch_size)]
+    if not batches:
+        return 0
+    with Pool(workers or os.cpu_count()) as pool:
+        return sum(pool.imap_unordered(_align_files, batches))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Align raw RealSense depth to color offline.")
+    parser.add_argument('--base_folder', type=str, default='data_save/vis_data', help="First camera data folder.")
+    parser.add_argument('--base_folder515', type=str, default='data_save/vis_data515', help="Second camera data folder.")
+    parser.add_argument('--exp_number', type=str, default=None, help="Experiment number (e.g., '0001').")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument('--batch_size', type=int, default=16, help="Frames aligned per batch (default: 16).")
+    parser.add_argument('--keep_raw', action='store_true', help="Keep the unaligned depth image in each file.")
+    parser.add_argument('--check', action='store_true', help="Compare the aligner with rs.align on test frames and exit.")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check_aligner() else 1)
+    if args.exp_number is None:
+        parser.error("--exp_number is required unless --check is given")
+
+    for base_folder in (args.base_folder, args.base_folder515):
+        folder = os.path.join(base_folder, args.exp_number.zfill(4))
+        start = time.perf_counter()
+        count = align_folder(folder, args.workers, args.batch_size, args.keep_raw)
+        elapsed = time.perf_counter() - start
+        print(f"Aligned {count} frames in {folder} in {elapsed:.2f} s ({count / max(elapsed, 1e-9):.1f} fps)")
+
+# python scripts/vis_align.py --base_folder data_save/vis_data --base_folder515 data_save/vis_data515 --exp_number 1
+# python scripts/vis_align.py --check
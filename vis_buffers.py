@@ -0,0 +1,89 @@
+"""
+视觉帧的预分配缓冲区池：每个相机的每个数据流（深度、颜色）一个 BufferPool，
+对齐线程把 SDK 帧的数据复制进池中的缓冲区后立即释放 SDK 帧，写盘（和视频写入）完成后缓冲区回到池中，
+采集过程中不再为每帧分配新数组，SDK 的帧池也不会被等待写盘的帧占满。
+池中没有空闲缓冲区时临时分配一个数组（不回收），计入 exhausted。
+"""
+
+import time
+import threading
+import numpy as np
+
+
+class BufferPool:
+    """
+    单个数据流的缓冲区池，第一次 acquire 时按帧的形状和类型分配 size 个缓冲区，线程安全。
+    Args:
+        size (int): 缓冲区个数，应不少于同时在队列和线程中的帧数。
+        name (str): 用于打印信息，例如 '<序列号>/depth'。
+    """
+    def __init__(self, size, name="pool"):
+        self.size = max(1, size)
+        self.name = name
+        self.shape = None
+        self.dtype = None
+        self._free = []
+        self._pooled = {}  # id -> 池中的缓冲区，临时分配的数组不回收
+        self._acquired_at = {}  # 缓冲区 id -> 取出时间，用于统计回收延迟
+        self._lock = threading.Lock()
+
+        # 统计计数
+        self.acquired = 0  # 取出的缓冲区数
+        self.exhausted = 0  # 池中没有空闲缓冲区、临时分配的次数
+        self.max_in_use = 0  # 同时在用的缓冲区峰值
+        self.recycle_ms = []  # 每个缓冲区从取出到回收的时间（毫秒）
+
+    def _allocate(self, shape, dtype):
+        self.shape, self.dtype = shape, dtype
+        self._free = [np.empty(shape, dtype) for _ in range(self.size)]
+        self._pooled = {id(buf): buf for buf in self._free}
+
+    def acquire(self, shape, dtype):
+        """取出一个形状和类型匹配的缓冲区。"""
+        dtype = np.dtype(dtype)
+        with self._lock:
+            if self.shape is None:
+                self._allocate(tuple(shape), dtype)
+            self.acquired += 1
+            if self._free and tuple(shape) == self.shape and dtype == self.dtype:
+                buf = self._free.pop()
+                self._acquired_at[id(buf)] = time.perf_counter()
+                in_use = self.size - len(self._free)
+                if in_use > self.max_in_use:
+                    self.max_in_use = in_use
+                return buf
+            self.exhausted += 1
+            exhausted = self.exhausted
+        # 第一次以及之后每 100 次打印一次警告
+        if exhausted == 1 or exhausted % 100 == 0:
+            print(f"[{self.name}] Warning: buffer pool exhausted {exhausted} times, allocating.")
+        return np.empty(shape, dtype)
+
+    def copy(self, array):
+        """把数组（例如 SDK 帧的视图）复制进一个缓冲区并返回该缓冲区。"""
+        buf = self.acquire(array.shape, array.dtype)
+        np.copyto(buf, array)
+        return buf
+
+    def release(self, buf):
+        """缓冲区用完后放回池中，临时分配的数组直接丢弃。"""
+        key = id(buf)
+        with self._lock:
+            if key not in self._pooled or key not in self._acquired_at:
+                return
+            self.recycle_ms.append((time.perf_counter() - self._acquired_at.pop(key)) * 1000.0)
+            self._free.append(buf)
+
+    def stats(self):
+        with self._lock:
+            recycle = np.array(self.recycle_ms)
+            return {
+                "size": self.size,
+                "shape": list(self.shape) if self.shape is not None else None,
+                "acquired": self.acquired,
+                "exhausted": self.exhausted,
+                "in_use": len(self._acquired_at),
+                "max_in_use": self.max_in_use,
+                "recycle_ms_p50": float(np.percentile(recycle, 50)) if len(recycle) else None,
+                "recycle_ms_p99": float(np.percentile(recycle, 99)) if len(recycle) else None,
+            }
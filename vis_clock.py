@@ -0,0 +1,119 @@
+"""
+RealSense 帧的时间戳：记录每帧的硬件时间戳、时间戳域和帧号，并在线拟合硬件时间到主机时间的映射，
+文件名使用映射后的主机时间（毫秒），不受对齐、写盘等处理延迟影响，可以与触觉、轨迹数据按毫秒级精度匹配。
+采集结束时每个相机的拟合结果保存为 vis_clock.json，离线时用最终的拟合结果重新换算整段数据。
+"""
+
+import os
+import json
+import threading
+from clock_model import ClockModel
+from episode_store import write_json
+
+VIS_CLOCK_FILE = "vis_clock.json"
+# 拟合样本数达到该值后开始跟踪下包络（30 fps 时约 1 秒）
+VIS_CLOCK_MIN_SAMPLES = 30
+
+
+class FrameStamper:
+    """
+    单个相机的时间戳换算，在采集线程中调用。
+    Args:
+        serial (str): 相机序列号。
+        min_samples (int): 见 ClockModel。
+        clock (ClockModel): 已知的时钟映射（例如回放 .bag 时使用录制时保存的结果），给定时不再拟合。
+    """
+    def __init__(self, serial, min_samples=VIS_CLOCK_MIN_SAMPLES, clock=None):
+        self.serial = serial
+        self.fixed_clock = clock is not None
+        self.clock = clock if clock is not None else ClockModel(min_samples=min_samples)
+        self.domain = None
+        self.frame_count = 0
+        self.skipped_frames = 0  # 由帧号不连续推断的 SDK 丢帧数
+        self._last_number = None
+        self._last_timestamp = None
+        self._lock = threading.Lock()
+
+    def stamp(self, hw_timestamp, domain, frame_number, host_timestamp, depth_timestamp=None,
+              depth_frame_number=None):
+        """
+        Args:
+            hw_timestamp (float): 颜色帧的硬件时间戳（毫秒），frame.get_timestamp()。
+            domain (str): 时间戳域，例如 'timestamp_domain.global_time'。
+            frame_number (int): 颜色帧的帧号。
+            host_timestamp (float): 采集线程取到帧时的主机时间（毫秒）。
+            depth_timestamp, depth_frame_number: 深度帧的硬件时间戳和帧号。
+        Returns:
+            dict: 每帧保存的时间信息，"timestamp" 为换算后的主机时间（毫秒，同一相机内严格递增）。
+        """
+        with self._lock:
+            if not self.fixed_clock:
+                self.clock.update(hw_timestamp, host_timestamp)
+            if self.domain != domain:
+                if self.domain is not None:
+                    print(f"[{self.serial}] Warning: timestamp domain changed from {self.domain} to {domain}.")
+                self.domain = domain
+            if self._last_number is not None and frame_number > self._last_number + 1:
+                self.skipped_frames += frame_number - self._last_number - 1
+            self._last_number = frame_number
+            self.frame_count += 1
+
+            timestamp = int(round(float(self.clock.predict(hw_timestamp))))
+            # 保证文件名唯一
+            if self._last_timestamp is not None and timestamp <= self._last_timestamp:
+                timestamp = self._last_timestamp + 1
+            self._last_timestamp = timestamp
+
+        return {
+            "timestamp": timestamp,
+            "host_timestamp": host_timestamp,
+            "color_timestamp": hw_timestamp,
+            "timestamp_domain": domain,
+            "frame_number": frame_number,
+            "depth_timestamp": depth_timestamp,
+            "depth_frame_number": depth_frame_number,
+        }
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "serial": self.serial,
+                "timestamp_domain": self.domain,
+                "frames": self.frame_count,
+                "skipped_frames": self.skipped_frames,
+                "clock": self.clock.to_dict(),
+            }
+
+    def save(self, folder):
+        """把拟合结果保存到该相机的数据文件夹。"""
+        write_json(os.path.join(folder, VIS_CLOCK_FILE), self.to_dict())
+
+
+def load_vis_clock(folder):
+    """读取相机数据文件夹中的时钟模型，没有时返回 None。"""
+    path = os.path.join(folder, VIS_CLOCK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return ClockModel.from_dict(json.load(f)["clock"])
+
+
+def remap_timestamps(folder, frames):
+    """
+    用最终的时钟模型重新换算视觉帧的主机时间。
+    Args:
+        folder (str): 相机数据文件夹。
+        frames (list): [(timestamp, data)]，data 中有 "color_timestamp" 的帧才会重新换算。
+    Returns:
+        list: 按新时间戳排序的 [(timestamp, data)]；没有 vis_clock.json 时原样返回。
+    """
+    clock = load_vis_clock(folder)
+    if clock is None:
+        return frames
+    out = []
+    for ts, data in frames:
+        if isinstance(data, dict) and data.get("color_timestamp") is not None:
+            ts = int(round(float(clock.predict(data["color_timestamp"]))))
+        out.append((ts, data))
+    out.sort(key=lambda x: x[0])
+    return out
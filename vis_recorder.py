@@ -0,0 +1,300 @@
+"""
+多相机采集：每个相机一个采集线程，只负责从数据源取帧并把帧放进该相机的对齐队列；
+对齐和写盘分别由独立的线程池完成，一个相机写盘慢不会拖慢另一个相机，每个相机都能按自身帧率采集。
+文件名使用硬件时间戳换算后的主机时间（见 vis_clock.py），每帧同时保存硬件时间戳、时间戳域和帧号。
+defer_align 时对齐线程不做对齐，只保存原始深度图和标定信息，实验结束后用 vis_align.py 批量对齐。
+storage='compressed' 时图像在写盘线程中编码（见 vis_storage.py），磁盘带宽不再是瓶颈。
+color_video 时颜色流写入每个相机的分段视频（见 vis_video.py），逐帧的 pickle 只保存深度图和时间戳。
+数据源（实时相机、.bag 回放、合成数据）见 vis_source.py，采集流程与数据源无关。
+对齐线程把图像复制进预分配的缓冲区（见 vis_buffers.py）后立即释放 SDK 帧，缓冲区在写盘和视频写入完成后回收。
+每个相机可以设置 ROI（见 vis_roi.py），复制前先裁剪和降采样，复制后限制深度范围；
+defer_align 时原始深度图与颜色图的像素不对应，只限制深度范围，裁剪在 vis_align.py 对齐之后进行。
+"""
+
+import os
+import sys
+import time
+import pickle
+import select
+import threading
+import numpy as np
+from frame_writer import FrameWriter
+from vis_clock import FrameStamper, load_vis_clock
+from vis_align import save_calibration, RAW_DEPTH_KEY, ALIGNED_DEPTH_KEY
+from vis_storage import VisEncoder, STORAGE_KINDS
+from vis_video import SegmentedVideoWriter
+from vis_buffers import BufferPool
+from vis_roi import ROI_KEY
+
+
+class VisRecorder:
+    """
+    Args:
+        sources (list): 每个相机一个 CameraSource。
+        data_folders (list): 每个相机的数据保存路径，与 sources 一一对应。
+        queue_size (int): 每个对齐队列和写盘队列的最大长度。
+        align_workers (int): 每个相机的对齐线程数。
+        writer_threads (int): 写盘线程数。
+        queue_policy (str): 队列满时的策略，见 FrameWriter。
+        defer_align (bool): 是否保存未对齐的原始深度图，由 vis_align.py 离线对齐。
+        storage (str): 'raw' 保存原始数组，'compressed' 保存编码后的图像。
+        encoder (VisEncoder): 压缩存储时的编码器，None 使用默认设置。
+        color_video (bool): 是否把颜色流写入分段视频。
+        segment_s (float): 每个视频分段的时长（秒）。
+        video_format (str): 视频格式，'mp4' 或 'mkv'。
+        video_fps (float): 视频文件的帧率。
+        pool_size (int): 每个数据流的缓冲区个数，None 时按队列长度和线程数计算。
+        rois (list): 每个相机的 CaptureROI，None 表示保存整幅图像。
+    """
+    def __init__(self, sources, data_folders, queue_size=64, align_workers=2, writer_threads=2,
+                 queue_policy="drop_oldest", defer_align=False, storage="raw", encoder=None, color_video=False,
+                 segment_s=60.0, video_format="mp4", video_fps=30, pool_size=None,
+                 rois=None):
+        if len(sources) != len(data_folders):
+            raise ValueError(f"Got {len(sources)} sources but {len(data_folders)} data folders")
+        if storage not in STORAGE_KINDS:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {STORAGE_KINDS}")
+        self.sources = sources
+        self.serials = [source.serial for source in sources]
+        self.data_folders = data_folders
+        for folder in data_folders:
+            os.makedirs(folder, exist_ok=True)
+        self.defer_align = defer_align
+        self.rois = [roi if roi is not None and roi.enabled else None for roi in (rois or [None] * len(sources))]
+        self.encoder = (encoder or VisEncoder()) if storage == "compressed" else None
+
+        # 每个相机一个对齐队列，对齐后的图像进入共用的写盘队列
+        self.aligners = [
+            FrameWriter(self.align_frames, maxsize=queue_size, num_workers=align_workers,
+                        policy=queue_policy, name=f"align-{serial}")
+            for serial in self.serials
+        ]
+        self.writer = FrameWriter(self.save_data, maxsize=queue_size, num_workers=writer_threads,
+                                  policy=queue_policy, name="vis-writer",
+                                  on_drop=lambda item: self.release_images(item[0], item[2]))
+        # 每个相机一个视频写入线程，保证帧按顺序写入
+        self.video_writers = []
+        self.video_queues = []
+        if color_video:
+            for folder, serial in zip(data_folders, self.serials):
+                video = SegmentedVideoWriter(folder, fps=video_fps, segment_s=segment_s,
+                                             video_format=video_format, reorder=align_workers * 2)
+                self.video_writers.append(video)
+                self.video_queues.append(FrameWriter(lambda item, video=video: video.write(*item), maxsize=queue_size,
+                                                     policy=queue_policy, name=f"video-{serial}",
+                                                     on_drop=lambda item: item[2](item[0])))
+        # 每个相机的深度和颜色缓冲区池：写盘队列、写盘线程和对齐线程中同时可能有的帧数，
+        # 颜色图写视频时还要加上视频队列和重排缓冲区中的帧数
+        depth_pool = pool_size or queue_size + writer_threads + align_workers + 1
+        color_pool = pool_size or depth_pool + (queue_size + align_workers * 2 + 1 if color_video else 0)
+        self.pools = [
+            {"depth": BufferPool(depth_pool, name=f"{serial}/depth"),
+             "color": BufferPool(color_pool, name=f"{serial}/color")}
+            for serial in self.serials
+        ]
+        self.frame_counts = [0] * len(sources)
+        # 每帧从取帧到写盘完成的延迟（毫秒）
+        self.latency_ms = [[] for _ in sources]
+        # 每个相机的硬件时间戳到主机时间的映射，回放时使用录制时保存的映射
+        self.stampers = [
+            FrameStamper(source.serial, clock=load_vis_clock(folder) if source.playback else None)
+            for source, folder in zip(sources, data_folders)
+        ]
+
+        self.running = True
+        self._capture_threads = []
+        self._start_time = None
+
+    def stop_on_keypress(self):
+        """监听标准输入，当用户输入 's' 并按下回车时停止运行"""
+        print("Press 's' and Enter to stop...")
+        while self.running:
+            if sys.stdin in select.select([sys.stdin], [], [], 0.1)[0]:
+                line = sys.stdin.readline()
+                if not line:
+                    # 标准输入已关闭（例如后台运行），不再监听
+                    break
+                user_input = line.strip()
+                if user_input.lower() == 's':
+                    print("Stopping RealSense...")
+                    self.running = False  # 设置为 False，通知主线程停止
+                    break
+
+    def capture_loop(self, i):
+        """第 i 个相机的采集线程：只取帧和打时间戳，对齐和写盘交给线程池。"""
+        source = self.sources[i]
+        while self.running:
+            frames = source.read(1000)
+            if frames is None:
+                # 超时，重新检查是否需要停止；回放结束时退出
+                if source.finished:
+                    break
+                continue
+            host_timestamp = time.time() * 1000.0  # 取帧时的主机时间（毫秒），用于拟合时钟映射
+            info = source.frame_info(frames)
+            if info is None:
+                continue
+            stamp = self.stampers[i].stamp(info["hw_timestamp"], info["domain"], info["frame_number"], host_timestamp,
+                                           depth_timestamp=info["depth_timestamp"],
+                                           depth_frame_number=info["depth_frame_number"])
+            self.frame_counts[i] += 1
+            if source.record_only:
+                # 只录制 .bag 时 SDK 已经保存了原始数据，这里只拟合时钟
+                continue
+            # 用 list 而不是 tuple，对齐线程取出 frames 后队列元素不再引用 SDK 帧
+            self.aligners[i].put([i, stamp, frames])
+
+    def align_frames(self, item):
+        """对齐线程：把深度帧对齐到颜色帧（defer_align 时不对齐），复制进缓冲区后释放 SDK 帧，再放进写盘队列。"""
+        frames = item.pop()
+        i, stamp = item
+        result = self.sources[i].images(frames, align=not self.defer_align)
+        if result is None:
+            return
+        depth_image, color_image = result
+        roi = self.rois[i]
+        if roi is not None:
+            # 只复制 ROI 内的像素
+            color_image = roi.crop(color_image)
+            if not self.defer_align:
+                depth_image = roi.crop(depth_image)
+        pools = self.pools[i]
+        depth_image = pools["depth"].copy(depth_image)
+        color_image = pools["color"].copy(color_image)
+        # 数据已经复制，不再持有 SDK 帧（写盘队列满时 put 可能阻塞）
+        del frames, result
+        if roi is not None:
+            roi.clip_depth(depth_image)
+        depth_key = RAW_DEPTH_KEY if self.defer_align else ALIGNED_DEPTH_KEY
+        images = {
+            depth_key: depth_image,
+            "color_image": color_image,
+            "aligned": not self.defer_align,
+        }
+        if roi is not None:
+            images[ROI_KEY] = roi.to_dict()
+        self.writer.put((i, stamp, images))
+
+    def release_images(self, i, images):
+        """把一帧的图像放回第 i 个相机的缓冲区池。"""
+        pools = self.pools[i]
+        for key, pool in (("color_image", pools["color"]), (RAW_DEPTH_KEY, pools["depth"]),
+                          (ALIGNED_DEPTH_KEY, pools["depth"])):
+            if key in images:
+                pool.release(images[key])
+
+    def save_data(self, item):
+        """写盘线程：每帧（压缩存储时先编码）保存为一个 pickle 文件，写完后回收缓冲区。"""
+        i, stamp, images = item
+        if self.video_queues:
+            # 颜色图交给该相机的视频写入线程，写入视频后回收
+            images = dict(images)
+            self.video_queues[i].put((images.pop("color_image"), stamp, self.pools[i]["color"].release))
+        try:
+            encoded = self.encoder.encode(images) if self.encoder is not None else images
+            # Prepare data dictionary
+            data = {**encoded, **stamp}
+
+            # 使用换算到主机时间的硬件时间戳作为文件名
+            file_name = f"{stamp['timestamp']}.pkl"
+            file_path = os.path.join(self.data_folders[i], file_name)
+
+            # 保存数据到文件
+            with open(file_path, "wb") as f:
+                pickle.dump(data, f)
+        finally:
+            self.release_images(i, images)
+        self.latency_ms[i].append(time.time() * 1000.0 - stamp["host_timestamp"])
+
+    def start(self):
+        for source, folder, roi in zip(self.sources, self.data_folders, self.rois):
+            source.start()
+            calib = source.calibration() if self.defer_align or roi is not None else None
+            if calib is None:
+                continue
+            if roi is not None:
+                roi.depth_scale = calib["depth_scale"]
+            if self.defer_align:
+                # 离线对齐需要的内参、外参和深度比例
+                save_calibration(folder, source.serial, **calib)
+
+        self.writer.start()
+        for video_queue in self.video_queues:
+            video_queue.start()
+        for aligner in self.aligners:
+            aligner.start()
+        self._capture_threads = [
+            threading.Thread(target=self.capture_loop, args=(i,), name=f"capture-{serial}", daemon=True)
+            for i, serial in enumerate(self.serials)
+        ]
+        self._start_time = time.time()
+        for thread in self._capture_threads:
+            thread.start()
+        return self
+
+    @property
+    def capturing(self):
+        """是否还有相机在采集（回放和合成数据读完后自动结束）。"""
+        return self.running and any(thread.is_alive() for thread in self._capture_threads)
+
+    def print_fps(self, start_time, counts):
+        """打印每个相机最近一段时间的采集帧率。"""
+        elapsed = time.time() - start_time
+        for serial, count, prev in zip(self.serials, self.frame_counts, counts):
+            print(f"[{serial}] {(count - prev) / elapsed:.1f} fps")
+
+    def run(self, report_interval=5.0, stop_key=True):
+        """启动采集，直到按下 's' 或所有数据源读完，返回统计信息。"""
+        if stop_key:
+            # 在单独的线程中监听键盘输入
+            stop_thread = threading.Thread(target=self.stop_on_keypress)
+            stop_thread.daemon = True  # 设置为守护线程，确保主线程结束时它也会结束
+            stop_thread.start()
+
+        self.start()
+        try:
+            report_time = time.time()
+            counts = list(self.frame_counts)
+            while self.capturing:
+                time.sleep(0.1)
+                if time.time() - report_time >= report_interval:
+                    self.print_fps(report_time, counts)
+                    report_time = time.time()
+                    counts = list(self.frame_counts)
+        finally:
+            stats = self.stop()
+        return stats
+
+    def stop(self):
+        """停止采集，等待队列中的数据处理完，保存时钟映射，返回每个相机的帧率、延迟、队列和缓冲区池统计。"""
+        self.running = False  # 确保停止运行
+        for thread in self._capture_threads:
+            thread.join()
+        elapsed = time.time() - self._start_time
+        # 先等对齐队列清空，再等写盘队列清空
+        align_stats = [aligner.stop() for aligner in self.aligners]
+        writer_stats = self.writer.stop()
+        video_stats = [(video_queue.stop(), video.close())
+                       for video_queue, video in zip(self.video_queues, self.video_writers)]
+        for source in self.sources:
+            source.stop()  # 停止每个相机的流
+
+        stats = {"elapsed_s": elapsed, "writer": writer_stats, "cameras": {}}
+        for i, serial in enumerate(self.serials):
+            # 保存每个相机最终的时钟映射，离线配对时用它重新换算时间戳
+            stamper = self.stampers[i]
+            stamper.save(self.data_folders[i])
+            latency = np.array(self.latency_ms[i])
+            stats["cameras"][serial] = {
+                "frames": self.frame_counts[i],
+                "fps": self.frame_counts[i] / elapsed if elapsed > 0 else 0.0,
+                "written": len(latency),
+                "skipped_frames": stamper.skipped_frames,
+                "latency_ms_p50": float(np.percentile(latency, 50)) if len(latency) else None,
+                "latency_ms_p99": float(np.percentile(latency, 99)) if len(latency) else None,
+                "align": align_stats[i],
+                "buffers": {name: pool.stats() for name, pool in self.pools[i].items()},
+            }
+            if video_stats:
+                stats["cameras"][serial]["video"] = video_stats[i]
+        return stats
@@ -0,0 +1,113 @@
+"""
+采集时的感兴趣区域：每个相机可以只保存颜色图（和对齐后的深度图）中的一个矩形区域，
+再按固定间隔降采样，深度超出范围的像素置为 0，写盘的数据量和之后生成点云的计算量按比例减少。
+降采样直接取间隔的像素（不做插值），深度图和颜色图的像素仍然一一对应。
+每帧保存 ROI 的参数（"roi"），裁剪后的像素坐标可以换算回原图像的像素坐标，原图像的内参也可以换算为裁剪后的内参。
+"""
+
+import numpy as np
+
+ROI_KEY = "roi"
+
+
+def parse_roi(text):
+    """'x,y,w,h' -> (x, y, w, h)，空字符串或 None 返回 None。"""
+    if not text:
+        return None
+    values = tuple(int(v) for v in text.split(","))
+    if len(values) != 4:
+        raise ValueError(f"ROI must be 'x,y,w,h', got '{text}'")
+    return values
+
+
+class CaptureROI:
+    """
+    单个相机的裁剪、降采样和深度范围。
+    Args:
+        roi (tuple): 颜色图中的 (x, y, 宽, 高)，None 表示整幅图像。
+        decimation (int): 裁剪后每隔 decimation 个像素取一个像素。
+        depth_range (tuple): (最近, 最远) 深度（米），范围外的深度置为 0，None 表示不限制。
+        depth_scale (float): 深度图单位（米），限制深度范围时需要，通常由 VisRecorder 从相机读取。
+    """
+    def __init__(self, roi=None, decimation=1, depth_range=None, depth_scale=None):
+        if roi is not None:
+            x, y, w, h = roi
+            if x < 0 or y < 0 or w <= 0 or h <= 0:
+                raise ValueError(f"Invalid ROI {roi}, expected x, y >= 0 and w, h > 0")
+            roi = (int(x), int(y), int(w), int(h))
+        if decimation < 1:
+            raise ValueError(f"Decimation must be >= 1, got {decimation}")
+        if depth_range is not None:
+            near, far = depth_range
+            if not 0 <= near < far:
+                raise ValueError(f"Invalid depth range {depth_range}, expected 0 <= near < far")
+            depth_range = (float(near), float(far))
+        self.roi = roi
+        self.decimation = int(decimation)
+        self.depth_range = depth_range
+        self.depth_scale = depth_scale
+
+    @property
+    def enabled(self):
+        return self.roi is not None or self.decimation > 1 or self.depth_range is not None
+
+    @property
+    def origin(self):
+        return self.roi[:2] if self.roi is not None else (0, 0)
+
+    def crop(self, image):
+        """裁剪和降采样，返回原数组的视图（不复制）。"""
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            image = image[y:y + h, x:x + w]
+        if self.decimation > 1:
+            image = image[::self.decimation, ::self.decimation]
+        return image
+
+    def clip_depth(self, depth):
+        """把深度范围外的像素原地置为 0（0 在 RealSense 中表示无效深度）。"""
+        if self.depth_range is None:
+            return depth
+        if self.depth_scale is None:
+            raise ValueError("depth_scale is required to clip the depth range")
+        near, far = (int(np.ceil(self.depth_range[0] / self.depth_scale)),
+                     int(np.floor(self.depth_range[1] / self.depth_scale)))
+        depth[(depth < near) | (depth > far)] = 0
+        return depth
+
+    def to_full(self, u, v):
+        """裁剪后图像的像素坐标 (u, v) -> 原图像的像素坐标。"""
+        x0, y0 = self.origin
+        return x0 + np.asarray(u) * self.decimation, y0 + np.asarray(v) * self.decimation
+
+    def intrinsics(self, intr):
+        """
+        原图像的内参 dict（见 vis_align.intrinsics_to_dict）-> 裁剪后图像的内参，
+        畸变系数不变，只平移主点并按降采样缩放焦距和主点。
+        """
+        x0, y0 = self.origin
+        d = self.decimation
+        width, height = intr["width"] - x0, intr["height"] - y0
+        if self.roi is not None:
+            width, height = min(width, self.roi[2]), min(height, self.roi[3])
+        return {
+            **intr,
+            "width": -(-width // d),
+            "height": -(-height // d),
+            "fx": intr["fx"] / d,
+            "fy": intr["fy"] / d,
+            "ppx": (intr["ppx"] - x0) / d,
+            "ppy": (intr["ppy"] - y0) / d,
+        }
+
+    def to_dict(self):
+        return {
+            "roi": list(self.roi) if self.roi is not None else None,
+            "decimation": self.decimation,
+            "depth_range": list(self.depth_range) if self.depth_range is not None else None,
+            "depth_scale": self.depth_scale,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d.get("roi"), d.get("decimation", 1), d.get("depth_range"), d.get("depth_scale"))
@@ -0,0 +1,169 @@
+"""
+视觉采集的数据源接口：每个相机一个 CameraSource，采集线程只调用 read()，
+之后的时间戳换算、对齐、编码和写盘都由 VisRecorder 完成，与数据来自真实相机、.bag 回放还是合成数据无关。
+RealSense 的实时采集和 .bag 回放见 realsense_source.py；这里的 SyntheticSource 不依赖 pyrealsense2，
+按给定的分辨率、帧率、抖动和丢帧模式生成数据，用于在普通 Linux 机器上测量采集链路的帧率和延迟。
+"""
+
+import time
+import numpy as np
+
+SOURCE_KINDS = ("live", "bag", "synthetic")
+
+
+def _pinhole(width, height, fx):
+    return {"width": width, "height": height, "fx": fx, "fy": fx, "ppx": width / 2.0, "ppy": height / 2.0,
+            "model": "none", "coeffs": [0.0] * 5}
+
+
+class CameraSource:
+    """
+    单个相机的数据源。
+    Attributes:
+        serial (str): 相机序列号，用于线程名和打印信息。
+        playback (bool): 是否回放录制的数据，回放时使用录制时保存的时钟映射。
+        record_only (bool): 是否只由 SDK 录制原始数据，此时 VisRecorder 只换算时间戳，不对齐和写盘。
+    """
+    serial = None
+    playback = False
+    record_only = False
+
+    def start(self):
+        return self
+
+    def read(self, timeout_ms=1000):
+        """等待下一帧，超时返回 None。返回的帧对象可以交给其他线程处理。"""
+        raise NotImplementedError
+
+    @property
+    def finished(self):
+        """数据是否已经读完（回放和合成数据），实时采集始终为 False。"""
+        return False
+
+    def frame_info(self, frames):
+        """
+        返回颜色帧和深度帧的时间信息 dict：hw_timestamp, domain, frame_number, depth_timestamp, depth_frame_number，
+        没有颜色帧时返回 None。
+        """
+        raise NotImplementedError
+
+    def images(self, frames, align=True):
+        """
+        在对齐线程中调用，返回 (深度图, 颜色图) 的 NumPy 数组，align=False 时返回未对齐的原始深度图；帧无效时返回 None。
+        """
+        raise NotImplementedError
+
+    def calibration(self):
+        """离线对齐需要的标定信息（save_calibration 的参数），没有时返回 None。"""
+        return None
+
+    def stop(self):
+        pass
+
+
+class SyntheticSource(CameraSource):
+    """
+    合成数据源：按帧率生成颜色图和深度图，图像从少量预先生成的图像中循环取出，生成本身几乎不占时间。
+    Args:
+        serial (str): 相机序列号。
+        color_size (tuple): 颜色图 (宽, 高)。
+        depth_size (tuple): 原始深度图 (宽, 高)。
+        fps (float): 帧率。
+        jitter_ms (float): 帧到达时间的抖动标准差（毫秒）。
+        loss (float): 每帧丢失的概率。
+        burst (int): 每次丢帧连续丢失的帧数。
+        num_frames (int): 生成的帧数（包括丢失的帧），None 表示一直生成。
+        drift_ppm (float): 合成相机时钟相对主机时钟的漂移（百万分之一）。
+        seed (int): 随机种子。
+        num_images (int): 预先生成、循环使用的图像数。
+    """
+    DEPTH_SCALE = 0.00025
+
+    def __init__(self, serial="SYN-0000", color_size=(640, 480), depth_size=(640, 480), fps=30.0, jitter_ms=0.0,
+                 loss=0.0, burst=1, num_frames=None, drift_ppm=0.0, seed=0, num_images=8):
+        self.serial = serial
+        self.color_size = tuple(color_size)
+        self.depth_size = tuple(depth_size)
+        self.fps = fps
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.burst = max(1, burst)
+        self.num_frames = num_frames
+        self.drift_ppm = drift_ppm
+        self.rng = np.random.default_rng(seed)
+        self.frame_number = 0
+        self.dropped = 0
+        self._start = None
+        self._drop_left = 0
+
+        # 预先生成的图像：颜色为渐变加噪声，深度为倾斜平面加噪声；对齐后的深度图与颜色图同尺寸
+        cw, ch = self.color_size
+        dw, dh = self.depth_size
+        self._colors, self._depths, self._aligned = [], [], []
+        for k in range(num_images):
+            yy, xx = np.mgrid[0:ch, 0:cw]
+            color = np.stack([(xx + 8 * k) % 256, (yy + 4 * k) % 256, (xx + yy) % 256], axis=-1)
+            color = color + self.rng.integers(0, 16, color.shape)
+            self._colors.append(color.astype(np.uint8))
+            yy, xx = np.mgrid[0:dh, 0:dw]
+            depth = 2000 + 2 * xx + yy + 20 * k + self.rng.integers(0, 8, (dh, dw))
+            self._depths.append(depth.astype(np.uint16))
+            rows = np.arange(ch) * dh // ch
+            cols = np.arange(cw) * dw // cw
+            self._aligned.append(self._depths[-1][rows[:, None], cols[None, :]])
+
+    def start(self):
+        self._start = time.time()
+        return self
+
+    @property
+    def finished(self):
+        return self.num_frames is not None and self.frame_number >= self.num_frames
+
+    def read(self, timeout_ms=1000):
+        while not self.finished:
+            k = self.frame_number
+            self.frame_number += 1
+            # 丢帧：开始一次丢帧后连续丢 burst 帧
+            if self._drop_left == 0 and self.loss > 0 and self.rng.random() < self.loss:
+                self._drop_left = self.burst
+            if self._drop_left > 0:
+                self._drop_left -= 1
+                self.dropped += 1
+                continue
+            due = self._start + k / self.fps + max(0.0, self.rng.normal(0, self.jitter_ms)) / 1000.0
+            delay = due - time.time()
+            if delay > timeout_ms / 1000.0:
+                # 按帧率等待，超时时下次再取这一帧
+                self.frame_number -= 1
+                time.sleep(timeout_ms / 1000.0)
+                return None
+            if delay > 0:
+                time.sleep(delay)
+            return k
+        return None
+
+    def frame_info(self, frames):
+        device_ms = frames * 1000.0 / self.fps * (1.0 + self.drift_ppm * 1e-6)
+        return {
+            "hw_timestamp": device_ms,
+            "domain": "synthetic",
+            "frame_number": frames,
+            "depth_timestamp": device_ms,
+            "depth_frame_number": frames,
+        }
+
+    def images(self, frames, align=True):
+        k = frames % len(self._colors)
+        depth = self._aligned[k] if align else self._depths[k]
+        return depth, self._colors[k]
+
+    def calibration(self):
+        # 深度相机与颜色相机同心，水平视场相同
+        (cw, ch), (dw, dh) = self.color_size, self.depth_size
+        return {
+            "depth_intrinsics": _pinhole(dw, dh, 0.7 * dw),
+            "color_intrinsics": _pinhole(cw, ch, 0.7 * cw),
+            "depth_to_color": {"rotation": [1, 0, 0, 0, 1, 0, 0, 0, 1], "translation": [0, 0, 0]},
+            "depth_scale": self.DEPTH_SCALE,
+        }
@@ -0,0 +1,118 @@
+"""
+RealSense 帧的压缩存储：颜色图编码为 JPEG/WebP（质量可配置），深度图无损编码为 16 位 PNG 或 zstd 压缩的原始数组。
+编码在写盘线程池中完成（cv2 和 zstd 编码时释放 GIL，多个线程可以并行），采集线程只移交缓冲区。
+每帧仍是一个 pickle 文件，图像字段保存为编码后的 bytes，"encoding" 记录每个字段的编码方式，读取时用 decode_frame 还原。
+"""
+
+import threading
+import cv2
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # 只有深度图使用 zstd 时才需要
+    zstandard = None
+
+STORAGE_KINDS = ("raw", "compressed")
+COLOR_FORMATS = ("jpeg", "webp")
+DEPTH_FORMATS = ("png", "zstd")
+ENCODING_KEY = "encoding"
+
+_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp", "png": ".png"}
+
+
+class VisEncoder:
+    """
+    图像编码器，可以在多个线程中同时调用。
+    Args:
+        color_format (str): 颜色图格式，'jpeg' 或 'webp'。
+        color_quality (int): 颜色图质量 1-100（webp 为 100 时无损）。
+        depth_format (str): 深度图格式，'png'（16 位无损）或 'zstd'。
+        depth_level (int): 压缩级别，png 为 0-9，zstd 为 1-22。
+    """
+    def __init__(self, color_format="jpeg", color_quality=90, depth_format="png", depth_level=1):
+        if color_format not in COLOR_FORMATS:
+            raise ValueError(f"Unknown color format '{color_format}', expected one of {COLOR_FORMATS}")
+        if depth_format not in DEPTH_FORMATS:
+            raise ValueError(f"Unknown depth format '{depth_format}', expected one of {DEPTH_FORMATS}")
+        if depth_format == "zstd" and zstandard is None:
+            raise ImportError("zstd depth storage requires the 'zstandard' package (pip install zstandard)")
+        self.color_format = color_format
+        self.color_quality = color_quality
+        self.depth_format = depth_format
+        self.depth_level = depth_level
+        self._local = threading.local()  # zstd 压缩器不能在线程间共享
+
+    def _imencode(self, fmt, image, params):
+        ok, buf = cv2.imencode(_EXTENSIONS[fmt], image, params)
+        if not ok:
+            raise RuntimeError(f"Failed to encode image as {fmt}")
+        return buf.tobytes()
+
+    def encode_color(self, image):
+        if self.color_format == "jpeg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.color_quality]
+        else:
+            params = [cv2.IMWRITE_WEBP_QUALITY, self.color_quality]
+        return self._imencode(self.color_format, image, params), {"codec": self.color_format}
+
+    def encode_depth(self, image):
+        spec = {"codec": self.depth_format, "shape": list(image.shape), "dtype": str(image.dtype)}
+        if self.depth_format == "png":
+            return self._imencode("png", image, [cv2.IMWRITE_PNG_COMPRESSION, self.depth_level]), spec
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.depth_level)
+        return compressor.compress(np.ascontiguousarray(image).tobytes()), spec
+
+    def encode(self, images):
+        """
+        Args:
+            images (dict): 字段名 -> 图像，uint8 的 (H, W, 3) 按颜色图编码，uint16 的 (H, W) 按深度图编码，
+                其他值原样保留。
+        Returns:
+            dict: 编码后的字段，ENCODING_KEY 记录每个图像字段的编码方式。
+        """
+        out = {}
+        encoding = {}
+        for key, value in images.items():
+            if isinstance(value, np.ndarray) and value.dtype == np.uint16 and value.ndim == 2:
+                out[key], encoding[key] = self.encode_depth(value)
+            elif isinstance(value, np.ndarray) and value.dtype == np.uint8 and value.ndim == 3:
+                out[key], encoding[key] = self.encode_color(value)
+            else:
+                out[key] = value
+        out[ENCODING_KEY] = encoding
+        return out
+
+    def to_dict(self):
+        return {
+            "color_format": self.color_format,
+            "color_quality": self.color_quality,
+            "depth_format": self.depth_format,
+            "depth_level": self.depth_level,
+        }
+
+
+def decode_image(buf, spec):
+    if spec["codec"] == "zstd":
+        if zstandard is None:
+            raise ImportError("Decoding zstd depth requires the 'zstandard' package (pip install zstandard)")
+        raw = zstandard.ZstdDecompressor().decompress(buf)
+        return np.frombuffer(raw, dtype=spec["dtype"]).reshape(spec["shape"])
+    image = cv2.imdecode(np.frombuffer(buf, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise RuntimeError(f"Failed to decode {spec['codec']} image")
+    return image
+
+
+def decode_frame(data):
+    """把一帧中编码的图像字段还原为数组；没有编码的帧（旧数据）原样返回。"""
+    if not isinstance(data, dict) or ENCODING_KEY not in data:
+        return data
+    out = dict(data)
+    encoding = out.pop(ENCODING_KEY)
+    for key, spec in encoding.items():
+        if key in out:
+            out[key] = decode_image(out[key], spec)
+    return out
@@ -0,0 +1,221 @@
+"""
+颜色图的分段视频存储：每个相机的颜色流写入滚动的视频分段（例如每 60 秒一个 MP4），
+旁边的 index.jsonl 每帧一行，记录分段、分段内的帧序号、帧号、硬件时间戳和主机时间戳。
+OpenCV 的 VideoWriter 不提供字节偏移，索引用（分段, 帧序号）定位；读取时按时间戳查索引，
+顺序读取时直接解码下一帧，随机读取时由 VideoCapture 跳到前一个关键帧再解码到目标帧。
+"""
+
+import os
+import json
+import heapq
+import threading
+import cv2
+import numpy as np
+from episode_store import write_json
+
+VIDEO_FOLDER = "video"
+VIDEO_META_FILE = "video.json"
+VIDEO_INDEX_FILE = "index.jsonl"
+VIDEO_FORMATS = {"mp4": ("mp4v", ".mp4"), "mkv": ("XVID", ".mkv")}
+# 目标帧在当前位置之后且距离小于该值时向前解码，不重新定位
+SEEK_THRESHOLD = 30
+
+
+def has_video(folder):
+    return os.path.exists(os.path.join(folder, VIDEO_FOLDER, VIDEO_META_FILE))
+
+
+class SegmentedVideoWriter:
+    """
+    单个相机的分段视频写入，在一个线程中调用 write()。
+    对齐线程池可能让相邻帧乱序到达，写入前在一个小的重排缓冲区中按时间戳排序。
+    Args:
+        folder (str): 相机数据文件夹，视频写入 <folder>/video。
+        fps (float): 视频帧率，只影响播放速度，读取按索引中的时间戳。
+        segment_s (float): 每个分段的时长（秒）。
+        video_format (str): 'mp4' 或 'mkv'。
+        reorder (int): 重排缓冲区的帧数。
+    """
+    def __init__(self, folder, fps=30, segment_s=60.0, video_format="mp4", reorder=4):
+        if video_format not in VIDEO_FORMATS:
+            raise ValueError(f"Unknown video format '{video_format}', expected one of {tuple(VIDEO_FORMATS)}")
+        self.folder = os.path.join(folder, VIDEO_FOLDER)
+        os.makedirs(self.folder, exist_ok=True)
+        self.fps = fps
+        self.segment_s = segment_s
+        self.fourcc, self.ext = VIDEO_FORMATS[video_format]
+        self.reorder = reorder
+        self.segments = []  # 每个分段：文件名、帧数、起止时间戳
+        self.frame_count = 0
+        self.late_frames = 0  # 超出重排缓冲区、没有按时间顺序写入的帧
+        self._pending = []
+        self._writer = None
+        self._size = None
+        self._last_timestamp = None
+        self._index = open(os.path.join(self.folder, VIDEO_INDEX_FILE), "a")
+        self._lock = threading.Lock()
+        self._save_meta()
+
+    def _save_meta(self):
+        write_json(os.path.join(self.folder, VIDEO_META_FILE), {
+            "fps": self.fps,
+            "segment_s": self.segment_s,
+            "fourcc": self.fourcc,
+            "frames": self.frame_count,
+            "late_frames": self.late_frames,
+            "segments": self.segments,
+        })
+
+    def _open_segment(self, image, timestamp):
+        self._close_segment()
+        name = f"segment_{len(self.segments):04d}{self.ext}"
+        self._size = (image.shape[1], image.shape[0])
+        self._writer = cv2.VideoWriter(os.path.join(self.folder, name), cv2.VideoWriter_fourcc(*self.fourcc),
+                                       self.fps, self._size)
+        if not self._writer.isOpened():
+            raise RuntimeError(f"Cannot open video writer for {name} ({self.fourcc})")
+        self.segments.append({"file": name, "frames": 0, "start_ms": timestamp, "end_ms": timestamp})
+        self._save_meta()
+
+    def _close_segment(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def write(self, image, stamp, on_written=None):
+        """
+        Args:
+            image (np.ndarray): (H, W, 3) 的 BGR 颜色图。
+            stamp (dict): FrameStamper.stamp 的结果，按 "timestamp" 排序。
+            on_written (callable): 该帧真正写入视频后调用（例如把 image 放回缓冲区池）。
+        """
+        with self._lock:
+            heapq.heappush(self._pending, (stamp["timestamp"], self.frame_count + len(self._pending), image, stamp,
+                                           on_written))
+            while len(self._pending) > self.reorder:
+                self._write_one(*heapq.heappop(self._pending)[2:])
+
+    def _write_one(self, image, stamp, on_written=None):
+        try:
+            self._encode_one(image, stamp)
+        finally:
+            if on_written is not None:
+                on_written(image)
+
+    def _encode_one(self, image, stamp):
+        timestamp = stamp["timestamp"]
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
+            self.late_frames += 1
+        self._last_timestamp = timestamp
+
+        segment = self.segments[-1] if self.segments else None
+        if (segment is None or (image.shape[1], image.shape[0]) != self._size
+                or timestamp - segment["start_ms"] >= self.segment_s * 1000):
+            self._open_segment(image, timestamp)
+            segment = self.segments[-1]
+        self._writer.write(image)
+        self._index.write(json.dumps({
+            "segment": len(self.segments) - 1,
+            "position": segment["frames"],
+            "timestamp": timestamp,
+            "frame_number": stamp.get("frame_number"),
+            "color_timestamp": stamp.get("color_timestamp"),
+            "host_timestamp": stamp.get("host_timestamp"),
+        }) + "\n")
+        self._index.flush()
+        segment["frames"] += 1
+        segment["end_ms"] = max(segment["end_ms"], timestamp)
+        self.frame_count += 1
+
+    def close(self):
+        """写完重排缓冲区中剩余的帧，关闭当前分段。"""
+        with self._lock:
+            while self._pending:
+                self._write_one(*heapq.heappop(self._pending)[2:])
+            self._close_segment()
+            self._index.close()
+            self._save_meta()
+        return {"frames": self.frame_count, "segments": len(self.segments), "late_frames": self.late_frames}
+
+
+def load_video_index(folder):
+    """读取相机数据文件夹的视频索引，返回按时间戳排序的列数组 dict。最后一行写了一半时忽略该行。"""
+    rows = []
+    with open(os.path.join(folder, VIDEO_FOLDER, VIDEO_INDEX_FILE), "r") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    rows.sort(key=lambda r: r["timestamp"])
+    columns = ("segment", "position", "timestamp", "frame_number", "color_timestamp", "host_timestamp")
+    return {name: np.array([r[name] for r in rows]) for name in columns}
+
+
+class SegmentedVideoReader:
+    """
+    按时间戳读取分段视频中的颜色图。
+    Args:
+        folder (str): 相机数据文件夹。
+    """
+    def __init__(self, folder):
+        self.folder = os.path.join(folder, VIDEO_FOLDER)
+        with open(os.path.join(self.folder, VIDEO_META_FILE), "r") as f:
+            self.meta = json.load(f)
+        self.index = load_video_index(folder)
+        self.timestamps = self.index["timestamp"]
+        self._cap = None
+        self._segment = None
+        self._next = None  # 当前分段中下一次 read() 得到的帧序号
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def find(self, timestamp):
+        """时间戳最接近的帧在索引中的下标。"""
+        k = int(np.searchsorted(self.timestamps, timestamp))
+        if k > 0 and (k == len(self) or timestamp - self.timestamps[k - 1] <= self.timestamps[k] - timestamp):
+            k -= 1
+        return k
+
+    def read_at(self, k):
+        """读取索引中第 k 帧的图像。"""
+        segment, position = int(self.index["segment"][k]), int(self.index["position"][k])
+        if segment != self._segment:
+            self.close()
+            self._cap = cv2.VideoCapture(os.path.join(self.folder, self.meta["segments"][segment]["file"]))
+            self._segment, self._next = segment, 0
+        if position < self._next or position - self._next > SEEK_THRESHOLD:
+            # 跳到目标帧之前的关键帧并解码到目标帧
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            self._next = position
+        while self._next < position:
+            self._cap.grab()
+            self._next += 1
+        ok, image = self._cap.read()
+        if not ok:
+            raise IOError(f"Cannot decode frame {position} of segment {segment}")
+        self._next += 1
+        return image
+
+    def read(self, timestamp, threshold=None):
+        """
+        读取时间戳最接近的一帧，返回 (时间戳, 图像)；超过 threshold（毫秒）时返回 None。
+        """
+        if len(self) == 0:
+            return None
+        k = self.find(timestamp)
+        if threshold is not None and abs(self.timestamps[k] - timestamp) > threshold:
+            return None
+        return int(self.timestamps[k]), self.read_at(k)
+
+    def frames(self):
+        """按时间顺序逐帧返回 (时间戳, 图像)。"""
+        for k in range(len(self)):
+            yield int(self.timestamps[k]), self.read_at(k)
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+            self._segment = None